@@ -0,0 +1,151 @@
+import copy
+import math
+from typing import Dict, List, Tuple
+import solver
+import two_phase
+import min_conflicts
+import feasibility
+from instance import Instance
+from state import State
+
+# Automatic choice of the algorithm ('auto'). Cheap features of the instance, computed once it
+# is loaded, select a rule of RULES. The rule's plan is a list of stages (algorithm, parameters)
+# run in order until one reaches the lower bounds of the feasibility analysis. The exact stages
+# get a node budget, so the local search stages after them keep their share of the run.
+
+class InstanceFeatures:
+    def __init__(self, instance: Instance, report: feasibility.FeasibilityReport):
+        self.nr_courses = len(instance.courses)
+        self.min_hard_conflicts, self.min_soft_conflicts = report.get_lower_bounds()
+
+        # Fewest assignments each course needs, each in its largest classroom
+        needed_assignments = {}  # Dict [course: nr_assignments]
+        for course, nr_students in instance.courses.items():
+            capacities = feasibility.course_capacities(instance, course)
+            needed_assignments[course] = math.ceil(nr_students / capacities[0]) if capacities else 1
+
+        # (classroom, time slot) pairs with a teacher who prefers the time slot, per needed
+        # assignment, for the course that has the fewest
+        self.slots_per_demand = min((sum(1 for time_slot in instance.available_time_slots
+                                            if any(time_slot in instance.teachers[teacher].preffered_time_slots_set
+                                                    for teacher in instance.get_teachers_by_course(course))) *
+                                        len(instance.get_classrooms_by_course(course)) / needed_assignments[course]
+                                        for course in instance.courses), default=0.0)
+
+        # Share of the time slots the teachers prefer
+        self.preference_density = (sum(len(teacher.preffered_time_slots_set) for teacher in instance.teachers.values()) /
+                                    max(1, len(instance.teachers) * len(instance.available_time_slots)))
+
+        self.teachers_per_course = (sum(len(instance.get_teachers_by_course(course)) for course in instance.courses) /
+                                    max(1, self.nr_courses))
+
+        # Seats of all the classrooms in all the time slots, per student
+        self.seat_slack = (sum(classroom.capacity for classroom in instance.classrooms.values()) *
+                            len(instance.available_time_slots) / max(1, sum(instance.courses.values())))
+
+    def describe(self) -> str:
+        return ("slots per course demand %.2f, preference density %.2f, teachers per course %.2f, "
+                "seat slack %.2f" % (self.slots_per_demand, self.preference_density,
+                                        self.teachers_per_course, self.seat_slack))
+
+# (name, condition, stages), the first rule whose condition holds is used. Calibrated on the
+# inputs: with at most 3.4 slots per course demand or 1.64 seats per student (the exact and
+# constrained ones), the two-phase CSP needs under 0.2 seconds where hill climbing stops with
+# soft conflicts and the plain CSP may not finish; with at least 8.4 and 1.74 (the relaxed
+# ones), hill climbing from the greedy schedule finishes in under 0.2 seconds. When every
+# timetable has conflicts the CSP builds none, and on such variants of the inputs min-conflicts
+# gets closest to the bounds in a few seconds; branch and bound, which may prove the optimum on
+# small instances, and hill climbing, which trades hard for soft conflicts, only follow it.
+RULES = [
+    ('unavoidable hard conflicts', lambda features: features.min_hard_conflicts > 0,
+        [('mc', {'max_steps': 50000, 'max_no_improvement': 5000, 'noise': 0.1}),
+            ('hc', {'max_iters': 10000, 'max_no_improvement': 100, 'restarts': 1})]),
+    ('unavoidable soft conflicts', lambda features: features.min_soft_conflicts > 0,
+        [('mc', {'max_steps': 50000, 'max_no_improvement': 5000, 'noise': 0.1}),
+            ('branch-and-bound', {'node_limit': 5000})]),
+    ('tight', lambda features: features.slots_per_demand < 5.0 or features.seat_slack < 1.7,
+        [('two-phase', {'node_limit': 50000}),
+            ('mc', {'max_steps': 20000, 'max_no_improvement': 2000, 'noise': 0.1})]),
+    ('relaxed', lambda features: True,
+        [('hc', {'max_iters': 10000, 'max_no_improvement': 100, 'restarts': 5}),
+            ('mc', {'max_steps': 20000, 'max_no_improvement': 2000, 'noise': 0.1})]),
+]
+
+# Stages that build the incumbent of branch and bound: the two-phase CSP, which only builds
+# timetables without any conflict, and min-conflicts from the greedy schedule
+INCUMBENT_STAGES = [
+    ('two-phase', {'node_limit': 5000}),
+    ('mc', {'max_steps': 20000, 'max_no_improvement': 2000, 'noise': 0.1}),
+]
+
+def select_rule(features: InstanceFeatures) -> Tuple[str, List[Tuple[str, Dict]]]:
+    for name, condition, stages in RULES:
+        if condition(features):
+            return name, stages
+
+# Runs a stage from a copy of the initial state. Returns the best timetable it found,
+# or None, and the number of nodes, iterations or steps it took. Branch and bound starts
+# from the incumbent, if it has no hard conflicts.
+def run_stage(algorithm: str, parameters: Dict, initial_state: State, lower_bounds: Tuple[int, int],
+                moves: List[str] = None, incumbent: State = None) -> Tuple[State, int]:
+    if algorithm in ('two-phase', 'branch-and-bound'):
+        if algorithm == 'two-phase':
+            search = two_phase.TwoPhaseSolver(copy.deepcopy(initial_state))
+        else:
+            search = solver.CSP(copy.deepcopy(initial_state), branch_and_bound=True,
+                                min_soft_conflicts=lower_bounds[1])
+            if incumbent is not None and incumbent.get_hard_conflicts() == 0:
+                search.set_incumbent(incumbent)
+        search.node_callback = lambda search: search.nr_nodes >= parameters['node_limit']
+        return search.solve(), search.nr_nodes
+
+    if algorithm == 'mc':
+        state = copy.deepcopy(initial_state)
+        solver.generate_initial_schedule(state)
+        _, steps, _, state = min_conflicts.min_conflicts(state, parameters['max_steps'],
+                                                            parameters['max_no_improvement'],
+                                                            parameters['noise'], lower_bounds=lower_bounds)
+        return state, steps
+
+    # Hill climbing, restarted from random schedules after the greedy one while it gets stuck
+    best_state, nr_iters = None, 0
+    for restart in range(parameters['restarts']):
+        state = copy.deepcopy(initial_state)
+        solver.generate_initial_schedule(state, 'greedy' if restart == 0 else 'random')
+        _, iters, _, state = solver.stochastic_hill_climbing(state, parameters['max_iters'],
+                                                            parameters['max_no_improvement'],
+                                                            lower_bounds=lower_bounds, moves=moves)
+        nr_iters += iters
+        if best_state is None or is_better(state, best_state):
+            best_state = state
+        if solver.reaches_lower_bounds(best_state, lower_bounds):
+            break
+    return best_state, nr_iters
+
+def is_better(state: State, other: State) -> bool:
+    return ((state.get_hard_conflicts(), state.get_soft_conflicts()) <
+            (other.get_hard_conflicts(), other.get_soft_conflicts()))
+
+# Runs the stages of a plan until one reaches the lower bounds. Returns the best timetable
+# found, or None, and for each stage that ran its algorithm, its timetable and its effort.
+def solve(stages: List[Tuple[str, Dict]], initial_state: State, lower_bounds: Tuple[int, int],
+            moves: List[str] = None) -> Tuple[State, List[Tuple[str, State, int]]]:
+    best_state, runs = None, []
+    for algorithm, parameters in stages:
+        state, effort = run_stage(algorithm, parameters, initial_state, lower_bounds, moves, best_state)
+        runs.append((algorithm, state, effort))
+        if state is not None and (best_state is None or is_better(state, best_state)):
+            best_state = state
+        if best_state is not None and solver.reaches_lower_bounds(best_state, lower_bounds):
+            break
+    return best_state, runs
+
+# Returns a timetable without hard conflicts to start branch and bound from, or None. The
+# two-phase CSP only runs when timetables without any conflict may exist.
+def find_incumbent(initial_state: State, lower_bounds: Tuple[int, int]) -> State:
+    stages = [(algorithm, parameters) for algorithm, parameters in INCUMBENT_STAGES
+                if algorithm != 'two-phase' or lower_bounds == (0, 0)]
+    state, _ = solve(stages, initial_state, lower_bounds)
+    if state is None or state.get_hard_conflicts() > 0:
+        return None
+    return state
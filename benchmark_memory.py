@@ -0,0 +1,73 @@
+import copy
+import time
+import random
+import argparse
+import tracemalloc
+import utils
+from instance import Instance
+from schedule import Schedule
+from state import State
+
+# Copy of the whole object graph, the instance included, that ignores the __copy__ and
+# __deepcopy__ of the classes: the way copy.deepcopy copied a state before they shared the
+# instance and the read-only records
+def full_deepcopy(value, memo: dict):
+    if id(value) in memo:
+        return memo[id(value)]
+
+    if isinstance(value, dict):
+        result = memo[id(value)] = {}
+        for key, item in value.items():
+            result[full_deepcopy(key, memo)] = full_deepcopy(item, memo)
+    elif isinstance(value, list):
+        result = memo[id(value)] = []
+        result += [full_deepcopy(item, memo) for item in value]
+    elif isinstance(value, (tuple, set, frozenset)):
+        result = memo[id(value)] = type(value)(full_deepcopy(item, memo) for item in value)
+    elif hasattr(value, '__slots__') or hasattr(value, '__dict__'):
+        result = memo[id(value)] = type(value).__new__(type(value))
+        for cls in type(value).__mro__:
+            for name in getattr(cls, '__slots__', ()):
+                if hasattr(value, name):
+                    setattr(result, name, full_deepcopy(getattr(value, name), memo))
+        for name, item in getattr(value, '__dict__', {}).items():
+            setattr(result, name, full_deepcopy(item, memo))
+    else:
+        # Numbers, strings and the other immutable values
+        result = value
+
+    return result
+
+# Measures the average memory (in bytes) and time (in seconds) taken by one copy
+# of the state, the way the local search copies it for every neighbour. With baseline,
+# the copies are full deep copies (see full_deepcopy).
+def measure_state_copies(state: State, nr_copies: int = 500, baseline: bool = False):
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    if baseline:
+        copies = [full_deepcopy(state, {}) for _ in range(nr_copies)]
+    else:
+        copies = [copy.deepcopy(state) for _ in range(nr_copies)]
+    elapsed = time.perf_counter() - start_time
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return memory / len(copies), elapsed / len(copies)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Memory and time taken by a copy of the state')
+    parser.add_argument('filename', nargs='?', default='inputs/orar_mare_relaxat.yaml')
+    parser.add_argument('--baseline', action='store_true',
+                        help='copy the whole object graph, instance included, as copy.deepcopy did '
+                                'before the classes had their own copies')
+    args = parser.parse_args()
+    filename = args.filename
+    random.seed(0)
+
+    schedule = Schedule(Instance(utils.read_yaml_file(filename)))
+    state = State(schedule)
+    state.generate_initial_schedule()
+
+    memory, elapsed = measure_state_copies(state, baseline=args.baseline)
+    print("Memory per state: %.0f bytes" % memory)
+    print("Time per copy: %.1f us" % (elapsed * 1e6))
@@ -0,0 +1,52 @@
+import os
+import gzip
+import time
+import pickle
+import random
+
+# Periodic checkpoints of long searches, so that a run killed midway (e.g. by job preemption)
+# can go on with --resume. A checkpoint is a gzip-compressed pickle of a dict with the search
+# state, its counters and the state of the random number generator, from which the search
+# continues exactly as it would have without the interruption. The header identifies the
+# instance, the algorithm and its options, so that a checkpoint is never resumed by another run.
+# Checkpoints are only meant to be read back by the program that wrote them.
+
+DEFAULT_INTERVAL = 60.0
+
+class Checkpointer:
+    def __init__(self, path: str, header: dict, interval: float = DEFAULT_INTERVAL):
+        self.path = path
+        self.header = header
+        self.interval = interval
+        self.last_time = time.time()
+        self.nr_checkpoints = 0
+
+    def is_due(self) -> bool:
+        return time.time() - self.last_time >= self.interval
+
+    def save(self, data: dict):
+        checkpoint = dict(self.header)
+        checkpoint['random_state'] = random.getstate()
+        checkpoint.update(data)
+
+        # Written to a temporary file first, so that an interruption never leaves half a checkpoint
+        with gzip.open(self.path + '.tmp', 'wb') as f:
+            pickle.dump(checkpoint, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(self.path + '.tmp', self.path)
+
+        self.last_time = time.time()
+        self.nr_checkpoints += 1
+
+# Returns the checkpoint saved at path, or None if there is none yet. Raises ValueError if
+# it was written by a run with another header.
+def load_checkpoint(path: str, header: dict) -> dict:
+    if not os.path.exists(path):
+        return None
+
+    with gzip.open(path, 'rb') as f:
+        checkpoint = pickle.load(f)
+
+    for name, value in header.items():
+        if checkpoint.get(name) != value:
+            raise ValueError("the checkpoint " + path + " was written for another " + name)
+    return checkpoint
@@ -1,22 +1,57 @@
 from typing import Tuple
 
-class Classroom:
+class ClassroomInfo:
+    # Static data about a classroom. It is shared by every schedule built from the same instance,
+    # so it must never be modified after it is created.
     def __init__(self, name: str, capacity: int, subjects: list):
         self.name = name
         self.capacity = capacity
-        self.subjects = subjects
+        self.subjects = tuple(subjects)
+
+    # Being read-only, the data can be shared instead of copied
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+class Classroom:
+    __slots__ = ('info', 'courses_by_time_slot')
+
+    def __init__(self, info: ClassroomInfo):
+        self.info = info
         # Keep the courses that are held in a class for each time slot so that later
         # conflicts could be spotted (2 or more coreses in the same class at the same time).
         self.courses_by_time_slot = {}  # Dict [time_slot: List[course]]
+
+    # Only the occupancy is copied, the static info is shared
+    def __copy__(self):
+        classroom = Classroom.__new__(Classroom)
+        classroom.info = self.info
+        classroom.courses_by_time_slot = {time_slot: list(courses) for time_slot, courses
+                                            in self.courses_by_time_slot.items()}
+        return classroom
+
+    def __deepcopy__(self, memo):
+        return self.__copy__()
     
     def get_name(self) -> str:
-        return self.name
+        return self.info.name
+
+    def get_info(self) -> ClassroomInfo:
+        return self.info
 
     def get_capacity(self) -> int:
-        return self.capacity
+        return self.info.capacity
+
+    def get_courses_by_time_slot(self):
+        return self.courses_by_time_slot
+
+    def get_subjects(self) -> Tuple[str]:
+        return self.info.subjects
     
     def can_host_course(self, course: str) -> bool:
-        return course in self.subjects
+        return course in self.info.subjects
     
     def is_occupied_at_time(self, time_slot: str) -> bool:
         return time_slot in self.courses_by_time_slot
@@ -0,0 +1,307 @@
+import os
+import json
+import time
+import queue
+import signal
+import random
+import asyncio
+import argparse
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+import yaml
+import utils
+import solver
+from instance import Instance
+from schedule import Schedule
+from state import State
+
+# Local solver service. Clients connect to a Unix socket (or to a localhost TCP port) and
+# exchange JSON objects, one per line:
+#   {"op": "solve", "algorithm": "csp" | "hc", "instance": <YAML or JSON text>, or "path": <file>,
+#    "time_budget": <seconds>, "seed": <int>, "symmetry_breaking": <bool>,
+#    "initial": "greedy" | "random"}
+#   {"op": "cancel", "job": <job id>}
+# The daemon answers a solve with {"job": <id>, "status": "queued"} and then streams the
+# "running" status, {"job": <id>, "progress": {...}} messages and a final message whose status
+# is "done", "timeout", "cancelled" or "failed". Jobs of a client that disconnects are cancelled.
+
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), 'orar.sock')
+
+# Parsing and preprocessing are done once per distinct instance in each worker
+@lru_cache(maxsize=16)
+def compile_instance(text: str) -> Instance:
+    return Instance(yaml.safe_load(text))
+
+class JobMonitor:
+    # Reports the progress of a job at most every progress_interval seconds, and tells
+    # the search to stop once the job is cancelled or runs out of its time budget
+    def __init__(self, job_id: int, events, cancel_event, time_budget: float = None,
+                    progress_interval: float = 0.5):
+        self.job_id = job_id
+        self.events = events
+        self.cancel_event = cancel_event
+        self.start_time = time.time()
+        self.deadline = None if time_budget is None else self.start_time + time_budget
+        self.progress_interval = progress_interval
+        self.last_report = self.start_time
+        self.reason = None  # Why the search was stopped: 'cancelled' or 'timeout'
+
+    def send(self, message: dict):
+        message['job'] = self.job_id
+        self.events.put(message)
+
+    def should_stop(self, progress: dict) -> bool:
+        now = time.time()
+        if now - self.last_report < self.progress_interval:
+            return False
+        self.last_report = now
+
+        progress['elapsed'] = round(now - self.start_time, 3)
+        self.send({'progress': progress})
+
+        if self.cancel_event.is_set():
+            self.reason = 'cancelled'
+        elif self.deadline is not None and now > self.deadline:
+            self.reason = 'timeout'
+
+        return self.reason is not None
+
+# Runs one job in a worker process. Everything, including the final result, goes through
+# the events queue, so that the client gets the messages of a job in order.
+def run_job(job_id: int, request: dict, events, cancel_event):
+    monitor = JobMonitor(job_id, events, cancel_event, request.get('time_budget'))
+    monitor.send({'status': 'running'})
+
+    try:
+        if 'path' in request:
+            with open(request['path']) as f:
+                text = f.read()
+        else:
+            text = request['instance']
+
+        instance = compile_instance(text)
+        if 'seed' in request:
+            random.seed(request['seed'])
+
+        initial_state = State(Schedule(instance))
+        result = {'status': 'done'}
+
+        if request.get('algorithm', 'csp') == 'hc':
+            solver.generate_initial_schedule(initial_state, request.get('initial', 'greedy'))
+            final_state = solver.stochastic_hill_climbing(
+                initial_state,
+                callback=lambda iters, state: monitor.should_stop(
+                    {'iterations': iters, 'hard_conflicts': state.get_hard_conflicts(),
+                        'soft_conflicts': state.get_soft_conflicts()}))[3]
+        else:
+            csp = solver.CSP(initial_state, symmetry_breaking=request.get('symmetry_breaking', True))
+            csp.node_callback = lambda csp: monitor.should_stop({'nodes': csp.nr_nodes})
+            final_state = csp.solve()
+            result['nodes'] = csp.nr_nodes
+
+        if monitor.reason is not None:
+            result['status'] = monitor.reason
+        result['elapsed'] = round(time.time() - monitor.start_time, 3)
+
+        if final_state is not None:
+            result['hard_conflicts'] = final_state.get_hard_conflicts()
+            result['soft_conflicts'] = final_state.get_soft_conflicts()
+            result['timetable'] = format_timetable(final_state, text)
+        else:
+            result['timetable'] = None
+    except Exception as error:
+        result = {'status': 'failed', 'error': repr(error)}
+
+    monitor.send(result)
+
+def format_timetable(state: State, text: str) -> str:
+    # The timetable printer reads the teachers from the input file
+    with tempfile.NamedTemporaryFile('w', suffix='.yaml', delete=False) as f:
+        f.write(text)
+
+    try:
+        return utils.pretty_print_timetable(state.get_schedule().convert_schedule_to_dict(), f.name)
+    finally:
+        os.remove(f.name)
+
+class Job:
+    def __init__(self, job_id: int, writer: asyncio.StreamWriter, cancel_event):
+        self.job_id = job_id
+        self.writer = writer
+        self.cancel_event = cancel_event
+        self.future = None
+
+class SolverDaemon:
+    def __init__(self, nr_workers: int = None):
+        self.executor = ProcessPoolExecutor(nr_workers)
+        self.manager = multiprocessing.Manager()
+        self.events = self.manager.Queue()
+        self.jobs = {}  # Dict [job_id: Job]
+        self.next_job_id = 1
+
+    async def serve(self, socket_path: str = DEFAULT_SOCKET, port: int = None):
+        forwarder = asyncio.create_task(self.forward_events())
+
+        if port is not None:
+            server = await asyncio.start_server(self.handle_client, '127.0.0.1', port)
+        else:
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+            server = await asyncio.start_unix_server(self.handle_client, socket_path)
+
+        # Shut down cleanly on Ctrl+C or kill
+        stopped = asyncio.get_running_loop().create_future()
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            asyncio.get_running_loop().add_signal_handler(signal_number, stopped.set_result, None)
+
+        print("Listening on " + (socket_path if port is None else "127.0.0.1:" + str(port)))
+        try:
+            async with server:
+                await stopped
+        finally:
+            forwarder.cancel()
+            for job in list(self.jobs.values()):
+                self.cancel(job.job_id)
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.manager.shutdown()
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    send(writer, {'error': 'invalid JSON'})
+                    continue
+
+                op = request.get('op')
+                if op == 'solve':
+                    if 'instance' not in request and 'path' not in request:
+                        send(writer, {'error': 'an instance or a path is needed'})
+                    else:
+                        self.submit(request, writer)
+                elif op == 'cancel':
+                    if not self.cancel(request.get('job')):
+                        send(writer, {'job': request.get('job'), 'error': 'unknown or finished job'})
+                else:
+                    send(writer, {'error': 'unknown op: ' + str(op)})
+        finally:
+            # Nobody is left to read the results
+            for job in list(self.jobs.values()):
+                if job.writer is writer:
+                    self.cancel(job.job_id)
+            writer.close()
+
+    def submit(self, request: dict, writer: asyncio.StreamWriter):
+        job = Job(self.next_job_id, writer, self.manager.Event())
+        self.next_job_id += 1
+        self.jobs[job.job_id] = job
+
+        loop = asyncio.get_running_loop()
+        job.future = self.executor.submit(run_job, job.job_id, request, self.events, job.cancel_event)
+        job.future.add_done_callback(
+            lambda future: loop.call_soon_threadsafe(self.check_future, job, future))
+        send(writer, {'job': job.job_id, 'status': 'queued'})
+
+    # Jobs that never ran, or whose worker died, do not send their final message themselves
+    def check_future(self, job: Job, future):
+        if job.job_id not in self.jobs:
+            return
+
+        if future.cancelled():
+            self.finish(job, {'job': job.job_id, 'status': 'cancelled'})
+        elif future.exception() is not None:
+            self.finish(job, {'job': job.job_id, 'status': 'failed', 'error': repr(future.exception())})
+
+    def cancel(self, job_id) -> bool:
+        job = self.jobs.get(job_id)
+        if job is None:
+            return False
+
+        # Queued jobs are simply dropped, running ones stop at their next progress check
+        if not job.future.cancel():
+            job.cancel_event.set()
+        return True
+
+    def finish(self, job: Job, message: dict):
+        del self.jobs[job.job_id]
+        send(job.writer, message)
+
+    # Passes the messages of the workers on to the clients that submitted the jobs
+    async def forward_events(self):
+        loop = asyncio.get_running_loop()
+
+        while True:
+            try:
+                message = await loop.run_in_executor(None, self.events.get, True, 0.1)
+            except queue.Empty:
+                continue
+
+            job = self.jobs.get(message['job'])
+            if job is None:
+                continue
+
+            if 'status' in message and message['status'] != 'running':
+                self.finish(job, message)
+            else:
+                send(job.writer, message)
+
+def send(writer: asyncio.StreamWriter, message: dict):
+    if not writer.is_closing():
+        writer.write((json.dumps(message) + '\n').encode())
+
+# Submits an instance to a running daemon and prints every message it sends back
+async def submit_file(filename: str, algorithm: str, time_budget: float = None,
+                        socket_path: str = DEFAULT_SOCKET, port: int = None):
+    if port is not None:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    else:
+        reader, writer = await asyncio.open_unix_connection(socket_path)
+
+    request = {'op': 'solve', 'algorithm': algorithm, 'path': os.path.abspath(filename)}
+    if time_budget is not None:
+        request['time_budget'] = time_budget
+    send(writer, request)
+
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+
+        message = json.loads(line)
+        timetable = message.pop('timetable', None)
+        print(json.dumps(message))
+        if timetable:
+            print(timetable)
+
+        if message.get('status') not in (None, 'queued', 'running'):
+            break
+
+    writer.close()
+    await writer.wait_closed()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local timetable solver service')
+    parser.add_argument('--socket', default=DEFAULT_SOCKET, help='Unix socket to listen on or connect to')
+    parser.add_argument('--port', type=int, help='localhost TCP port to use instead of the Unix socket')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = subparsers.add_parser('serve', help='run the daemon')
+    serve_parser.add_argument('--workers', type=int, help='number of worker processes')
+
+    submit_parser = subparsers.add_parser('submit', help='solve an input file with a running daemon')
+    submit_parser.add_argument('algorithm', choices=['hc', 'csp'])
+    submit_parser.add_argument('filename')
+    submit_parser.add_argument('--time-budget', type=float, help='seconds after which the job is stopped')
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        asyncio.run(SolverDaemon(args.workers).serve(args.socket, args.port))
+    else:
+        asyncio.run(submit_file(args.filename, args.algorithm, args.time_budget, args.socket, args.port))
@@ -0,0 +1,75 @@
+import random
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple
+import solver
+import lns
+import neighbourhoods
+import min_conflicts
+import feasibility
+from instance import Instance
+from schedule import Schedule
+from state import State
+
+# Solves the instance of one component with the given algorithm. Returns its assignments as
+# (course, classroom, teacher, time_slot) tuples, or None if the algorithm found no timetable.
+def solve_component(instance: Instance, algorithm: str, seed: int,
+                    symmetry_breaking: bool = True, initial: str = 'greedy') -> List[Tuple]:
+    random.seed(seed)
+    report = feasibility.analyze(instance)
+    lower_bounds = report.get_lower_bounds()
+    initial_state = State(Schedule(instance))
+
+    if algorithm == 'csp':
+        if report.has_unavoidable_conflicts():
+            return None
+        final_state = solver.CSP(initial_state, symmetry_breaking=symmetry_breaking).solve()
+    elif algorithm == 'ga':
+        # NumPy is only needed by this solver
+        import genetic
+        final_state = genetic.memetic_algorithm(instance, lower_bounds=lower_bounds)[3]
+    elif algorithm == 'mc':
+        solver.generate_initial_schedule(initial_state, initial)
+        final_state = min_conflicts.min_conflicts(initial_state, lower_bounds=lower_bounds)[3]
+    else:
+        solver.generate_initial_schedule(initial_state, initial)
+        final_state = solver.stochastic_hill_climbing(initial_state, lower_bounds=lower_bounds)[3]
+        if algorithm == 'lns':
+            final_state = lns.large_neighbourhood_search(final_state, lower_bounds=lower_bounds)[3]
+
+    if final_state is None:
+        return None
+    return neighbourhoods.list_assignments(final_state.get_schedule())
+
+# Solves the components of the instance independently, on nr_workers processes (all the CPUs by
+# default), and merges their timetables. Components never share a teacher or a classroom, so the
+# merged timetable has exactly the conflicts of its parts. Returns the merged state and the
+# components the algorithm found no timetable for.
+def solve_components(instance: Instance, algorithm: str, nr_workers: int = None,
+                        symmetry_breaking: bool = True, initial: str = 'greedy') -> Tuple[State, List[Tuple]]:
+    components = instance.get_components()
+    component_instances = [instance.get_component_instance(component) for component in components]
+    seeds = [random.getrandbits(32) for _ in components]
+    arguments = (component_instances, [algorithm] * len(components), seeds,
+                    [symmetry_breaking] * len(components), [initial] * len(components))
+
+    if len(components) == 1 or nr_workers == 1:
+        results = list(map(solve_component, *arguments))
+    else:
+        # The largest components come first, so they start right away
+        with ProcessPoolExecutor(nr_workers) as executor:
+            results = list(executor.map(solve_component, *arguments))
+
+    schedule = Schedule(instance)
+    unsolved_components = []
+    for component, assignments in zip(components, results):
+        if assignments is None:
+            unsolved_components.append(component)
+            continue
+
+        for course, classroom, teacher, time_slot in assignments:
+            schedule.add_course(course, classroom, teacher, time_slot)
+
+    state = State(schedule)
+    state.compute_hard_conflicts()
+    state.compute_soft_conflicts()
+    return state, unsolved_components
@@ -0,0 +1,181 @@
+import math
+from typing import Dict, List, Tuple
+from flow import max_flow
+from instance import Instance
+from schedule import Schedule
+
+# Maximum number of time slots a teacher can teach in a week
+MAX_TEACHER_SLOTS = 7
+
+class FeasibilityReport:
+    # Lower bounds on the conflicts of any timetable of an instance, with the reasons
+    # (certificates) that prove them. The hard bound is at most 1: a teacher over the limit of
+    # time slots costs a single hard conflict however far over, so one such teacher may cover
+    # every course the checks find short. The soft bound holds for timetables without hard conflicts.
+    def __init__(self):
+        self.min_hard_conflicts = 0
+        self.min_soft_conflicts = 0
+        self.certificates = []  # List of str
+
+    def get_lower_bounds(self) -> Tuple[int, int]:
+        return self.min_hard_conflicts, self.min_soft_conflicts
+
+    def get_certificates(self) -> List[str]:
+        return self.certificates
+
+    def has_unavoidable_conflicts(self) -> bool:
+        return self.min_hard_conflicts > 0 or self.min_soft_conflicts > 0
+
+# Checks cheap necessary conditions for covering every course, first with any time slots
+# (hard constraints only) and then with the preffered time slots only
+def analyze(instance: Instance) -> FeasibilityReport:
+    report = FeasibilityReport()
+
+    uncoverable = []
+    for course in instance.courses:
+        certificate = check_course(instance, course, preffered_only=False)
+        if certificate is not None:
+            uncoverable.append(course)
+            report.certificates.append(certificate)
+
+    if not uncoverable:
+        report.certificates += check_all_courses(instance, preffered_only=False)[1]
+    if report.certificates:
+        report.min_hard_conflicts = 1
+        report.certificates.append("So every timetable breaks a hard constraint: a teacher over " +
+                                    str(MAX_TEACHER_SLOTS) + " slots, an overlap, an unsuitable "
+                                    "classroom or teacher, or a course without enough seats")
+        return report
+
+    # Every assignment outside the preffered time slots is a soft conflict
+    nr_assignments = 0
+    for course in instance.courses:
+        certificate = check_course(instance, course, preffered_only=True)
+        if certificate is not None:
+            nr_assignments += missing_assignments(instance, course, preffered_only=True)
+            report.certificates.append(certificate)
+
+    joint_assignments, certificates = check_all_courses(instance, preffered_only=True)
+    if joint_assignments > nr_assignments:
+        nr_assignments = joint_assignments
+        report.certificates += certificates
+
+    report.min_soft_conflicts = nr_assignments
+    return report
+
+def usable_time_slots(instance: Instance, teacher: str, preffered_only: bool):
+    if preffered_only:
+        return instance.teachers[teacher].preffered_time_slots_set
+    return instance.available_time_slots
+
+def course_teachers(instance: Instance, course: str) -> List[str]:
+    return list(instance.get_teachers_by_course(course))
+
+def course_capacities(instance: Instance, course: str) -> List[int]:
+    return [instance.classrooms[name].capacity for name in instance.get_classrooms_by_course(course)]
+
+# Number of time slots a teacher can still teach: at most MAX_TEACHER_SLOTS, and no more than
+# its usable time slots still free. Without a schedule, the teacher has not taught any yet.
+def teacher_hours(instance: Instance, teacher: str, preffered_only: bool, schedule: Schedule = None) -> int:
+    usable = usable_time_slots(instance, teacher, preffered_only)
+    if schedule is None:
+        return min(MAX_TEACHER_SLOTS, len(usable))
+
+    busy_time_slots = schedule.teachers[teacher].get_courses_by_time_slot()
+    nr_busy_usable = sum(1 for time_slot in busy_time_slots
+                            if not preffered_only or time_slot in usable)
+    return max(0, min(MAX_TEACHER_SLOTS - len(busy_time_slots), len(usable) - nr_busy_usable))
+
+# Upper bound on the seats a course can get on its own: in each time slot, as many of its
+# largest classrooms as it has teachers there, and no more assignments than its teachers' hours.
+# With a schedule, the bound is on the seats it can still get: only the classrooms and the
+# teachers that are free count, and only the hours the teachers have left.
+def reachable_seats(instance: Instance, course: str, preffered_only: bool, schedule: Schedule = None) -> int:
+    hours = {teacher: teacher_hours(instance, teacher, preffered_only, schedule)
+                for teacher in instance.get_teachers_by_course(course)}
+    teachers = [teacher for teacher, nr_hours in hours.items() if nr_hours]
+
+    seats = []
+    for time_slot in instance.available_time_slots:
+        nr_teachers = sum(1 for teacher in teachers
+                            if (not preffered_only or
+                                    time_slot in instance.teachers[teacher].preffered_time_slots_set) and
+                                (schedule is None or schedule.teachers[teacher].is_free_at_time(time_slot)))
+        if nr_teachers:
+            seats += [instance.classrooms[name].capacity for name in instance.get_classrooms_by_course(course)
+                        if schedule is None or not schedule.classrooms[name].is_occupied_at_time(time_slot)
+                        ][:nr_teachers]
+
+    return sum(sorted(seats, reverse=True)[:sum(hours.values())])
+
+# Lower bound on the assignments of a course that can not fit in the reachable seats
+def missing_assignments(instance: Instance, course: str, preffered_only: bool) -> int:
+    missing_seats = instance.courses[course] - reachable_seats(instance, course, preffered_only)
+    capacities = course_capacities(instance, course)
+    if missing_seats <= 0:
+        return 0
+    if not capacities:
+        return 1
+    return math.ceil(missing_seats / capacities[0])
+
+def check_course(instance: Instance, course: str, preffered_only: bool) -> str:
+    seats = reachable_seats(instance, course, preffered_only)
+    if seats >= instance.courses[course]:
+        return None
+
+    where = "in their preffered time slots" if preffered_only else "in any time slot"
+    return ("Course " + course + " needs " + str(instance.courses[course]) + " seats, but its classrooms " +
+            str(course_capacities(instance, course)) + " and teachers " + str(course_teachers(instance, course)) +
+            " (at most " + str(MAX_TEACHER_SLOTS) + " slots each) offer at most " + str(seats) + " " + where)
+
+# Joint bounds, as maximum flows: the fewest assignments the courses need (each in its largest
+# classroom) against the hours of their teachers, and the seats the courses need against the
+# (classroom, time slot) pairs with a teacher of the course. Returns a lower bound on the
+# assignments that can not be made and the certificates.
+def check_all_courses(instance: Instance, preffered_only: bool) -> Tuple[int, List[str]]:
+    where = "in their preffered time slots" if preffered_only else "in any time slot"
+    certificates = []
+
+    needed_assignments = {}  # Dict [course: nr_assignments]
+    hours_capacities = {'source': {}}  # Dict [node: Dict [neighbour: capacity]]
+    for course, nr_students in instance.courses.items():
+        capacities = course_capacities(instance, course)
+        if not capacities:
+            continue
+        needed_assignments[course] = math.ceil(nr_students / capacities[0])
+        hours_capacities['source'][('course', course)] = needed_assignments[course]
+        hours_capacities[('course', course)] = {('teacher', teacher): needed_assignments[course]
+                                                    for teacher in course_teachers(instance, course)}
+    for teacher in instance.teachers:
+        hours_capacities[('teacher', teacher)] = {'sink': teacher_hours(instance, teacher, preffered_only)}
+
+    nr_missing = sum(needed_assignments.values()) - max_flow(hours_capacities, 'source', 'sink')
+    if nr_missing > 0:
+        certificates.append("The courses need at least " + str(sum(needed_assignments.values())) +
+                            " assignments, but their teachers can hold only " +
+                            str(sum(needed_assignments.values()) - nr_missing) + " of them " + where)
+
+    seats_capacities = {'source': {}}
+    for course, nr_students in instance.courses.items():
+        seats_capacities['source'][('course', course)] = nr_students
+        edges = seats_capacities[('course', course)] = {}
+        teachers = course_teachers(instance, course)
+        for time_slot in instance.available_time_slots:
+            if not any(time_slot in usable_time_slots(instance, teacher, preffered_only) for teacher in teachers):
+                continue
+            for name, classroom in instance.classrooms.items():
+                if course in classroom.subjects:
+                    edges[(name, time_slot)] = classroom.capacity
+    for name, classroom in instance.classrooms.items():
+        for time_slot in instance.available_time_slots:
+            seats_capacities[(name, time_slot)] = {'sink': classroom.capacity}
+
+    missing_seats = sum(instance.courses.values()) - max_flow(seats_capacities, 'source', 'sink')
+    if missing_seats > 0:
+        certificates.append("The courses need " + str(sum(instance.courses.values())) +
+                            " seats, but their classrooms offer only " +
+                            str(sum(instance.courses.values()) - missing_seats) + " " + where)
+        largest_capacity = max(classroom.capacity for classroom in instance.classrooms.values())
+        nr_missing = max(nr_missing, math.ceil(missing_seats / largest_capacity))
+
+    return max(nr_missing, 0), certificates
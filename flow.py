@@ -0,0 +1,71 @@
+from collections import deque
+from typing import Dict, Hashable, Set, Tuple
+
+# Computes the maximum flow between two nodes with the Edmonds-Karp algorithm.
+# capacities: Dict [node: Dict [neighbour: capacity]]
+def max_flow(capacities: Dict[Hashable, Dict[Hashable, int]], source: Hashable, sink: Hashable) -> int:
+    return solve_max_flow(capacities, source, sink)[0]
+
+# Same as max_flow, but also returns the residual capacities: the flow on an edge is its
+# capacity minus its residual capacity
+def solve_max_flow(capacities: Dict[Hashable, Dict[Hashable, int]], source: Hashable, sink: Hashable
+                    ) -> Tuple[int, Dict[Hashable, Dict[Hashable, int]]]:
+    residual = build_residual(capacities, source, sink)
+    return augment_flow(residual, source, sink), residual
+
+# Residual capacities of the network without any flow, with the reverse edges
+def build_residual(capacities: Dict[Hashable, Dict[Hashable, int]], source: Hashable, sink: Hashable
+                    ) -> Dict[Hashable, Dict[Hashable, int]]:
+    residual = {source: {}, sink: {}}
+    for node, edges in capacities.items():
+        for neighbour, capacity in edges.items():
+            residual.setdefault(node, {})
+            residual.setdefault(neighbour, {})
+            residual[node][neighbour] = residual[node].get(neighbour, 0) + capacity
+            residual[neighbour].setdefault(node, 0)
+    return residual
+
+# Pushes flow along shortest augmenting paths until there is none left. The residual
+# capacities may already hold some flow. Returns the flow that was added.
+def augment_flow(residual: Dict[Hashable, Dict[Hashable, int]], source: Hashable, sink: Hashable) -> int:
+    flow = 0
+    while True:
+        # Shortest path that still has residual capacity
+        parents = {source: None}
+        queue = deque([source])
+        while queue and sink not in parents:
+            node = queue.popleft()
+            for neighbour, capacity in residual[node].items():
+                if capacity > 0 and neighbour not in parents:
+                    parents[neighbour] = node
+                    queue.append(neighbour)
+
+        if sink not in parents:
+            return flow
+
+        path = []
+        node = sink
+        while parents[node] is not None:
+            path.append((parents[node], node))
+            node = parents[node]
+
+        bottleneck = min(residual[start][end] for start, end in path)
+        for start, end in path:
+            residual[start][end] -= bottleneck
+            residual[end][start] += bottleneck
+
+        flow += bottleneck
+
+# Nodes that can still be reached from the source once the flow is maximum. They form the
+# source side of a minimum cut.
+def reachable_nodes(residual: Dict[Hashable, Dict[Hashable, int]], source: Hashable) -> Set[Hashable]:
+    reached = {source}
+    queue = deque([source])
+    while queue:
+        node = queue.popleft()
+        for neighbour, capacity in residual[node].items():
+            if capacity > 0 and neighbour not in reached:
+                reached.add(neighbour)
+                queue.append(neighbour)
+
+    return reached
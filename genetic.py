@@ -0,0 +1,323 @@
+import copy
+import math
+import random
+from typing import Tuple
+import numpy as np
+from instance import Instance
+from schedule import Schedule
+from state import State
+
+# Rows of an encoded timetable. A timetable is a (3, nr_genes) array: gene i is one possible
+# assignment of course gene_course[i], with its classroom, teacher and time slot indexes.
+# Genes with classroom -1 are not used.
+CLASSROOM, TEACHER, TIME_SLOT = 0, 1, 2
+UNUSED = -1
+
+# A hard conflict is worse than any number of soft conflicts
+HARD_CONFLICT_WEIGHT = 1000
+
+class TimetableEncoding:
+    # Integer encoding of the timetables of an instance, with lookup tables that let a whole
+    # population be evaluated at once
+    def __init__(self, instance: Instance):
+        self.instance = instance
+        self.courses = list(instance.courses)
+        self.classrooms = list(instance.classrooms)
+        self.teachers = list(instance.teachers)
+        self.time_slots = list(instance.available_time_slots)
+        self.time_slot_indexes = {time_slot: index for index, time_slot in enumerate(self.time_slots)}
+
+        self.need = np.array([instance.courses[course] for course in self.courses])
+        self.capacity = np.array([instance.classrooms[name].capacity for name in self.classrooms])
+        self.can_host = np.array([[course in instance.classrooms[name].subjects for name in self.classrooms]
+                                    for course in self.courses])
+        self.can_teach = np.array([[course in instance.teachers[name].courses for name in self.teachers]
+                                    for course in self.courses])
+        self.prefers = np.array([[time_slot in instance.teachers[name].preffered_time_slots_set
+                                    for time_slot in self.time_slots] for name in self.teachers])
+
+        # That many assignments always cover a course, since each one gets at least the smallest
+        # compatible classroom
+        gene_course = []
+        for index, course in enumerate(self.courses):
+            capacities = self.capacity[self.can_host[index]]
+            if len(capacities):
+                gene_course += [index] * math.ceil(self.need[index] / capacities.min())
+        self.gene_course = np.array(gene_course, dtype=int)
+        self.genes_by_course = [np.flatnonzero(self.gene_course == index) for index in range(len(self.courses))]
+
+        self.classrooms_by_course = [np.flatnonzero(row) for row in self.can_host]
+        self.teachers_by_course = [np.flatnonzero(row) for row in self.can_teach]
+        self.preffered_time_slots = [np.flatnonzero(row) for row in self.prefers]
+
+    def get_nr_genes(self) -> int:
+        return len(self.gene_course)
+
+    def encode(self, state: State) -> np.ndarray:
+        genes = np.full((3, self.get_nr_genes()), UNUSED, dtype=int)
+        classroom_indexes = {name: index for index, name in enumerate(self.classrooms)}
+        teacher_indexes = {name: index for index, name in enumerate(self.teachers)}
+
+        for course, assignments in state.get_schedule().get_assignments().items():
+            course_genes = self.genes_by_course[self.courses.index(course)]
+            # More assignments than genes are never needed to cover the course
+            for gene, (classroom, teacher, time_slot) in zip(course_genes, assignments):
+                genes[:, gene] = (classroom_indexes[classroom], teacher_indexes[teacher],
+                                    self.time_slot_indexes[time_slot])
+
+        return genes
+
+    def decode(self, genes: np.ndarray) -> State:
+        schedule = Schedule(self.instance)
+        for gene in np.flatnonzero(genes[CLASSROOM] != UNUSED):
+            schedule.add_course(self.courses[self.gene_course[gene]],
+                                self.classrooms[genes[CLASSROOM, gene]],
+                                self.teachers[genes[TEACHER, gene]],
+                                self.time_slots[genes[TIME_SLOT, gene]])
+
+        state = State(schedule)
+        state.compute_hard_conflicts()
+        state.compute_soft_conflicts()
+        return state
+
+    # Counts the hard and soft conflicts of a whole population, a (size, 3, nr_genes) array,
+    # the same way State does. Returns two arrays with one value per timetable.
+    def evaluate(self, population: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        size, _, nr_genes = population.shape
+        nr_time_slots = len(self.time_slots)
+        used = population[:, CLASSROOM] != UNUSED
+        rows = np.broadcast_to(np.arange(size)[:, None], used.shape)
+        courses = np.broadcast_to(self.gene_course, used.shape)
+        classrooms = population[:, CLASSROOM]
+        teachers = population[:, TEACHER]
+        time_slots = population[:, TIME_SLOT]
+
+        # Unsuitable classrooms and teachers
+        hard = (used & ~self.can_host[courses, classrooms]).sum(axis=1)
+        hard += (used & ~self.can_teach[courses, teachers]).sum(axis=1)
+
+        # Courses without enough seats
+        seats = np.zeros((size, len(self.courses)), dtype=int)
+        np.add.at(seats, (rows[used], courses[used]), self.capacity[classrooms[used]])
+        hard += (seats < self.need).sum(axis=1)
+
+        # Overlaps: equal (classroom, time slot) or (teacher, time slot) keys, once sorted,
+        # are next to each other. Unused genes get distinct negative keys. A classroom counts
+        # one conflict per overlapping time slot, a teacher one per extra course.
+        unused_keys = -1 - np.arange(nr_genes)
+        classroom_keys = np.sort(np.where(used, classrooms * nr_time_slots + time_slots, unused_keys), axis=1)
+        repeated = np.zeros(classroom_keys.shape, dtype=bool)
+        repeated[:, 1:] = classroom_keys[:, 1:] == classroom_keys[:, :-1]
+        hard += (repeated[:, 1:] & ~repeated[:, :-1] & (classroom_keys[:, 1:] >= 0)).sum(axis=1)
+
+        teacher_keys = np.sort(np.where(used, teachers * nr_time_slots + time_slots, unused_keys), axis=1)
+        repeated = np.zeros(teacher_keys.shape, dtype=bool)
+        repeated[:, 1:] = teacher_keys[:, 1:] == teacher_keys[:, :-1]
+        busy = (teacher_keys >= 0) & ~repeated
+        hard += (repeated & (teacher_keys >= 0)).sum(axis=1)
+
+        # Teachers busy in more than 7 time slots, and busy time slots they do not prefer
+        busy_teachers = teacher_keys[busy] // nr_time_slots
+        busy_time_slots = teacher_keys[busy] % nr_time_slots
+        nr_busy_time_slots = np.zeros((size, len(self.teachers)), dtype=int)
+        np.add.at(nr_busy_time_slots, (rows[busy], busy_teachers), 1)
+        hard += (nr_busy_time_slots > 7).sum(axis=1)
+
+        soft = np.zeros(size, dtype=int)
+        np.add.at(soft, rows[busy], ~self.prefers[busy_teachers, busy_time_slots])
+
+        return hard, soft
+
+    # Takes each course's genes from one of the parents, then moves the assignments that
+    # end up in an occupied (classroom, time slot) to a free time slot of the same classroom
+    def crossover(self, parent1: np.ndarray, parent2: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        from_parent2 = rng.random(len(self.courses)) < 0.5
+        child = np.where(from_parent2[self.gene_course], parent2, parent1)
+
+        occupied = set()
+        for gene in rng.permutation(self.get_nr_genes()):
+            classroom, teacher, time_slot = child[:, gene]
+            if classroom == UNUSED:
+                continue
+
+            if (classroom, time_slot) in occupied:
+                free_time_slots = [slot for slot in self.preffered_time_slots[teacher]
+                                    if (classroom, slot) not in occupied]
+                if not free_time_slots:
+                    child[:, gene] = UNUSED
+                    continue
+                time_slot = child[TIME_SLOT, gene] = rng.choice(free_time_slots)
+
+            occupied.add((classroom, time_slot))
+
+        return child
+
+    # Changes the classroom, the teacher or the time slot of random genes, or turns them on or off
+    def mutate(self, genes: np.ndarray, rate: float, rng: np.random.Generator):
+        for gene in np.flatnonzero(rng.random(self.get_nr_genes()) < rate):
+            self.mutate_gene(genes, gene, rng)
+
+    def mutate_gene(self, genes: np.ndarray, gene: int, rng: np.random.Generator):
+        course = self.gene_course[gene]
+        if genes[CLASSROOM, gene] == UNUSED:
+            if len(self.teachers_by_course[course]) == 0:
+                return
+            teacher = rng.choice(self.teachers_by_course[course])
+            genes[:, gene] = (rng.choice(self.classrooms_by_course[course]), teacher,
+                                rng.integers(len(self.time_slots)))
+            return
+
+        change = rng.integers(4)
+        if change == CLASSROOM:
+            genes[CLASSROOM, gene] = rng.choice(self.classrooms_by_course[course])
+        elif change == TEACHER and len(self.teachers_by_course[course]):
+            genes[TEACHER, gene] = rng.choice(self.teachers_by_course[course])
+        elif change == TIME_SLOT:
+            preffered_time_slots = self.preffered_time_slots[genes[TEACHER, gene]]
+            genes[TIME_SLOT, gene] = (rng.choice(preffered_time_slots) if len(preffered_time_slots)
+                                        else rng.integers(len(self.time_slots)))
+        else:
+            genes[:, gene] = UNUSED
+
+    # Moves a used gene to a time slot its teacher prefers and is free in, in a free classroom
+    # of its course with at least as many seats
+    def relocate_gene(self, genes: np.ndarray, gene: int, rng: np.random.Generator):
+        if genes[CLASSROOM, gene] == UNUSED:
+            return
+
+        used = genes[CLASSROOM] != UNUSED
+        teacher = genes[TEACHER, gene]
+        busy_time_slots = set(genes[TIME_SLOT, used & (genes[TEACHER] == teacher)])
+        taken = set(zip(genes[CLASSROOM, used], genes[TIME_SLOT, used]))
+        capacity = self.capacity[genes[CLASSROOM, gene]]
+        options = [(classroom, time_slot) for time_slot in self.preffered_time_slots[teacher]
+                    if time_slot not in busy_time_slots
+                    for classroom in self.classrooms_by_course[self.gene_course[gene]]
+                    if self.capacity[classroom] >= capacity and (classroom, time_slot) not in taken]
+        if options:
+            genes[CLASSROOM, gene], genes[TIME_SLOT, gene] = options[rng.integers(len(options))]
+
+    # Swaps the time slot of a used gene with the one of another gene in the same classroom, or
+    # its teacher with the one of another gene whose course both teachers can teach
+    def swap_genes(self, genes: np.ndarray, gene: int, rng: np.random.Generator):
+        if genes[CLASSROOM, gene] == UNUSED:
+            return
+
+        used = genes[CLASSROOM] != UNUSED
+        if rng.random() < 0.5:
+            others = np.flatnonzero(used & (genes[CLASSROOM] == genes[CLASSROOM, gene]))
+            row = TIME_SLOT
+        else:
+            others = np.flatnonzero(used & self.can_teach[self.gene_course, genes[TEACHER, gene]] &
+                                    self.can_teach[self.gene_course[gene], genes[TEACHER]])
+            row = TEACHER
+        if len(others):
+            other = rng.choice(others)
+            genes[row, gene], genes[row, other] = genes[row, other], genes[row, gene]
+
+    # Used genes out of their teacher's preffered time slots, or sharing their classroom or
+    # teacher time slot with another gene: the ones worth changing
+    def conflicted_genes(self, genes: np.ndarray) -> np.ndarray:
+        used = np.flatnonzero(genes[CLASSROOM] != UNUSED)
+        classrooms, teachers, time_slots = genes[:, used]
+        conflicted = ~self.prefers[teachers, time_slots]
+        for keys in (classrooms * len(self.time_slots) + time_slots, teachers * len(self.time_slots) + time_slots):
+            _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+            conflicted |= counts[inverse] > 1
+        return used[conflicted]
+
+    # Hill climbing on a whole population at once: in each step, every timetable gets
+    # nr_neighbours neighbours that change, relocate or swap one gene (a conflicted one if there
+    # is any), all of them are evaluated as one batch, and each timetable moves to its best
+    # neighbour unless it is worse. Changes population and returns the new fitnesses.
+    def polish(self, population: np.ndarray, fitnesses: np.ndarray, nr_steps: int, nr_neighbours: int,
+                rng: np.random.Generator) -> np.ndarray:
+        size = len(population)
+        for _ in range(nr_steps):
+            neighbours = np.repeat(population, nr_neighbours, axis=0)
+            for index, genes in enumerate(population):
+                candidates = self.conflicted_genes(genes)
+                if not len(candidates):
+                    candidates = np.arange(self.get_nr_genes())
+                for neighbour in neighbours[index * nr_neighbours:(index + 1) * nr_neighbours]:
+                    move = rng.integers(3)
+                    if move == 0:
+                        self.mutate_gene(neighbour, rng.choice(candidates), rng)
+                    elif move == 1:
+                        self.relocate_gene(neighbour, rng.choice(candidates), rng)
+                    else:
+                        self.swap_genes(neighbour, rng.choice(candidates), rng)
+
+            neighbour_fitnesses = fitness(*self.evaluate(neighbours)).reshape(size, nr_neighbours)
+            best = neighbour_fitnesses.argmin(axis=1)
+            best_fitnesses = neighbour_fitnesses[np.arange(size), best]
+            accepted = best_fitnesses <= fitnesses
+            population[accepted] = neighbours.reshape((size, nr_neighbours) + population.shape[1:])[
+                                        np.arange(size), best][accepted]
+            fitnesses = np.where(accepted, best_fitnesses, fitnesses)
+
+        return fitnesses
+
+def fitness(hard: np.ndarray, soft: np.ndarray) -> np.ndarray:
+    return hard * HARD_CONFLICT_WEIGHT + soft
+
+def tournament(fitnesses: np.ndarray, rng: np.random.Generator, size: int = 3) -> int:
+    candidates = rng.integers(len(fitnesses), size=size)
+    return candidates[np.argmin(fitnesses[candidates])]
+
+# Memetic algorithm: a genetic algorithm on encoded timetables whose offspring are polished with
+# a batched hill climbing (see polish). The population starts from the greedy schedule, which
+# completes initial_state if there is one (a repaired or warm started timetable), and copies of
+# it with mutated genes, and each generation is evaluated as one NumPy batch. Returns the same
+# tuple as stochastic_hill_climbing, with the number of generations and of evaluated timetables.
+def memetic_algorithm(instance: Instance, population_size: int = 30, max_generations: int = 200,
+                        max_no_improvement: int = 30, nr_elites: int = 2, mutation_rate: float = 0.05,
+                        initial_mutation_rate: float = 0.1, polish_steps: int = 20, nr_neighbours: int = 8,
+                        lower_bounds: Tuple[int, int] = (0, 0),
+                        initial_state: State = None) -> Tuple[bool, int, int, State]:
+    encoding = TimetableEncoding(instance)
+    # Follows the seed of the random module, like the rest of the solvers
+    rng = np.random.default_rng(random.getrandbits(64))
+
+    state = copy.copy(initial_state) if initial_state is not None else State(Schedule(instance))
+    state.generate_greedy_schedule()
+    greedy_genes = encoding.encode(state)
+    population = np.stack([greedy_genes] * population_size)
+    for genes in population[1:]:
+        encoding.mutate(genes, initial_mutation_rate, rng)
+
+    fitnesses = fitness(*encoding.evaluate(population))
+    generations, nr_evaluated, no_improvement = 0, population_size, 0
+    best_fitness = fitnesses.min()
+    # No timetable can do better than the lower bounds on the conflicts
+    target_fitness = fitness(*lower_bounds)
+
+    while (generations < max_generations and no_improvement < max_no_improvement and
+            best_fitness > target_fitness):
+        generations += 1
+
+        # The best timetables survive as they are
+        elites = [population[index] for index in np.argsort(fitnesses)[:nr_elites]]
+        offspring = []
+        while len(offspring) < population_size - nr_elites:
+            child = encoding.crossover(population[tournament(fitnesses, rng)],
+                                        population[tournament(fitnesses, rng)], rng)
+            encoding.mutate(child, mutation_rate, rng)
+            offspring.append(child)
+
+        offspring = np.stack(offspring)
+        offspring_fitnesses = encoding.polish(offspring, fitness(*encoding.evaluate(offspring)),
+                                                polish_steps, nr_neighbours, rng)
+        nr_evaluated += len(offspring) * (1 + polish_steps * nr_neighbours)
+
+        population = np.concatenate([np.stack(elites), offspring])
+        fitnesses = np.concatenate([fitnesses[np.argsort(fitnesses)[:nr_elites]], offspring_fitnesses])
+
+        if fitnesses.min() < best_fitness:
+            best_fitness = fitnesses.min()
+            no_improvement = 0
+        else:
+            no_improvement += 1
+
+    best_state = encoding.decode(population[np.argmin(fitnesses)])
+    return best_state.is_final(), generations, nr_evaluated, best_state
@@ -0,0 +1,173 @@
+from typing import Dict, Hashable, List, Tuple
+from classroom import ClassroomInfo
+from teacher import TeacherInfo
+
+class Instance:
+    # Read-only description of a timetabling problem, parsed once from the input data.
+    # It holds no search state, so a single instance can back any number of schedules
+    # and be shared between threads or sent to other processes.
+    def __init__(self, in_data: dict):
+        intervals = tuple(in_data['Intervale']) # List of tuples
+        days = tuple(in_data['Zile']) # List of strings
+
+        self.intervals = intervals
+        self.days = days
+        self.courses = dict(in_data['Materii']) # Dict [course_name: nr_students]
+        self.available_time_slots = tuple(generate_available_time_slots(intervals, days))
+
+        self.classrooms = {}  # Dict [classroom_name: ClassroomInfo]
+        for name, classroom in in_data['Sali'].items():
+            self.classrooms[name] = ClassroomInfo(name, classroom['Capacitate'], classroom['Materii'])
+
+        self.teachers = {}  # Dict [teacher_name: TeacherInfo]
+        for name, teacher in in_data['Profesori'].items():
+            preffered_time_slots = find_preffered_time_slots(teacher['Constrangeri'], days, intervals)
+            self.teachers[name] = TeacherInfo(name, teacher['Constrangeri'], teacher['Materii'],
+                                                preffered_time_slots)
+
+        # Interchangeable classrooms (same capacity and subjects), teachers (same courses and
+        # preffered time slots) and time slots (preffered by the same teachers).
+        self.classroom_classes = find_equivalence_classes(
+            {name: (classroom.capacity, frozenset(classroom.subjects))
+                for name, classroom in self.classrooms.items()})
+        self.teacher_classes = find_equivalence_classes(
+            {name: (frozenset(teacher.courses), teacher.preffered_time_slots_set)
+                for name, teacher in self.teachers.items()})
+        self.time_slot_classes = find_equivalence_classes(
+            {time_slot: frozenset(name for name, teacher in self.teachers.items()
+                                    if time_slot in teacher.preffered_time_slots_set)
+                for time_slot in self.available_time_slots})
+
+        # For each course, the classrooms that can host it from the largest to the smallest
+        # and the teachers that can teach it
+        self.classrooms_by_course = {course: tuple(sorted(
+                                        (name for name, classroom in self.classrooms.items()
+                                            if course in classroom.subjects),
+                                        key=lambda name: -self.classrooms[name].capacity))
+                                        for course in self.courses}
+        self.teachers_by_course = {course: tuple(name for name, teacher in self.teachers.items()
+                                                    if course in teacher.courses)
+                                    for course in self.courses}
+
+        # Groups of courses, teachers and classrooms that never share a teacher or a classroom
+        self.components = find_components(self.courses, self.teachers, self.classrooms)
+
+    def get_classrooms_by_course(self, course: str) -> Tuple[str]:
+        return self.classrooms_by_course[course]
+
+    def get_teachers_by_course(self, course: str) -> Tuple[str]:
+        return self.teachers_by_course[course]
+
+    def get_components(self) -> List[Tuple[Tuple[str], Tuple[str], Tuple[str]]]:
+        return self.components
+
+    # Builds the instance of a single component: its courses, teachers and classrooms,
+    # with the same days and intervals
+    def get_component_instance(self, component: Tuple[Tuple[str], Tuple[str], Tuple[str]]) -> 'Instance':
+        courses, teachers, classrooms = component
+        return Instance({
+            'Intervale': list(self.intervals),
+            'Zile': list(self.days),
+            'Materii': {course: self.courses[course] for course in courses},
+            'Sali': {name: {'Capacitate': self.classrooms[name].capacity,
+                            'Materii': list(self.classrooms[name].subjects)} for name in classrooms},
+            'Profesori': {name: {'Constrangeri': list(self.teachers[name].constraints),
+                                'Materii': list(self.teachers[name].courses)} for name in teachers},
+        })
+
+    # Being read-only, the instance can be shared instead of copied
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+# Groups the items that have the same key. Returns, for each item, the items of its
+# class in their original order.
+def find_equivalence_classes(keys: Dict[Hashable, Hashable]) -> Dict[Hashable, Tuple[Hashable]]:
+    members_by_key = {}
+    for item, key in keys.items():
+        members_by_key.setdefault(key, []).append(item)
+
+    return {item: tuple(members_by_key[key]) for item, key in keys.items()}
+
+# Connected components of the graph linking each course to the teachers that can teach it and
+# to the classrooms that can host it. Returns (courses, teachers, classrooms) tuples, the largest
+# component first. Teachers and classrooms without any of the courses are left out.
+def find_components(courses: Dict[str, int], teachers: Dict[str, TeacherInfo],
+                    classrooms: Dict[str, ClassroomInfo]) -> List[Tuple[Tuple[str], Tuple[str], Tuple[str]]]:
+    parents = {}
+
+    def find(node):
+        root = node
+        while parents.setdefault(root, root) != root:
+            root = parents[root]
+        # Path compression
+        while parents[node] != root:
+            parents[node], node = root, parents[node]
+        return root
+
+    for course in courses:
+        find(('course', course))
+    for name, teacher in teachers.items():
+        for course in teacher.courses:
+            if course in courses:
+                parents[find(('teacher', name))] = find(('course', course))
+    for name, classroom in classrooms.items():
+        for course in classroom.subjects:
+            if course in courses:
+                parents[find(('classroom', name))] = find(('course', course))
+
+    members_by_root = {}
+    for kind, name in list(parents):
+        members = members_by_root.setdefault(find((kind, name)), {'course': [], 'teacher': [], 'classroom': []})
+        members[kind].append(name)
+
+    components = [(tuple(members['course']), tuple(members['teacher']), tuple(members['classroom']))
+                    for members in members_by_root.values() if members['course']]
+    return sorted(components, key=lambda component: len(component[0]), reverse=True)
+
+def generate_available_time_slots( intervals: List[Tuple[int, int]], days: List[str]
+                                    ) -> List[Tuple[str, Tuple[int, int]]]:
+
+    time_slots = [] # List of pairs (day, interval)
+
+    for day in days:
+        for interval in intervals:
+            time_slots.append((day, interval))
+    return time_slots
+
+# Checks if interval1 is included in interval2
+def included_in_interval(interval1, interval2):
+    # convert the intervals to a tuple
+    if type(interval1) == str:
+        interval1 = eval(interval1)
+
+    if type(interval2) == str:
+        interval2 = eval(interval2)
+
+    return interval1[0] >= interval2[0] and interval1[1] <= interval2[1]
+
+def find_preffered_time_slots(constraints: List[str], days: List[str],
+                                intervals: List[str]) -> List[Tuple[str, Tuple[int, int]]]:
+    available_time_slots = []
+
+    for constraint in constraints:
+        if constraint.startswith('!'):
+            if '-' in constraint:
+                banned_interval = convert_interval_format(constraint[1:])
+                intervals = [interval for interval in intervals if
+                                not included_in_interval(interval, banned_interval)]
+            else:
+                days = [day for day in days if day != constraint[1:]]
+
+    for day in days:
+        for interval in intervals:
+            available_time_slots.append((day, interval))
+
+    return available_time_slots
+
+# Convert interval in format h1-h2 to a string like (h1, h2)
+def convert_interval_format(interval: str) -> str:
+    interval = "(" + interval.replace('-', ', ') + ")"
+    return interval
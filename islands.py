@@ -0,0 +1,146 @@
+import random
+import multiprocessing
+from typing import List, Tuple
+import solver
+import neighbourhoods
+import min_conflicts
+from instance import Instance
+from schedule import Schedule
+from state import State, MOVES
+
+# Island model: each worker process improves its own small population with a local search
+# (min-conflicts or hill climbing), in epochs of a few hundred iterations. A member that gets
+# stuck starts again from a perturbed copy of the best member of its island. After every
+# migration_interval epochs, an island sends its best timetable to the next island of a ring,
+# which takes it in place of its worst member if it is better. Timetables travel as lists of
+# assignments through the islands' queues. All the islands stop as soon as one of them reaches
+# the lower bounds.
+
+def build_state(instance: Instance, assignments: List[neighbourhoods.Assignment]) -> State:
+    schedule = Schedule(instance)
+    for course, classroom, teacher, time_slot in assignments:
+        schedule.add_course(course, classroom, teacher, time_slot)
+
+    state = State(schedule)
+    state.compute_hard_conflicts()
+    state.compute_soft_conflicts()
+    return state
+
+def conflicts(state: State) -> Tuple[int, int]:
+    return state.get_hard_conflicts(), state.get_soft_conflicts()
+
+# Applies random moves whatever their outcome, to leave a local minimum
+def perturb(state: State, nr_moves: int) -> State:
+    for _ in range(nr_moves):
+        neighbor_state = state.apply_move(random.choice(MOVES))
+        if neighbor_state is not None:
+            state = neighbor_state
+    return state
+
+# Runs one epoch of the local search on a member. Returns the timetable it reached, the number
+# of iterations and whether it got stuck: it stopped early without reaching the lower bounds.
+def improve(state: State, parameters: dict, callback) -> Tuple[State, int, bool]:
+    lower_bounds = parameters['lower_bounds']
+    if parameters['local_search'] == 'mc':
+        _, iters, _, state = min_conflicts.min_conflicts(state, parameters['epoch_iters'],
+                                                            parameters['max_no_improvement'],
+                                                            callback=callback, lower_bounds=lower_bounds)
+    else:
+        _, iters, _, state = solver.stochastic_hill_climbing(state, parameters['epoch_iters'],
+                                                            parameters['max_no_improvement'],
+                                                            callback, lower_bounds, parameters['moves'])
+
+    return state, iters, iters < parameters['epoch_iters'] and not solver.reaches_lower_bounds(state, lower_bounds)
+
+def island_worker(index: int, seed: int, initial_state: State, parameters: dict,
+                    inbox, outbox, stop, results):
+    random.seed(seed)
+    lower_bounds = parameters['lower_bounds']
+    callback = lambda iters, state: stop.is_set()
+    nr_iters, nr_migrants = 0, 0
+
+    # The first island starts from the greedy schedule, everything else from random ones
+    population = []
+    for member in range(parameters['population_size']):
+        state = initial_state.__copy__()
+        solver.generate_initial_schedule(state, 'greedy' if index == 0 and member == 0 else 'random')
+        population.append(state)
+    best_state = min(population, key=conflicts)
+
+    for epoch in range(parameters['max_epochs']):
+        for member, state in enumerate(population):
+            if stop.is_set() or solver.reaches_lower_bounds(best_state, lower_bounds):
+                break
+
+            state, iters, stuck = improve(state, parameters, callback)
+            nr_iters += iters
+            if conflicts(state) < conflicts(best_state):
+                best_state = state
+
+            # Local minimum, or too long without improving
+            if stuck:
+                state = perturb(best_state, parameters['perturbation'])
+            population[member] = state
+
+        if solver.reaches_lower_bounds(best_state, lower_bounds):
+            stop.set()
+        if stop.is_set():
+            break
+
+        if (epoch + 1) % parameters['migration_interval'] == 0:
+            outbox.put(neighbourhoods.list_assignments(best_state.get_schedule()))
+            while not inbox.empty():
+                migrant = build_state(initial_state.get_schedule().get_instance(), inbox.get())
+                worst = max(range(len(population)), key=lambda member: conflicts(population[member]))
+                if conflicts(migrant) < conflicts(population[worst]):
+                    population[worst] = migrant
+                    nr_migrants += 1
+                    if conflicts(migrant) < conflicts(best_state):
+                        best_state = migrant
+
+    # Migrants nobody will read do not keep the island from exiting
+    outbox.cancel_join_thread()
+    results.put((neighbourhoods.list_assignments(best_state.get_schedule()), nr_iters, nr_migrants))
+
+# Runs the island model on nr_islands processes (all the CPUs by default). With migrations off
+# (migration_interval 0 or None), the islands are independent restarts. Returns whether the best
+# timetable is final, the number of local search iterations and of migrants taken in by all
+# the islands, and the best timetable.
+def island_search(initial_state: State, nr_islands: int = None, local_search: str = 'mc',
+                    population_size: int = 4, max_epochs: int = 20, epoch_iters: int = 500,
+                    max_no_improvement: int = 200, migration_interval: int = 1, perturbation: int = 3,
+                    lower_bounds: Tuple[int, int] = (0, 0),
+                    moves: List[str] = None) -> Tuple[bool, int, int, State]:
+    nr_islands = nr_islands or multiprocessing.cpu_count()
+    parameters = {'local_search': local_search, 'population_size': population_size,
+                    'max_epochs': max_epochs, 'epoch_iters': epoch_iters,
+                    'max_no_improvement': max_no_improvement,
+                    'migration_interval': migration_interval or max_epochs + 1,
+                    'perturbation': perturbation, 'lower_bounds': lower_bounds, 'moves': moves}
+
+    # Island i sends to queue i + 1 and reads from queue i
+    queues = [multiprocessing.Queue() for _ in range(nr_islands)]
+    stop = multiprocessing.Event()
+    results = multiprocessing.Queue()
+
+    workers = [multiprocessing.Process(target=island_worker,
+                                        args=(index, random.getrandbits(32), initial_state, parameters,
+                                                queues[index], queues[(index + 1) % nr_islands], stop, results))
+                for index in range(nr_islands)]
+    for worker in workers:
+        worker.start()
+
+    instance = initial_state.get_schedule().get_instance()
+    best_state, nr_iters, nr_migrants = None, 0, 0
+    for _ in range(nr_islands):
+        assignments, iters, migrants = results.get()
+        state = build_state(instance, assignments)
+        nr_iters += iters
+        nr_migrants += migrants
+        if best_state is None or conflicts(state) < conflicts(best_state):
+            best_state = state
+
+    for worker in workers:
+        worker.join()
+
+    return best_state.is_final(), nr_iters, nr_migrants, best_state
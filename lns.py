@@ -0,0 +1,91 @@
+import random
+from typing import List, Tuple
+import solver
+import neighbourhoods
+from neighbourhoods import Assignment
+from state import State, rebuild_state
+
+DESTROY_OPERATORS = ['day', 'classroom', 'teacher', 'conflicted']
+
+# Large neighbourhood search: repeatedly unassigns a whole region of the timetable and fills
+# it back in with the CSP, which only uses preffered time slots and never breaks a hard
+# constraint. The CSP gets at most node_limit nodes per region; a repaired timetable is kept
+# when it has no more hard and soft conflicts than the current one. The search stops early
+# once the timetable reaches the lower bounds on the conflicts.
+def large_neighbourhood_search(initial: State, max_iters: int = 200, node_limit: int = 500,
+                                max_no_improvement: int = 50, max_conflicted: int = 10,
+                                lower_bounds: Tuple[int, int] = (0, 0)) -> Tuple[bool, int, int, State]:
+    # Works on its own copy of the initial state, with the conflicts counted afresh, as states
+    # like those of repair.warm_start_state come without them
+    state = rebuild_state(initial)
+    iters, nr_nodes, no_improvement = 0, 0, 0
+
+    while (iters < max_iters and no_improvement < max_no_improvement and
+            not solver.reaches_lower_bounds(state, lower_bounds)):
+        iters += 1
+
+        operator = random.choice(DESTROY_OPERATORS)
+        region = choose_region(state, operator, max_conflicted)
+        if not region:
+            no_improvement += 1
+            continue
+
+        partial_state = destroy(state, region)
+        csp = solver.CSP(partial_state)
+        csp.node_callback = lambda csp: csp.nr_nodes >= node_limit
+        new_state = csp.solve()
+        nr_nodes += csp.nr_nodes
+
+        if new_state is None:
+            no_improvement += 1
+            continue
+
+        new_state.compute_hard_conflicts()
+        new_state.compute_soft_conflicts()
+
+        if (new_state.get_hard_conflicts() > state.get_hard_conflicts() or
+            new_state.get_soft_conflicts() > state.get_soft_conflicts()):
+            no_improvement += 1
+            continue
+
+        if (new_state.get_hard_conflicts() == state.get_hard_conflicts() and
+            new_state.get_soft_conflicts() == state.get_soft_conflicts()):
+            no_improvement += 1
+        else:
+            no_improvement = 0
+
+        state = new_state
+
+    return state.is_final(), iters, nr_nodes, state
+
+# Picks the assignments to undo: those of a random day, classroom or teacher, or the
+# ones taking part in the most conflicts
+def choose_region(state: State, operator: str, max_conflicted: int) -> List[Assignment]:
+    schedule = state.get_schedule()
+    assignments = neighbourhoods.list_assignments(schedule)
+
+    if operator == 'day':
+        day = random.choice(schedule.days)
+        return [assignment for assignment in assignments if assignment[3][0] == day]
+    elif operator == 'classroom':
+        classroom = random.choice(list(schedule.get_classrooms()))
+        return [assignment for assignment in assignments if assignment[1] == classroom]
+    elif operator == 'teacher':
+        teacher = random.choice(list(schedule.get_teachers()))
+        return [assignment for assignment in assignments if assignment[2] == teacher]
+
+    scored = [(neighbourhoods.count_conflicts(schedule, assignment), assignment) for assignment in assignments]
+    scored = [item for item in scored if item[0] > 0]
+    random.shuffle(scored)
+    scored.sort(key=lambda item: item[0], reverse=True)
+    return [assignment for _, assignment in scored[:max_conflicted]]
+
+def destroy(state: State, region: List[Assignment]) -> State:
+    partial_state = state.__copy__()
+    schedule = partial_state.get_schedule()
+
+    for course, classroom, teacher, time_slot in region:
+        schedule.remove_course(course, classroom, teacher, time_slot)
+        partial_state.increase_nr_seats_per_course(course, -schedule.get_classrooms()[classroom].get_capacity())
+
+    return partial_state
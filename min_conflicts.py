@@ -0,0 +1,206 @@
+import random
+from typing import Dict, List, Tuple
+import solver
+import neighbourhoods
+from neighbourhoods import Assignment
+from state import State, rebuild_state
+
+class ConflictIndex:
+    # Live index of the conflicts of a timetable: the assignments that take part in a classroom
+    # or teacher overlap, belong to a teacher with more than 7 time slots or are out of the
+    # teacher's preffered time slots, and the courses without enough seats. The timetable is
+    # only changed through add and remove, which update the index and the conflicts of the
+    # state from the few teachers, classrooms and courses they touch.
+    def __init__(self, state: State):
+        self.state = rebuild_state(state)
+        self.schedule = self.state.get_schedule()
+
+        self.assignments_by_classroom_slot = {}  # Dict [(classroom, time_slot): List[Assignment]]
+        self.assignments_by_teacher_slot = {}  # Dict [(teacher, time_slot): List[Assignment]]
+        self.assignments_by_teacher = {}  # Dict [teacher: List[Assignment]]
+        # Insertion ordered, so that the search only depends on the seed
+        self.conflicted = {}  # Dict [Assignment: None]
+        self.uncovered = {}  # Dict [course: None]
+
+        assignments = neighbourhoods.list_assignments(self.schedule)
+        for assignment in assignments:
+            self.index_assignment(assignment)
+        for assignment in assignments:
+            self.refresh_assignment(assignment)
+        for course in self.schedule.courses:
+            self.refresh_course(course)
+
+        # Values of each course: the classrooms that can host it, the teachers that can
+        # teach it and any time slot
+        self.values = {}  # Dict [course: List[(classroom, teacher, time_slot)]]
+        for course in self.schedule.courses:
+            self.values[course] = [(classroom_name, teacher_name, time_slot)
+                                    for classroom_name, classroom in self.schedule.classrooms.items()
+                                    if classroom.can_host_course(course)
+                                    for teacher_name, teacher in self.schedule.teachers.items()
+                                    if teacher.can_teach_course(course)
+                                    for time_slot in self.schedule.available_time_slots]
+
+    def get_state(self) -> State:
+        return self.state
+
+    def get_conflicted_assignments(self) -> List[Assignment]:
+        return list(self.conflicted)
+
+    def get_uncovered_courses(self) -> List[str]:
+        return list(self.uncovered)
+
+    def index_assignment(self, assignment: Assignment):
+        _, classroom, teacher, time_slot = assignment
+        self.assignments_by_classroom_slot.setdefault((classroom, time_slot), []).append(assignment)
+        self.assignments_by_teacher_slot.setdefault((teacher, time_slot), []).append(assignment)
+        self.assignments_by_teacher.setdefault(teacher, []).append(assignment)
+
+    def unindex_assignment(self, assignment: Assignment):
+        _, classroom, teacher, time_slot = assignment
+        self.assignments_by_classroom_slot[(classroom, time_slot)].remove(assignment)
+        self.assignments_by_teacher_slot[(teacher, time_slot)].remove(assignment)
+        self.assignments_by_teacher[teacher].remove(assignment)
+
+    def refresh_assignment(self, assignment: Assignment):
+        if neighbourhoods.count_conflicts(self.schedule, assignment):
+            self.conflicted[assignment] = None
+        else:
+            self.conflicted.pop(assignment, None)
+
+    def refresh_course(self, course: str):
+        if self.state.get_nr_seats_per_course().get(course, 0) < self.schedule.courses[course]:
+            self.uncovered[course] = None
+        else:
+            self.uncovered.pop(course, None)
+
+    # Hard and soft conflicts of the state that depend on a teacher, a classroom and a course
+    def local_conflicts(self, course: str, classroom: str, teacher: str) -> Tuple[int, int]:
+        hard_conflicts, soft_conflicts = neighbourhoods.resource_conflicts(self.schedule, [teacher], [classroom])
+        return hard_conflicts + (course in self.uncovered), soft_conflicts
+
+    def add(self, assignment: Assignment):
+        self.change(assignment, 1)
+
+    def remove(self, assignment: Assignment):
+        self.change(assignment, -1)
+
+    def change(self, assignment: Assignment, delta: int):
+        course, classroom, teacher, time_slot = assignment
+        hard_before, soft_before = self.local_conflicts(course, classroom, teacher)
+        was_over_limit = len(self.schedule.teachers[teacher].get_courses_by_time_slot()) > 7
+
+        if delta > 0:
+            self.schedule.add_course(course, classroom, teacher, time_slot)
+            self.index_assignment(assignment)
+        else:
+            self.schedule.remove_course(course, classroom, teacher, time_slot)
+            self.unindex_assignment(assignment)
+            self.conflicted.pop(assignment, None)
+        self.state.increase_nr_seats_per_course(course, delta * self.schedule.classrooms[classroom].get_capacity())
+        self.refresh_course(course)
+
+        # Only the assignments sharing the classroom or the teacher in the time slot can change,
+        # and all the teacher's ones when the teacher goes over the limit of 7 time slots or back
+        affected = (self.assignments_by_classroom_slot[(classroom, time_slot)] +
+                    self.assignments_by_teacher_slot[(teacher, time_slot)])
+        if was_over_limit != (len(self.schedule.teachers[teacher].get_courses_by_time_slot()) > 7):
+            affected = affected + self.assignments_by_teacher[teacher]
+        for other_assignment in affected:
+            self.refresh_assignment(other_assignment)
+
+        # The suitability of an assignment never changes, it only comes and goes with it
+        unsuitable = ((not self.schedule.teachers[teacher].can_teach_course(course)) +
+                        (not self.schedule.classrooms[classroom].can_host_course(course)))
+        hard_after, soft_after = self.local_conflicts(course, classroom, teacher)
+        self.state.hard_conflicts += hard_after - hard_before + delta * unsuitable
+        self.state.soft_conflicts += soft_after - soft_before
+
+    # Hard and soft conflicts that assigning a course to a value would add, the course
+    # already having the given seats
+    def value_cost(self, course: str, value: Tuple[str, str, Tuple[str, str]], seats: int) -> Tuple[int, int]:
+        classroom_name, teacher_name, time_slot = value
+        teacher = self.schedule.teachers[teacher_name]
+        hard_conflicts = (len(self.assignments_by_classroom_slot.get((classroom_name, time_slot), [])) +
+                            len(self.assignments_by_teacher_slot.get((teacher_name, time_slot), [])))
+        soft_conflicts = 0
+
+        if teacher.is_free_at_time(time_slot):
+            if len(teacher.get_courses_by_time_slot()) >= 7:
+                hard_conflicts += 1
+            if not teacher.prefers_time_slot(time_slot):
+                soft_conflicts += 1
+        if seats + self.schedule.classrooms[classroom_name].get_capacity() < self.schedule.courses[course]:
+            hard_conflicts += 1
+
+        return hard_conflicts, soft_conflicts
+
+    # Min-conflicts step: gives a conflicted assignment, or a new assignment of an uncovered
+    # course, the value that breaks the fewest constraints (hard ones first), ties broken at
+    # random. A conflicted assignment may also be dropped, if its course stays covered without it.
+    # With probability noise the value is random instead. Returns the number of values evaluated.
+    def repair(self, course: str, assignment: Assignment = None, noise: float = 0.0) -> int:
+        if assignment is not None:
+            self.remove(assignment)
+        seats = self.state.get_nr_seats_per_course().get(course, 0)
+        values = self.values[course]
+        if not values:
+            if assignment is not None:
+                self.add(assignment)
+            return 0
+
+        if random.random() < noise:
+            self.add((course,) + random.choice(values))
+            return 1
+
+        best_values, best_cost = [], None
+        if assignment is not None and seats >= self.schedule.courses[course]:
+            best_values, best_cost = [None], (0, 0)
+        for value in values:
+            cost = self.value_cost(course, value, seats)
+            if best_cost is None or cost < best_cost:
+                best_values, best_cost = [value], cost
+            elif cost == best_cost:
+                best_values.append(value)
+
+        value = random.choice(best_values)
+        if value is not None:
+            self.add((course,) + value)
+        return len(values)
+
+# Min-conflicts local search over a live conflict index: each step repairs a random conflicted
+# variable (an assignment in conflict or an uncovered course), so it costs time in the number
+# of conflicts and the values of one course, not in the size of the timetable. Returns the
+# best timetable met, which is copied only when it improves. callback and lower_bounds work
+# as in stochastic_hill_climbing.
+def min_conflicts(initial: State, max_steps: int = 20000, max_no_improvement: int = 2000,
+                    noise: float = 0.1, callback=None,
+                    lower_bounds: Tuple[int, int] = (0, 0)) -> Tuple[bool, int, int, State]:
+    index = ConflictIndex(initial)
+    state = index.get_state()
+    best_state = state.__copy__()
+    steps, nr_values, no_improvement = 0, 0, 0
+
+    while steps < max_steps and no_improvement < max_no_improvement:
+        if callback is not None and callback(steps, state):
+            break
+        if solver.reaches_lower_bounds(best_state, lower_bounds):
+            break
+
+        variables = ([(assignment[0], assignment) for assignment in index.get_conflicted_assignments()] +
+                        [(course, None) for course in index.get_uncovered_courses()])
+        if not variables:
+            break
+
+        steps += 1
+        course, assignment = random.choice(variables)
+        nr_values += index.repair(course, assignment, noise)
+
+        if ((state.get_hard_conflicts(), state.get_soft_conflicts()) <
+            (best_state.get_hard_conflicts(), best_state.get_soft_conflicts())):
+            best_state = state.__copy__()
+            no_improvement = 0
+        else:
+            no_improvement += 1
+
+    return best_state.is_final(), steps, nr_values, best_state
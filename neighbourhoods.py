@@ -0,0 +1,159 @@
+import random
+from typing import Dict, Iterable, List, Tuple
+
+# Compound local search moves that change several assignments at once. Only time slots
+# change, so the suitability of the classrooms and teachers and the seats of the courses stay
+# the same: the conflicts of a neighbour are those of the current state plus the change in the
+# conflicts of the teachers and classrooms the move touches, with no full recount.
+
+# (course, classroom, teacher, time_slot)
+Assignment = Tuple[str, str, str, Tuple[str, str]]
+
+# Hard and soft conflicts of some teachers and classrooms, counted the same way State does
+def resource_conflicts(schedule, teachers: Iterable[str], classrooms: Iterable[str]) -> Tuple[int, int]:
+    hard_conflicts, soft_conflicts = 0, 0
+
+    for name in teachers:
+        teacher = schedule.teachers[name]
+        if len(teacher.get_courses_by_time_slot()) > 7:
+            hard_conflicts += 1
+        hard_conflicts += teacher.count_overlaps()
+        soft_conflicts += len(teacher.get_courses_that_cause_soft_conflicts())
+
+    for name in classrooms:
+        hard_conflicts += schedule.classrooms[name].count_overlaps()
+
+    return hard_conflicts, soft_conflicts
+
+# Moves the given assignments to new time slots on a copy of the state, and updates its
+# conflicts by delta evaluation. moves maps each assignment to its new time slot.
+def move_assignments(state, moves: Dict[Assignment, Tuple[str, str]]):
+    teachers = {teacher for _, _, teacher, _ in moves}
+    classrooms = {classroom for _, classroom, _, _ in moves}
+    hard_before, soft_before = resource_conflicts(state.get_schedule(), teachers, classrooms)
+
+    neighbor_state = state.__copy__()
+    schedule = neighbor_state.get_schedule()
+    for course, classroom, teacher, time_slot in moves:
+        schedule.remove_course(course, classroom, teacher, time_slot)
+    for (course, classroom, teacher, _), new_time_slot in moves.items():
+        schedule.add_course(course, classroom, teacher, new_time_slot)
+
+    hard_after, soft_after = resource_conflicts(schedule, teachers, classrooms)
+    neighbor_state.hard_conflicts += hard_after - hard_before
+    neighbor_state.soft_conflicts += soft_after - soft_before
+    return neighbor_state
+
+def list_assignments(schedule) -> List[Assignment]:
+    return [(course, classroom, teacher, time_slot)
+            for course, assignments in schedule.get_assignments().items()
+            for classroom, teacher, time_slot in assignments]
+
+# Assignments that break a constraint of their teacher or classroom: outside the preffered
+# time slots or overlapping with another assignment
+def conflicted_assignments(schedule, assignments: List[Assignment]) -> List[Assignment]:
+    return [assignment for assignment in assignments
+            if not schedule.teachers[assignment[2]].prefers_time_slot(assignment[3]) or
+                len(schedule.teachers[assignment[2]].get_courses_by_time_slot()[assignment[3]]) > 1 or
+                len(schedule.classrooms[assignment[1]].get_courses_by_time_slot()[assignment[3]]) > 1]
+
+# Number of hard and soft constraints an assignment takes part in breaking
+def count_conflicts(schedule, assignment: Assignment) -> int:
+    course, classroom_name, teacher_name, time_slot = assignment
+    classroom = schedule.get_classrooms()[classroom_name]
+    teacher = schedule.get_teachers()[teacher_name]
+    conflicts = 0
+
+    if not teacher.prefers_time_slot(time_slot):
+        conflicts += 1
+    if not teacher.can_teach_course(course):
+        conflicts += 1
+    if not classroom.can_host_course(course):
+        conflicts += 1
+    if len(teacher.get_courses_by_time_slot().get(time_slot, [])) > 1:
+        conflicts += 1
+    if len(classroom.get_courses_by_time_slot().get(time_slot, [])) > 1:
+        conflicts += 1
+    if len(teacher.get_courses_by_time_slot()) > 7:
+        conflicts += 1
+
+    return conflicts
+
+# Kempe chain: starting from one assignment, takes every assignment in its time slot or in
+# another one that shares a teacher or a classroom with the chain, and swaps the two time
+# slots of the whole chain. No teacher or classroom of the chain gets new overlaps, so only
+# the preferences change. Returns None if there is nothing to swap.
+def kempe_chain(state):
+    schedule = state.get_schedule()
+    assignments = list_assignments(schedule)
+    if not assignments:
+        return None
+
+    # Conflicted assignments are the ones worth moving
+    course, classroom, teacher, time_slot1 = random.choice(conflicted_assignments(schedule, assignments)
+                                                            or assignments)
+    preffered_time_slots = [time_slot for time_slot in schedule.teachers[teacher].get_preffered_time_slots()
+                                if time_slot != time_slot1]
+    other_time_slots = [time_slot for time_slot in schedule.available_time_slots if time_slot != time_slot1]
+    if not other_time_slots:
+        return None
+    time_slot2 = random.choice(preffered_time_slots or other_time_slots)
+
+    by_resource = {}  # Dict [(teacher or classroom, time slot): List[Assignment]]
+    for assignment in assignments:
+        if assignment[3] in (time_slot1, time_slot2):
+            by_resource.setdefault(('teacher', assignment[2], assignment[3]), []).append(assignment)
+            by_resource.setdefault(('classroom', assignment[1], assignment[3]), []).append(assignment)
+
+    chain = {(course, classroom, teacher, time_slot1)}
+    stack = list(chain)
+    while stack:
+        _, classroom, teacher, _ = stack.pop()
+        for time_slot in (time_slot1, time_slot2):
+            for assignment in (by_resource.get(('teacher', teacher, time_slot), []) +
+                                by_resource.get(('classroom', classroom, time_slot), [])):
+                if assignment not in chain:
+                    chain.add(assignment)
+                    stack.append(assignment)
+
+    return move_assignments(state, {assignment: time_slot2 if assignment[3] == time_slot1 else time_slot1
+                                    for assignment in chain})
+
+# Ejection chain: moves a conflicted assignment to a free time slot its teacher prefers. If
+# its classroom is taken there, the assignment holding it is ejected and moved the same way,
+# up to max_length assignments. Returns None if the chain does not end in a free classroom.
+def ejection_chain(state, max_length: int = 3):
+    schedule = state.get_schedule()
+    assignments = list_assignments(schedule)
+    if not assignments:
+        return None
+
+    assignment = random.choice(conflicted_assignments(schedule, assignments) or assignments)
+    moves = {}  # Dict [Assignment: new time slot]
+    # Occupancy once the chain is applied
+    taken = {(classroom, time_slot): (course, classroom, teacher, time_slot)
+                for course, classroom, teacher, time_slot in assignments}
+    busy_teachers = {(teacher, time_slot) for _, _, teacher, time_slot in assignments}
+
+    while len(moves) < max_length:
+        course, classroom, teacher, time_slot = assignment
+        candidates = [new_time_slot for new_time_slot in schedule.teachers[teacher].get_preffered_time_slots()
+                        if new_time_slot != time_slot and (teacher, new_time_slot) not in busy_teachers and
+                            taken.get((classroom, new_time_slot)) not in moves]
+        if not candidates:
+            return None
+
+        new_time_slot = random.choice(candidates)
+        moves[assignment] = new_time_slot
+        if taken.get((classroom, time_slot)) == assignment:
+            del taken[(classroom, time_slot)]
+        busy_teachers.discard((teacher, time_slot))
+        busy_teachers.add((teacher, new_time_slot))
+
+        ejected = taken.get((classroom, new_time_slot))
+        taken[(classroom, new_time_slot)] = assignment
+        if ejected is None:
+            return move_assignments(state, moves)
+        assignment = ejected
+
+    return None
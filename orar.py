@@ -1,246 +1,335 @@
-import sys
+import argparse
 import utils
+import repair
+import parallel
+import lns
+import feasibility
+import decomposition
+import solution_cache
+import two_phase
+import min_conflicts
+import checkpoint
+import algorithm_selection
+import islands
 import time
 import random
-import copy
-from typing import Tuple
-from teacher import Teacher
-from classroom import Classroom
+from instance import Instance
 from schedule import Schedule
-from state import State
-
-def stochastic_hill_climbing(initial: State, max_iters: int = 10000,
-                              max_no_improvement: int = 100) -> Tuple[bool, int, int, State]:
-    iters, states, no_improvement = 0, 0, 0
-    state = copy.deepcopy(initial)
+from state import State, MOVES, CHAIN_MOVES
+from solver import CSP, stochastic_hill_climbing, generate_initial_schedule
+
+# Prints the conflicts of the timetable found and the timetable itself, and writes it to
+# outputs/, or prints not_found if there is no timetable. The CSP has always printed the
+# timetable first, without a title.
+def report_result(final_state: State, filename: str, not_found: str, timetable_first: bool = False):
+    if final_state is None:
+        print(not_found)
+        return
+
+    timetable = utils.pretty_print_timetable(final_state.get_schedule().convert_schedule_to_dict(), filename)
+    if timetable_first:
+        print(timetable)
+    print("Final state hard conflicts: " + str(final_state.get_hard_conflicts()))
+    print("Final state soft conflicts: " + str(final_state.get_soft_conflicts()))
+    if not timetable_first:
+        print('Final state schedule:')
+        print(timetable)
 
-    while iters < max_iters and no_improvement < max_no_improvement:
-        iters += 1
+    with open(f'outputs/{filename[7:-5]}.txt', 'w') as f:
+        f.write(timetable)
 
-        # Get all possible neighbors
-        neighbors = state.get_next_states()
+if __name__ == '__main__':
+    start_time = time.time()
 
-        # Choose from the neighbors that are better than the current state
-        better_neighbors = [neighbor for neighbor in neighbors 
-                            if neighbor.get_hard_conflicts() <= state.get_hard_conflicts() and
-                            neighbor.get_soft_conflicts() <= state.get_soft_conflicts()]
+    parser = argparse.ArgumentParser(description='Timetable generator')
+    parser.add_argument('algorithm', choices=['hc', 'csp', 'lns', 'ga', 'mc', 'islands', 'auto'],
+                        help='auto picks the algorithm and its parameters from features of the instance')
+    parser.add_argument('filename')
+    parser.add_argument('--repair', metavar='PREVIOUS_OUTPUT',
+                        help='keep the still valid assignments of a previous timetable and solve only the rest')
+    parser.add_argument('--previous-input', metavar='PREVIOUS_YAML',
+                        help='input the previous timetable was generated from (defaults to filename)')
+    parser.add_argument('--no-symmetry-breaking', action='store_true',
+                        help='explore interchangeable classrooms, teachers and time slots separately (csp)')
+    parser.add_argument('--two-phase', action='store_true',
+                        help='choose the classrooms and time slots first, then the teachers with a matching (csp)')
+    parser.add_argument('--branch-and-bound', action='store_true',
+                        help='allow time slots the teachers do not prefer and find the timetable with '
+                                'the fewest soft conflicts (csp)')
+    parser.add_argument('--node-limit', type=int,
+                        help='stop branch and bound after this many nodes, with the best timetable found so far')
+    parser.add_argument('--global-constraints', action='store_true',
+                        help='filter the values with flows over the all different classroom and teacher time '
+                                'slots and the teacher loads (csp)')
+    parser.add_argument('--constraint-stats', action='store_true',
+                        help='print how many values each constraint rejected (csp)')
+    parser.add_argument('--workers', type=int,
+                        help='number of processes exploring the search tree in parallel (csp), '
+                                'running the islands (islands, all the CPUs by default) '
+                                'or solving the components (--decompose, all the CPUs by default)')
+    parser.add_argument('--island-search', choices=['hc', 'mc'], default='mc',
+                        help='local search run on each island (islands)')
+    parser.add_argument('--migration-interval', type=int, default=1,
+                        help='epochs between two migrations of the best timetables, 0 for none (islands)')
+    parser.add_argument('--decompose', action='store_true',
+                        help='solve the groups of courses that share no teacher or classroom separately')
+    parser.add_argument('--initial', choices=['greedy', 'random'], default='greedy',
+                        help='how the initial schedule of the local search is built (hc, lns, mc)')
+    parser.add_argument('--moves', nargs='+', choices=MOVES + list(CHAIN_MOVES),
+                        help='neighbourhoods explored by the hill climbing (hc, lns, islands)')
+    parser.add_argument('--lns-start', choices=['initial', 'hc'], default='hc',
+                        help='improve the initial schedule or the hill climbing result (lns)')
+    parser.add_argument('--seed', type=int, help='seed of the random number generator')
+    parser.add_argument('--cache', action='store_true',
+                        help='reuse the timetable of an earlier run with the same instance, algorithm, '
+                                'options and seed, and store the new ones')
+    parser.add_argument('--cache-dir', default=solution_cache.DEFAULT_CACHE_DIR,
+                        help='directory of the cached timetables')
+    parser.add_argument('--cache-size', type=int, default=solution_cache.DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help='size of the cache in MB, the least recently used timetables are removed first')
+    parser.add_argument('--checkpoint', metavar='FILE',
+                        help='save the search state to FILE periodically (hc, csp)')
+    parser.add_argument('--checkpoint-interval', type=float, default=checkpoint.DEFAULT_INTERVAL,
+                        help='seconds between two checkpoints')
+    parser.add_argument('--resume', action='store_true',
+                        help='go on from the checkpoint in --checkpoint FILE, if there is one')
+    parser.add_argument('--warm-start', action='store_true',
+                        help='start from the last cached timetable of the same instance (hc, lns, mc, ga, csp)')
+    args = parser.parse_args()
+    if args.decompose and args.repair:
+        parser.error('--decompose can not be used with --repair')
+    if args.two_phase and (args.workers is not None and args.workers > 1 or args.decompose):
+        parser.error('--two-phase can not be used with --workers or --decompose')
+    if args.branch_and_bound and (args.two_phase or args.workers is not None and args.workers > 1 or
+                                    args.decompose):
+        parser.error('--branch-and-bound can not be used with --two-phase, --workers or --decompose')
+    if args.node_limit is not None and not args.branch_and_bound:
+        parser.error('--node-limit needs --branch-and-bound')
+    if args.algorithm == 'auto' and (args.workers is not None and args.workers > 1 or args.decompose):
+        parser.error('auto can not be used with --workers or --decompose')
+    if args.algorithm == 'islands' and args.decompose:
+        parser.error('islands can not be used with --decompose')
+    if args.global_constraints and (args.algorithm != 'csp' or args.two_phase or args.decompose):
+        parser.error('--global-constraints only works with csp, without --two-phase or --decompose')
+    if args.cache and args.repair:
+        parser.error('--cache can not be used with --repair')
+    if args.warm_start and not args.cache:
+        parser.error('--warm-start needs --cache')
+    if args.resume and not args.checkpoint:
+        parser.error('--resume needs --checkpoint')
+    if args.checkpoint and (args.algorithm not in ('hc', 'csp') or args.two_phase or args.decompose or
+                            args.workers is not None and args.workers > 1):
+        parser.error('--checkpoint only works with hc and csp, without --two-phase, --workers or --decompose')
+
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    used_algorithm = args.algorithm
+    filename = args.filename
+    in_data = utils.read_yaml_file(filename)
 
-        if not better_neighbors:
-            break  # Local minimum reached, no better neighbors
+    instance = Instance(in_data)
+    schedule = Schedule(instance)
+
+    # Conflicts no timetable can avoid, known before any search
+    report = feasibility.analyze(instance)
+    if report.has_unavoidable_conflicts():
+        print("Unavoidable hard conflicts: " + str(report.min_hard_conflicts))
+        print("Unavoidable soft conflicts: " + str(report.min_soft_conflicts))
+        for certificate in report.get_certificates():
+            print(certificate)
+
+    # Everything but the input file, the seed, the cache and the checkpoints changes the result
+    instance_hash = solution_cache.hash_instance(in_data)
+    parameters = {name: value for name, value in vars(args).items()
+                    if name not in ('algorithm', 'filename', 'seed', 'cache', 'cache_dir', 'cache_size',
+                                    'checkpoint', 'checkpoint_interval', 'resume')}
+
+    cache, cached_state, warm_start_entry = None, None, None
+    if args.cache:
+        cache = solution_cache.SolutionCache(args.cache_dir, args.cache_size * 1024 * 1024)
+        cache_key = cache.make_key(instance_hash, used_algorithm, parameters, args.seed)
+
+        cached_entry = cache.get(cache_key)
+        if cached_entry is not None:
+            cached_state = solution_cache.state_from_entry(instance, cached_entry)
+        elif args.warm_start:
+            warm_start_entry = cache.find_by_instance(instance_hash)
+
+    checkpointer, resume_from = None, None
+    if args.checkpoint:
+        header = {'instance': instance_hash, 'algorithm': used_algorithm, 'parameters': parameters}
+        checkpointer = checkpoint.Checkpointer(args.checkpoint, header, args.checkpoint_interval)
+        if args.resume:
+            try:
+                resume_from = checkpoint.load_checkpoint(args.checkpoint, header)
+            except ValueError as error:
+                parser.error(str(error))
+            if resume_from is None:
+                print("No checkpoint to resume from, starting from scratch")
+            else:
+                print("Resuming from the checkpoint " + args.checkpoint)
+
+    if args.repair:
+        previous_specs = utils.read_yaml_file(args.previous_input or filename)
+        previous_assignments = repair.load_previous_assignments(args.repair, previous_specs)
+        initial_state, invalid_assignments = repair.warm_start_state(schedule, previous_assignments)
+
+        print("Kept " + str(len(previous_assignments) - len(invalid_assignments)) + " of " +
+                str(len(previous_assignments)) + " previous assignments")
+        for course, classroom, teacher, time_slot in invalid_assignments:
+            print("Dropped: " + course + " in " + classroom + " by " + teacher + " at " + str(time_slot))
+    elif warm_start_entry is not None:
+        # The cached timetable may come from another algorithm or seed, only its valid part is kept
+        previous_assignments = repair.to_previous_assignments(warm_start_entry.get_assignments())
+        initial_state, invalid_assignments = repair.warm_start_state(schedule, previous_assignments)
+
+        print("Warm start from " + str(len(previous_assignments) - len(invalid_assignments)) + " of " +
+                str(len(previous_assignments)) + " cached assignments")
+    else:
+        initial_state = State(schedule)
+
+    not_found = "No timetable found"
+    timetable_first = False
+    if cached_state is not None:
+        final_state = cached_state
+        print("Found in the cache")
+
+    elif args.decompose:
+        final_state, unsolved_components = decomposition.solve_components(
+            instance, used_algorithm, args.workers, symmetry_breaking=not args.no_symmetry_breaking,
+            initial=args.initial)
+
+        print("Number of components: " + str(len(instance.get_components())))
+        for courses, _, _ in unsolved_components:
+            print("No timetable found for the courses: " + ", ".join(courses))
+
+    elif used_algorithm == 'hc':
+        generate_initial_schedule(initial_state, args.initial)
 
-        # Alegem aleator între vecinii mai buni
-        new_state = random.choice(better_neighbors)
-        states += len(neighbors)
+        print("Hard conflicts in initial state: " + str(initial_state.get_hard_conflicts()))
+        print("Soft conflicts in initial state: " + str(initial_state.get_soft_conflicts()))
+        print('Initial state schedule:')
+        print(utils.pretty_print_timetable(initial_state.get_schedule().convert_schedule_to_dict(), filename))
 
-        if (new_state.get_hard_conflicts() >= state.get_hard_conflicts() and
-            new_state.get_soft_conflicts() >= state.get_soft_conflicts()):
-            no_improvement += 1
-        else:
-            no_improvement = 0
-
-        state = new_state
-
-    return state.is_final(), iters, states, state
-
-# Wrapper function so that we can init variables and call the recursive function
-class CSP:
-    def __init__(self, initial_state: State):
-        self.current_state = initial_state
-
-    # domains: [course: [(classroom, teacher, time_slot)]
-    def generate_domains(self):
-        domains = {}
-        schedule = self.current_state.get_schedule()
-
-        for course in schedule.courses.keys():
-            domains[course] = []
-            for classroom_name in schedule.classrooms.keys():
-                for teacher_name in schedule.teachers.keys():
-                    for time_slot in schedule.available_time_slots:
-                        # Check if the assignment satisfies constraints
-                        if self.check_domain_constraints(course, classroom_name,
-                                                        teacher_name, time_slot):
-                            domains[course].append((classroom_name, teacher_name, time_slot))
-        return domains
-    
-    # Used to filter the domains of the variables, so that we choose only from valid assignments
-    def check_domain_constraints(self, course, classroom, teacher, time_slot):
-        schedule = self.current_state.get_schedule()
-
-        if (not time_slot in schedule.teachers[teacher].get_preffered_time_slots() or
-            schedule.classrooms[classroom].is_occupied_at_time(time_slot) or
-            not schedule.classrooms[classroom].can_host_course(course) or
-            not schedule.teachers[teacher].can_teach_course(course)):
-            return False
-        
-        return True
-    
-    def generate_constraints(self):
-        constraints = []
-        schedule = self.current_state.get_schedule()
-
-        def is_classroom_occupied(params):
-            _, classroom, _, time_slot = params
-            return not schedule.classrooms[classroom].is_occupied_at_time(time_slot)
-
-
-        def is_course_suitable_for_classroom(params):
-            course, classroom, _, _ = params
-            return schedule.classrooms[classroom].can_host_course(course)
-
-        def is_teacher_suitable(params):
-            course, _, teacher, _ = params
-            return schedule.teachers[teacher].can_teach_course(course)
-
-        def is_preferred_time_slot(params):
-            _, _, teacher, time_slot = params
-            return time_slot in schedule.teachers[teacher].get_preffered_time_slots()
-
-        def is_teacher_available(params):
-            _, _, teacher, time_slot = params
-            return schedule.teachers[teacher].is_free_at_time(time_slot)
-
-        def is_teacher_any_time_available(params):
-            _, _, teacher, _ = params
-            return schedule.teachers[teacher].has_available_time_slot()
-
-        def is_teacher_teaching_too_much(params):
-            _, _, teacher, _ = params
-            return len(schedule.teachers[teacher].get_courses_by_time_slot()) < 7
-
-        def has_classroom_overlapping_courses(params):
-            _, classroom, _, _ = params
-            return schedule.classrooms[classroom].count_overlaps() == 0
-
-        def has_teacher_overlapping_courses(params):
-            _, _, teacher, _ = params
-            return schedule.teachers[teacher].count_overlaps() == 0
-
-        # Append all constraint templates to the constraints list
-        constraints.append(is_classroom_occupied)
-        constraints.append(is_course_suitable_for_classroom)
-        constraints.append(is_teacher_suitable)
-        constraints.append(is_preferred_time_slot)
-        constraints.append(is_teacher_available)
-        constraints.append(is_teacher_any_time_available)
-        constraints.append(is_teacher_teaching_too_much)
-        constraints.append(has_classroom_overlapping_courses)
-        constraints.append(has_teacher_overlapping_courses)
-
-        return constraints
-    
-    def check_constraint(self, constraint, assignments, params):
-        if not constraint(params):
-            return False
-        
-        return True
-    
-    def solve(self):
-        domains = self.generate_domains()
-        constraints = self.generate_constraints()
-
-        # We want to start with the course that has the least number of teachers
-        # Because it is more constrained and it is more likely to have a unique solution,
-        self.current_state.get_schedule().reorder_by_nr_teachers()
-
-        def backtrack():
-            schedule = self.current_state.get_schedule()
-            assignments = schedule.get_assignments()
-
-            # Checking if all students are covered
-            if self.current_state.conflicts_caused_by_not_enough_seats() == 0:
-                return self.current_state
-
-            course = None
-            
-            # pick a course that has not yer covered all the students.
-            for course_name, num_students in schedule.courses.items():
-                if (course_name not in assignments or
-                    self.current_state.get_nr_seats_per_course()[course_name] < num_students):
-                    course = course_name
-                    break
-
-            if course == None:
-                return self.current_state
-
-            for value in domains[course]:
-                classroom_name = value[0]
-                teacher_name = value[1]
-                time_slot = value[2]
-
-                teacher = schedule.get_teachers()[teacher_name]
-                classroom = schedule.get_classrooms()[classroom_name]
-                assignments.setdefault(course, []).append(value)
-
-                params = (course, classroom_name, teacher_name, time_slot)
-                constraints_satisfied = True
-
-                for constraint in constraints:
-                    if not self.check_constraint(constraint, assignments, params): # Constraint is not satisfied
-                        assignments[course].remove(value)
-                        constraints_satisfied = False
-                        break
-
-                if not constraints_satisfied:
-                    continue
-                        
-                # Assign the course to a teacher and classroom
-                teacher.add_course(course, time_slot)
-                classroom.add_course(course, time_slot)
-                self.current_state.increase_nr_seats_per_course(course, classroom.get_capacity())
-
-                result = backtrack()
-                if result:
-                    return result
-                
-                # Remove the course from the assignment in case the result is None
-                assignments[course].remove(value)
-                teacher.remove_course(course, time_slot)
-                classroom.remove_course(course, time_slot)
-
-            return None
-        
-        # Start backtracking with an empty assignment
-        return backtrack()
+        _, _, nr_states, final_state = stochastic_hill_climbing(
+            initial_state, lower_bounds=report.get_lower_bounds(), moves=args.moves,
+            checkpointer=checkpointer, resume_from=resume_from)
+        print("Number of generated states: " + str(nr_states))
 
-if __name__ == '__main__':
-    start_time = time.time()
+    elif used_algorithm == 'mc':
+        generate_initial_schedule(initial_state, args.initial)
 
+        print("Hard conflicts in initial state: " + str(initial_state.get_hard_conflicts()))
+        print("Soft conflicts in initial state: " + str(initial_state.get_soft_conflicts()))
 
-    used_algorithm = sys.argv[1]
-    filename = sys.argv[2]
-    in_data = utils.read_yaml_file(filename)
+        _, nr_steps, nr_values, final_state = min_conflicts.min_conflicts(initial_state,
+                                                                            lower_bounds=report.get_lower_bounds())
+        print("Number of repair steps: " + str(nr_steps))
+        print("Number of evaluated values: " + str(nr_values))
 
-    schedule = Schedule(in_data)
-    initial_state = State(schedule)
+    elif used_algorithm == 'islands':
+        _, nr_iters, nr_migrants, final_state = islands.island_search(
+            initial_state, args.workers, args.island_search, migration_interval=args.migration_interval,
+            lower_bounds=report.get_lower_bounds(), moves=args.moves)
+        print("Number of iterations: " + str(nr_iters))
+        print("Number of migrants taken in: " + str(nr_migrants))
 
-    if used_algorithm == 'hc':
-        initial_state.generate_initial_schedule()
+    elif used_algorithm == 'lns':
+        generate_initial_schedule(initial_state, args.initial)
+        if args.lns_start == 'hc':
+            initial_state = stochastic_hill_climbing(initial_state, lower_bounds=report.get_lower_bounds(),
+                                                        moves=args.moves)[3]
 
         print("Hard conflicts in initial state: " + str(initial_state.get_hard_conflicts()))
         print("Soft conflicts in initial state: " + str(initial_state.get_soft_conflicts()))
-        print('Initial state schedule:')
-        print(utils.pretty_print_timetable(initial_state.get_schedule().convert_schedule_to_dict(), filename))
 
-        final_state = stochastic_hill_climbing(initial_state)
-        print("Number of generated states: " + str(final_state[2]))
-        print("Final state hard conflicts: " + str(final_state[3].get_hard_conflicts()))
-        print("Final state soft conflicts: " + str(final_state[3].get_soft_conflicts()))
-        print('Final state schedule:')
-        print(utils.pretty_print_timetable(final_state[3].get_schedule().convert_schedule_to_dict(), filename))
-
-        with open(f'outputs/{filename[7:-5]}.txt', 'w') as f:
-            f.write(utils.pretty_print_timetable(final_state[3].get_schedule().convert_schedule_to_dict(), filename))
+        _, nr_iters, nr_nodes, final_state = lns.large_neighbourhood_search(initial_state,
+                                                                            lower_bounds=report.get_lower_bounds())
+        print("Number of iterations: " + str(nr_iters))
+        print("Number of explored nodes: " + str(nr_nodes))
+
+    elif used_algorithm == 'ga':
+        # NumPy is only needed by this solver
+        import genetic
+
+        _, nr_generations, nr_evaluated, final_state = genetic.memetic_algorithm(
+            instance, lower_bounds=report.get_lower_bounds(), initial_state=initial_state)
+        print("Number of generations: " + str(nr_generations))
+        print("Number of evaluated states: " + str(nr_evaluated))
+
+    elif used_algorithm == 'auto':
+        features = algorithm_selection.InstanceFeatures(instance, report)
+        rule, stages = algorithm_selection.select_rule(features)
+        print("Instance features: " + features.describe())
+        print("Selected rule: " + rule + " (" + ", then ".join(algorithm for algorithm, _ in stages) + ")")
+
+        final_state, runs = algorithm_selection.solve(stages, initial_state, report.get_lower_bounds(),
+                                                        moves=args.moves)
+        for algorithm, state, effort in runs:
+            print("Stage " + algorithm + ": " + str(effort) + " nodes or iterations, " +
+                    ("no timetable" if state is None else
+                        str(state.get_hard_conflicts()) + " hard and " + str(state.get_soft_conflicts()) +
+                        " soft conflicts"))
 
     elif used_algorithm == 'csp':
-        csp = CSP(initial_state)
-
-        final_state = csp.solve()
-        print(utils.pretty_print_timetable(final_state.get_schedule().convert_schedule_to_dict(), filename))
-        print("Final state hard conflicts: " + str(final_state.get_hard_conflicts()))
-        print("Final state soft conflicts: " + str(final_state.get_soft_conflicts()))
-        with open(f'outputs/{filename[7:-5]}.txt', 'w') as f:
-            f.write(utils.pretty_print_timetable(final_state.get_schedule().convert_schedule_to_dict(), filename))
+        stopped = False
+        timetable_first = True
+        if report.min_hard_conflicts > 0 or (report.has_unavoidable_conflicts() and not args.branch_and_bound):
+            # The CSP only builds timetables without any conflict (without hard conflicts
+            # with branch and bound), there is no need to search
+            final_state, nr_nodes = None, 0
+        elif args.branch_and_bound:
+            csp = CSP(initial_state, symmetry_breaking=not args.no_symmetry_breaking, branch_and_bound=True,
+                        min_soft_conflicts=report.min_soft_conflicts, global_constraints=args.global_constraints)
+            csp.checkpointer = checkpointer
+            if resume_from is None:
+                incumbent = algorithm_selection.find_incumbent(initial_state, report.get_lower_bounds())
+                if incumbent is not None:
+                    print("Incumbent soft conflicts: " + str(incumbent.get_soft_conflicts()))
+                    csp.set_incumbent(incumbent)
+            if args.node_limit is not None:
+                csp.node_callback = lambda csp: csp.nr_nodes >= args.node_limit
+            final_state = csp.solve(resume_from=resume_from)
+            nr_nodes, stopped = csp.nr_nodes, csp.stopped
+            print("Number of improving timetables: " + str(csp.nr_solutions))
+            if stopped:
+                print("Stopped at the node limit, the timetable may not be optimal")
+            if args.constraint_stats:
+                for constraint, nr_rejections in csp.get_rejections().items():
+                    print("Rejected by " + constraint + ": " + str(nr_rejections))
+        elif args.two_phase:
+            solver = two_phase.TwoPhaseSolver(initial_state)
+            final_state = solver.solve()
+            nr_nodes = solver.nr_nodes
+            print("Number of teacher matchings: " + str(solver.nr_matchings))
+            print("Number of learned cuts: " + str(solver.nr_cuts))
+        elif args.workers is not None and args.workers > 1:
+            final_state, nr_nodes = parallel.parallel_csp(initial_state, args.workers,
+                                                            symmetry_breaking=not args.no_symmetry_breaking,
+                                                            global_constraints=args.global_constraints)
+        else:
+            csp = CSP(initial_state, symmetry_breaking=not args.no_symmetry_breaking,
+                        global_constraints=args.global_constraints)
+            csp.checkpointer = checkpointer
+            final_state = csp.solve(resume_from=resume_from)
+            nr_nodes = csp.nr_nodes
+            if args.constraint_stats:
+                for constraint, nr_rejections in csp.get_rejections().items():
+                    print("Rejected by " + constraint + ": " + str(nr_rejections))
+
+        print("Number of explored nodes: " + str(nr_nodes))
+        if stopped:
+            not_found = "No timetable without hard conflicts found before the node limit"
+        elif args.branch_and_bound:
+            not_found = "There is no timetable without hard conflicts"
+        else:
+            not_found = "There is no timetable without conflicts"
+
+    report_result(final_state, filename, not_found, timetable_first)
+
+    if cache is not None and cached_state is None and final_state is not None:
+        cache.put(cache_key, solution_cache.entry_from_state(instance_hash, used_algorithm, final_state))
 
     print("--- %s seconds ---" % (time.time() - start_time))
     
\ No newline at end of file
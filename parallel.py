@@ -0,0 +1,134 @@
+import copy
+import queue
+import multiprocessing
+from typing import List, Tuple
+import solver
+from state import State
+
+class SharedWork:
+    # Units of work shared by the worker processes, with the counters needed to know
+    # when to hand work over and when the whole tree was explored. A unit is a
+    # (prefix, first index, end index) tuple, see CSP.split_work.
+    def __init__(self):
+        self.units = multiprocessing.Queue()
+        self.lock = multiprocessing.Lock()
+        self.nr_idle = multiprocessing.RawValue('i', 0)  # Workers waiting for a unit
+        self.nr_queued = multiprocessing.RawValue('i', 0)  # Units in the queue
+        self.nr_pending = multiprocessing.RawValue('i', 0)  # Units in the queue or being explored
+        self.stop = multiprocessing.Event()
+
+    def put(self, unit):
+        with self.lock:
+            self.nr_queued.value += 1
+            self.nr_pending.value += 1
+        self.units.put(unit)
+
+    # Waits for a unit. Returns None once there is nothing left to explore or the search stopped.
+    def get(self):
+        with self.lock:
+            self.nr_idle.value += 1
+
+        unit = None
+        while unit is None and not self.stop.is_set():
+            try:
+                unit = self.units.get(timeout=0.01)
+            except queue.Empty:
+                with self.lock:
+                    if self.nr_pending.value == 0:
+                        break
+
+        with self.lock:
+            self.nr_idle.value -= 1
+            if unit is not None:
+                self.nr_queued.value -= 1
+
+        return unit
+
+    def finish(self):
+        with self.lock:
+            self.nr_pending.value -= 1
+
+    # Some worker is waiting and there is no unit in the queue for it
+    def is_wanted(self) -> bool:
+        with self.lock:
+            return self.nr_idle.value > self.nr_queued.value
+
+# Node callback of the workers' searches: gives away part of the tree whenever a worker
+# runs out of units, and stops the search once some worker found a solution
+def share_work(csp: 'solver.CSP', work: SharedWork) -> bool:
+    if work.is_wanted():
+        unit = csp.split_work()
+        if unit is not None:
+            work.put(unit)
+
+    return work.stop.is_set()
+
+def search_worker(initial_state: State, options: dict, work: SharedWork, results):
+    nr_nodes = 0
+    # Units left in the queue once the search stopped are not needed by anyone
+    work.units.cancel_join_thread()
+
+    try:
+        unit = work.get()
+        while unit is not None:
+            csp = solver.CSP(copy.deepcopy(initial_state), **options)
+            csp.node_callback = lambda csp: share_work(csp, work)
+
+            solution = csp.solve(*unit)
+            nr_nodes += csp.nr_nodes
+            if solution is not None:
+                results.put(('solution', csp.decisions))
+                work.stop.set()
+
+            work.finish()
+            unit = work.get()
+    finally:
+        results.put(('done', nr_nodes))
+
+# Runs the CSP on a pool of worker processes. The tree is split at its top levels on demand:
+# whenever a worker is left without work, a busy one gives away the second half of the untried
+# values of its shallowest open level. All the workers stop as soon as one of them finds a
+# full schedule. Returns the final state (None if there is no solution) and the number of
+# nodes explored by all the workers.
+def parallel_csp(initial_state: State, nr_workers: int = None, **options) -> Tuple[State, int]:
+    nr_workers = nr_workers or multiprocessing.cpu_count()
+    work = SharedWork()
+    results = multiprocessing.Queue()
+
+    # The whole tree is the first unit
+    work.put(((), 0, None))
+
+    workers = [multiprocessing.Process(target=search_worker,
+                                        args=(initial_state, options, work, results))
+                for _ in range(nr_workers)]
+    for worker in workers:
+        worker.start()
+
+    decisions, nr_nodes, nr_done = None, 0, 0
+    while nr_done < nr_workers:
+        kind, result = results.get()
+        if kind == 'solution':
+            if decisions is None:
+                decisions = result
+        else:
+            nr_nodes += result
+            nr_done += 1
+
+    for worker in workers:
+        worker.join()
+
+    if decisions is None:
+        return None, nr_nodes
+
+    return apply_decisions(initial_state, decisions), nr_nodes
+
+# Builds the state reached by taking the decisions of a search from the initial state
+def apply_decisions(initial_state: State, decisions: List[Tuple]) -> State:
+    state = copy.deepcopy(initial_state)
+    schedule = state.get_schedule()
+
+    for course, classroom_name, teacher_name, time_slot in decisions:
+        schedule.add_course(course, classroom_name, teacher_name, time_slot)
+        state.increase_nr_seats_per_course(course, schedule.get_classrooms()[classroom_name].get_capacity())
+
+    return state
@@ -0,0 +1,80 @@
+from collections import deque
+from typing import Dict, Hashable, List, Set
+from flow import build_residual, augment_flow
+
+# Global constraints of the CSP over the assignments the uncovered courses still need. Each
+# course needs at least a number of assignments, each of which takes one support: a classroom
+# or a teacher in a time slot. The supports must all be different, and the supports of a
+# group (the time slots of a teacher) may be taken at most the group's capacity times (a
+# global cardinality constraint). Both are checked together as a maximum flow
+#   source -> course (needed assignments) -> support (1) -> group (capacity) -> sink
+# and filtered like Regin's all-different: an edge course -> support is part of some flow
+# meeting every need iff it carries flow, or the flow can be rerouted around a cycle through it.
+
+# Returns None if the needs can not all be met. Otherwise, the supports of course that no flow
+# meeting every need gives it: with one of them, the other needs can not be met anymore.
+# needs: Dict [course: nr_assignments], supports: Dict [course: List[support]],
+# groups: Dict [support: group], the supports without a group go straight to the sink,
+# capacities: Dict [group: capacity]
+def filter_supports(needs: Dict[str, int], supports: Dict[str, List[Hashable]],
+                    groups: Dict[Hashable, Hashable], capacities: Dict[Hashable, int],
+                    course: str) -> Set[Hashable]:
+    network = {'source': {}}
+    for need_course, nr_assignments in needs.items():
+        network['source'][('course', need_course)] = nr_assignments
+        network[('course', need_course)] = {('support', support): 1 for support in supports[need_course]}
+        for support in supports[need_course]:
+            if support in groups:
+                network[('support', support)] = {('group', groups[support]): 1}
+            else:
+                network[('support', support)] = {'sink': 1}
+    for group, capacity in capacities.items():
+        network[('group', group)] = {'sink': capacity}
+
+    # Most of the needs are met greedily, the augmenting paths only have to fix the rest
+    residual = build_residual(network, 'source', 'sink')
+    used_supports = set()
+    group_loads = dict.fromkeys(capacities, 0)
+    flow = 0
+    for need_course, nr_assignments in needs.items():
+        nr_met = 0
+        for support in supports[need_course]:
+            if nr_met == nr_assignments:
+                break
+            group = groups.get(support)
+            if support in used_supports or group is not None and group_loads[group] >= capacities[group]:
+                continue
+
+            used_supports.add(support)
+            path = ['source', ('course', need_course), ('support', support)]
+            if group is not None:
+                group_loads[group] += 1
+                path.append(('group', group))
+            path.append('sink')
+            for start, end in zip(path, path[1:]):
+                residual[start][end] -= 1
+                residual[end][start] += 1
+            nr_met += 1
+        flow += nr_met
+    if flow < sum(needs.values()):
+        flow += augment_flow(residual, 'source', 'sink')
+
+    if flow < sum(needs.values()):
+        return None
+    if course not in needs:
+        return set()
+
+    # Nodes from which the course can be reached with residual capacity: a cycle through an
+    # unused edge course -> support goes back from the support to the course
+    reaching = {('course', course)}
+    queue = deque([('course', course)])
+    while queue:
+        node = queue.popleft()
+        for neighbour in residual[node]:
+            if residual[neighbour].get(node, 0) > 0 and neighbour not in reaching:
+                reaching.add(neighbour)
+                queue.append(neighbour)
+
+    edges = residual[('course', course)]
+    return {support for support in supports[course]
+            if edges[('support', support)] > 0 and ('support', support) not in reaching}
@@ -0,0 +1,68 @@
+from typing import List, Tuple
+from check_constraints import get_timetable
+from schedule import Schedule
+from state import State
+
+# (course, classroom, teacher, (day, interval)) as read from a previously generated timetable
+PreviousAssignment = Tuple[str, str, str, Tuple[str, Tuple[int, int]]]
+
+# Parses a timetable written by orar.py back into a list of assignments. The specs must be
+# the ones the timetable was generated from, because teachers only appear by their initials.
+def load_previous_assignments(output_path: str, previous_specs: dict) -> List[PreviousAssignment]:
+    timetable = get_timetable(previous_specs, output_path)
+    previous_assignments = []
+
+    for day, intervals in timetable.items():
+        for interval, classrooms in intervals.items():
+            for classroom, slot in classrooms.items():
+                if slot is None:
+                    continue
+
+                teacher, course = slot
+                previous_assignments.append((course, classroom, teacher, (day, interval)))
+
+    return previous_assignments
+
+# Turns the assignments of a schedule, whose intervals are strings, into previous assignments
+def to_previous_assignments(assignments: List[Tuple[str, str, str, Tuple[str, str]]]) -> List[PreviousAssignment]:
+    return [(course, classroom, teacher, (day, eval(interval)))
+            for course, classroom, teacher, (day, interval) in assignments]
+
+# Checks whether a previous assignment is still valid for the updated schedule,
+# given the assignments that were already kept before it.
+def is_still_valid(schedule: Schedule, course: str, classroom_name: str, teacher_name: str,
+                    time_slot: Tuple[str, str]) -> bool:
+    if (course not in schedule.courses or classroom_name not in schedule.classrooms or
+        teacher_name not in schedule.teachers or
+        time_slot not in schedule.get_available_time_slots()):
+        return False
+
+    classroom = schedule.classrooms[classroom_name]
+    teacher = schedule.teachers[teacher_name]
+
+    return (classroom.can_host_course(course) and teacher.can_teach_course(course) and
+            teacher.prefers_time_slot(time_slot) and
+            not classroom.is_occupied_at_time(time_slot) and
+            teacher.is_free_at_time(time_slot) and
+            not teacher.is_teaching_too_much())
+
+# Builds a partial state out of the previous assignments that are still valid for the
+# updated schedule. Returns the state and the assignments that had to be dropped.
+def warm_start_state(schedule: Schedule, previous_assignments: List[PreviousAssignment]
+                        ) -> Tuple[State, List[PreviousAssignment]]:
+    state = State(schedule)
+    intervals = {eval(interval): interval for interval in schedule.intervals}
+    invalid_assignments = []
+
+    for previous_assignment in previous_assignments:
+        course, classroom_name, teacher_name, (day, interval) = previous_assignment
+        time_slot = (day, intervals.get(interval))
+
+        if not is_still_valid(schedule, course, classroom_name, teacher_name, time_slot):
+            invalid_assignments.append(previous_assignment)
+            continue
+
+        schedule.add_course(course, classroom_name, teacher_name, time_slot)
+        state.increase_nr_seats_per_course(course, schedule.classrooms[classroom_name].get_capacity())
+
+    return state, invalid_assignments
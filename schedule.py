@@ -1,35 +1,48 @@
 import random
+import hashlib
+from functools import lru_cache
 from typing import List, Tuple, Dict
 from classroom import Classroom
 from teacher import Teacher
+from instance import Instance
 
 class Schedule:
-    def __init__(self, in_data):
-        intervals = in_data['Intervale'] # List of tuples
-        courses = in_data['Materii'] # Dict [course_name: nr_students]
-        days = in_data['Zile'] # List of strings
-        available_time_slots = generate_available_time_slots(intervals, days)
-
-        classrooms = in_data['Sali']
-        for classroom in classrooms:
-            classrooms[classroom] = Classroom(classroom, classrooms[classroom]['Capacitate'],
-                                                classrooms[classroom]['Materii'])
-
-        teachers = in_data['Profesori']
-        for teacher in teachers:
-            constraints = teachers[teacher]['Constrangeri']
-            preffered_time_slots = self.find_preffered_time_slots(teachers[teacher]['Constrangeri'],
-                                                                    days, intervals)
-            teachers[teacher] = Teacher(teacher, constraints,
-                                            teachers[teacher]['Materii'], preffered_time_slots)
-
-        self.intervals = intervals
-        self.days = days
-        self.courses = courses
-        self.classrooms = classrooms
-        self.teachers = teachers
-        self.available_time_slots = available_time_slots
+    __slots__ = ('instance', 'intervals', 'days', 'courses', 'classrooms', 'teachers',
+                    'available_time_slots', 'assignments', 'zobrist_hash')
+
+    def __init__(self, instance: Instance):
+        self.instance = instance
+        self.intervals = instance.intervals
+        self.days = instance.days
+        # Own copy, since the order of the courses is changed during the search
+        self.courses = dict(instance.courses)
+        self.classrooms = {name: Classroom(info) for name, info in instance.classrooms.items()}
+        self.teachers = {name: Teacher(info) for name, info in instance.teachers.items()}
+        self.available_time_slots = instance.available_time_slots
         self.assignments = {}  # Course name to list of (classroom, teacher, time slot)
+        self.zobrist_hash = 0  # Xor of the keys of all the assignments
+
+    # Copies the occupancy and the assignments. Everything else is either read-only or,
+    # like the courses order, only ever replaced and never changed in place, so it is shared.
+    def __copy__(self):
+        schedule = Schedule.__new__(Schedule)
+        schedule.instance = self.instance
+        schedule.intervals = self.intervals
+        schedule.days = self.days
+        schedule.courses = self.courses
+        schedule.available_time_slots = self.available_time_slots
+        schedule.classrooms = {name: classroom.__copy__() for name, classroom in self.classrooms.items()}
+        schedule.teachers = {name: teacher.__copy__() for name, teacher in self.teachers.items()}
+        schedule.assignments = {course: list(assignments) for course, assignments
+                                    in self.assignments.items()}
+        schedule.zobrist_hash = self.zobrist_hash
+        return schedule
+
+    def __deepcopy__(self, memo):
+        return self.__copy__()
+
+    def get_instance(self) -> Instance:
+        return self.instance
 
     def get_assignments(self):
         return self.assignments
@@ -42,6 +55,34 @@ class Schedule:
     
     def set_assignments(self, assignments):
         self.assignments = assignments
+        self.zobrist_hash = 0
+        for course, course_assignments in assignments.items():
+            for assignment in course_assignments:
+                self.zobrist_hash ^= zobrist_key(course, *assignment)
+
+    # Identifies the assignments of the schedule: equal schedules have equal hashes
+    def get_hash(self) -> int:
+        return self.zobrist_hash
+
+    def append_assignment(self, course: str, assignment: Tuple[str, str, Tuple[str, str]]):
+        self.assignments.setdefault(course, []).append(assignment)
+        self.zobrist_hash ^= zobrist_key(course, *assignment)
+
+    def remove_assignment(self, course: str, assignment: Tuple[str, str, Tuple[str, str]]):
+        self.assignments[course].remove(assignment)
+        self.zobrist_hash ^= zobrist_key(course, *assignment)
+
+    # Assigns a course to a classroom, a teacher and a time slot, keeping the occupancy
+    # of the classroom and of the teacher and the hash up to date
+    def add_course(self, course: str, classroom: str, teacher: str, time_slot: Tuple[str, str]):
+        self.append_assignment(course, (classroom, teacher, time_slot))
+        self.classrooms[classroom].add_course(course, time_slot)
+        self.teachers[teacher].add_course(course, time_slot)
+
+    def remove_course(self, course: str, classroom: str, teacher: str, time_slot: Tuple[str, str]):
+        self.remove_assignment(course, (classroom, teacher, time_slot))
+        self.classrooms[classroom].remove_course(course, time_slot)
+        self.teachers[teacher].remove_course(course, time_slot)
 
     def get_available_time_slots(self):
         return self.available_time_slots
@@ -49,13 +90,14 @@ class Schedule:
     # Checks whether a course can be held in a specific classroom
     def can_class_host_course(self, course: str, classroom: str) -> bool:
         return (course in self.courses and classroom in self.classrooms and
-            course in self.classrooms[classroom].subjects)
+            self.classrooms[classroom].can_host_course(course))
     
     def find_free_time_slot(self, classroom: str, target_time_slots: List[Tuple[str, Tuple[int, int]]],
                                 max_attempts: int = 100) -> Tuple[str, Tuple[int, int]]:
         attempts = 0
 
-        while attempts < max_attempts:
+        # A teacher who prefers no time slot has nowhere to go
+        while attempts < max_attempts and target_time_slots:
             time_slot = random.choice(target_time_slots)
 
             if not self.classrooms[classroom].is_occupied_at_time(time_slot):
@@ -64,36 +106,6 @@ class Schedule:
         
         return None
     
-    # Checks if interval1 is included in interval2
-    def included_in_interval(self, interval1, interval2):
-        # convert the intervals to a tuple
-        if type(interval1) == str:
-            interval1 = eval(interval1)
-
-        if type(interval2) == str:
-            interval2 = eval(interval2)
-
-        return interval1[0] >= interval2[0] and interval1[1] <= interval2[1]
-    
-    def find_preffered_time_slots(self, constraints: List[str], days: List[str],
-                                    intervals: List[str]) -> List[Tuple[str, Tuple[int, int]]]:
-        available_time_slots = []
-
-        for constraint in constraints:
-            if constraint.startswith('!'):
-                if '-' in constraint:
-                    banned_interval = convert_interval_format(constraint[1:])
-                    intervals = [interval for interval in intervals if
-                                    not self.included_in_interval(interval, banned_interval)]
-                else:
-                    days = [day for day in days if day != constraint[1:]]
-        
-        for day in days:
-            for interval in intervals:
-                available_time_slots.append((day, interval))
-
-        return available_time_slots
-    
     # Reorder the courses by the number of teachers that can teach them
     def reorder_by_nr_teachers(self):
         nr_teachers_per_course = {}
@@ -101,7 +113,7 @@ class Schedule:
             nr_teachers_per_course[course] = 0
 
         for teacher in self.teachers:
-            for course in self.teachers[teacher].courses:
+            for course in self.teachers[teacher].get_courses():
                 nr_teachers_per_course[course] += 1
 
         self.courses = dict(sorted(self.courses.items(),
@@ -131,27 +143,17 @@ class Schedule:
 
         return pretty_print_schedule
     
-    # Switeches the teachers in the assignments of two courses
+    # Switeches the teachers in the assignments of two courses: teacher2 takes over the course
+    # teacher1 has at the first time slot, and teacher1 the one teacher2 has at the second
     def switch_teachers_in_assignments(self, teacher1, teacher2,
                                         course_t2_can_teach_from_t1, course_t1_can_teach_from_t2):
-        course_t2_can_teach_from_t1_assignments = self.assignments[course_t2_can_teach_from_t1[1]]
-        course_t1_can_teach_from_t2_assignments = self.assignments[course_t1_can_teach_from_t2[1]]
-
-        for assignment in course_t2_can_teach_from_t1_assignments:
-            if assignment[2] == course_t2_can_teach_from_t1[0] and assignment[1] == teacher1.get_name():
-                classroom = assignment[0]
-                course_t2_can_teach_from_t1_assignments.remove(assignment)
-                course_t1_can_teach_from_t2_assignments.append((classroom, teacher2.get_name(),
-                                                                    course_t2_can_teach_from_t1[0]))
-                break
-
-        for assignment in course_t1_can_teach_from_t2_assignments:
-            if assignment[2] == course_t1_can_teach_from_t2[0] and assignment[1] == teacher2.get_name():
-                classroom = assignment[0]
-                course_t1_can_teach_from_t2_assignments.remove(assignment)
-                course_t2_can_teach_from_t1_assignments.append((classroom, teacher1.get_name(),
-                                                                    course_t1_can_teach_from_t2[0]))
-                break
+        for (time_slot, course), old_teacher, new_teacher in [(course_t2_can_teach_from_t1, teacher1, teacher2),
+                                                                (course_t1_can_teach_from_t2, teacher2, teacher1)]:
+            for classroom, teacher, assignment_time_slot in self.assignments[course]:
+                if assignment_time_slot == time_slot and teacher == old_teacher.get_name():
+                    self.remove_course(course, classroom, teacher, time_slot)
+                    self.add_course(course, classroom, new_teacher.get_name(), time_slot)
+                    break
 
     # Find a teacher that has a course that cause conflicts and move it
     # to a free time slot if that solves the conflict.
@@ -169,16 +171,8 @@ class Schedule:
 
                 if soft_conflicts and free_time_slot and teacher.is_free_at_time(free_time_slot):
                     # Move the course to the free time slot
-                    teacher.remove_course(course_name, time_slot)
-                    teacher.add_course(course_name, free_time_slot)
-                    classroom.remove_course(course_name, time_slot)
-                    classroom.add_course(course_name, free_time_slot)
-                    
-                    # Update the assignments
-                    self.assignments[course_name].remove((classroom.get_name(),
-                                                            teacher.get_name(), time_slot))
-                    self.assignments[course_name].append((classroom.get_name(),
-                                                            teacher.get_name(), free_time_slot))
+                    self.remove_course(course_name, classroom.get_name(), teacher.get_name(), time_slot)
+                    self.add_course(course_name, classroom.get_name(), teacher.get_name(), free_time_slot)
                     return
     
     # Look for a course that is currenlty held in received classroom and the teacher
@@ -191,7 +185,7 @@ class Schedule:
                 time_slot = course[2]
 
                 if current_classroom == classroom and classroom.can_host_course(course_name):
-                    if future_time_slot in teacher.get_preffered_time_slots():
+                    if teacher.prefers_time_slot(future_time_slot):
                         return course_name, teacher, time_slot
         
         return None
@@ -216,25 +210,11 @@ class Schedule:
                     new_course_name, new_teacher, new_time_slot = res
 
                     # Switch the time slots of the courses
-                    teacher.remove_course(course_name, time_slot)
-                    teacher.add_course(course_name, new_time_slot)
-                    classroom.remove_course(course_name, time_slot)
-                    classroom.add_course(course_name, new_time_slot)
-
-                    new_teacher.remove_course(new_course_name, new_time_slot)
-                    new_teacher.add_course(new_course_name, time_slot)
-                    classroom.remove_course(new_course_name, new_time_slot)
-                    classroom.add_course(new_course_name, time_slot)
-
-                    # Update the assignments
-                    self.assignments[course_name].remove((classroom.get_name(),
-                                                            teacher.get_name(), time_slot))
-                    self.assignments[course_name].append((classroom.get_name(),
-                                                            teacher.get_name(), new_time_slot))
-                    self.assignments[new_course_name].remove((classroom.get_name(),
-                                                                new_teacher.get_name(), new_time_slot))
-                    self.assignments[new_course_name].append((classroom.get_name(),
-                                                                new_teacher.get_name(), time_slot))
+                    self.remove_course(course_name, classroom.get_name(), teacher.get_name(), time_slot)
+                    self.add_course(course_name, classroom.get_name(), teacher.get_name(), new_time_slot)
+                    self.remove_course(new_course_name, classroom.get_name(),
+                                        new_teacher.get_name(), new_time_slot)
+                    self.add_course(new_course_name, classroom.get_name(), new_teacher.get_name(), time_slot)
 
                     return
 
@@ -257,30 +237,19 @@ class Schedule:
 
             if time_slot:
                 # remove the course from the current time slot
-                self.assignments[course_name].remove(assignment)
-                self.classrooms[classroom_name].remove_course(course_name, old_time_slot)
-                self.teachers[teacher_name].remove_course(course_name, old_time_slot)
+                self.remove_course(course_name, classroom_name, teacher_name, old_time_slot)
 
                 # add the course to the new time slot
-                self.assignments[course_name].append((classroom_name, teacher_name, time_slot))
-                self.classrooms[classroom_name].add_course(course_name, time_slot)
-                self.teachers[teacher_name].add_course(course_name, time_slot)
+                self.add_course(course_name, classroom_name, teacher_name, time_slot)
 
                 return
 
             count_iter += 1
-    
-def generate_available_time_slots( intervals: List[Tuple[int, int]], days: List[str]
-                                    ) -> List[Tuple[str, Tuple[int, int]]]:
-
-    time_slots = [] # List of pairs (day, interval)
-
-    for day in days:
-        for interval in intervals:
-            time_slots.append((day, interval))
-    return time_slots
 
-# Convert interval in format h1-h2 to a string like (h1, h2)
-def convert_interval_format(interval: str) -> str:
-    interval = "(" + interval.replace('-', ', ') + ")"
-    return interval
\ No newline at end of file
+# Random-looking 64-bit key of an assignment. It is derived from the assignment itself, so it
+# is the same in every process, and the hash of a schedule can be updated one assignment at a time.
+@lru_cache(maxsize=None)
+def zobrist_key(course: str, classroom: str, teacher: str, time_slot: Tuple[str, str]) -> int:
+    digest = hashlib.blake2b(repr((course, classroom, teacher, time_slot)).encode(),
+                                digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
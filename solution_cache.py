@@ -0,0 +1,135 @@
+import os
+import json
+import hashlib
+from typing import List
+from instance import Instance
+from neighbourhoods import Assignment
+from schedule import Schedule
+from state import State
+
+# On-disk cache of solved timetables. Each entry is a JSON file named after its key, the hash
+# of the canonical instance together with the algorithm, its parameters and the seed. Entries
+# are evicted least recently used first once the cache grows over max_bytes; a hit refreshes
+# the modification time of its file, which is what the eviction goes by.
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'orar')
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Hash of the content of an instance: the same courses, teachers, classrooms and time
+# slots give the same hash, whatever the order or the formatting of the input file
+def hash_instance(in_data: dict) -> str:
+    canonical = json.dumps(canonical_form(in_data), sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+# Every list of the input stands for a set (days, intervals, subjects, constraints), so the
+# canonical form has them all sorted. Inputs that only differ in these orders may get different
+# timetables from the same seed, either one is a timetable of both.
+def canonical_form(value):
+    if isinstance(value, dict):
+        return {key: canonical_form(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return sorted((canonical_form(item) for item in value),
+                        key=lambda item: json.dumps(item, sort_keys=True, default=str))
+    return value
+
+class CacheEntry:
+    def __init__(self, instance_hash: str, algorithm: str, hard_conflicts: int, soft_conflicts: int,
+                    assignments: List[Assignment]):
+        self.instance_hash = instance_hash
+        self.algorithm = algorithm
+        self.hard_conflicts = hard_conflicts
+        self.soft_conflicts = soft_conflicts
+        self.assignments = assignments
+
+    def get_assignments(self) -> List[Assignment]:
+        return self.assignments
+
+    def to_dict(self) -> dict:
+        return {'instance': self.instance_hash, 'algorithm': self.algorithm,
+                'hard_conflicts': self.hard_conflicts, 'soft_conflicts': self.soft_conflicts,
+                'assignments': [[course, classroom, teacher, day, interval]
+                                for course, classroom, teacher, (day, interval) in self.assignments]}
+
+    @staticmethod
+    def from_dict(data: dict) -> 'CacheEntry':
+        return CacheEntry(data['instance'], data['algorithm'], data['hard_conflicts'], data['soft_conflicts'],
+                            [(course, classroom, teacher, (day, interval))
+                                for course, classroom, teacher, day, interval in data['assignments']])
+
+class SolutionCache:
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def make_key(self, instance_hash: str, algorithm: str, parameters: dict, seed: int) -> str:
+        description = json.dumps({'instance': instance_hash, 'algorithm': algorithm,
+                                    'parameters': parameters, 'seed': seed}, sort_keys=True, default=str)
+        return hashlib.sha256(description.encode()).hexdigest()
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, key + '.json')
+
+    def get(self, key: str) -> CacheEntry:
+        path = self.entry_path(key)
+        entry = self.read_entry(path)
+        if entry is not None:
+            # Most recently used
+            os.utime(path)
+        return entry
+
+    def put(self, key: str, entry: CacheEntry):
+        # Written to a temporary file first, so that readers never see half an entry
+        path = self.entry_path(key)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(entry.to_dict(), f)
+        os.replace(path + '.tmp', path)
+        self.evict()
+
+    # The most recently used solution of the instance, whatever the algorithm and the seed
+    def find_by_instance(self, instance_hash: str) -> CacheEntry:
+        for path in self.list_entries(most_recent_first=True):
+            entry = self.read_entry(path)
+            if entry is not None and entry.instance_hash == instance_hash:
+                return entry
+        return None
+
+    def list_entries(self, most_recent_first: bool = False) -> List[str]:
+        paths = [os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                    if name.endswith('.json')]
+        return sorted(paths, key=os.path.getmtime, reverse=most_recent_first)
+
+    # Removes the least recently used entries until the cache fits in max_bytes
+    def evict(self):
+        paths = self.list_entries()
+        total_bytes = sum(os.path.getsize(path) for path in paths)
+
+        for path in paths:
+            if total_bytes <= self.max_bytes:
+                break
+            total_bytes -= os.path.getsize(path)
+            os.remove(path)
+
+    # A missing or corrupted entry is a miss
+    def read_entry(self, path: str) -> CacheEntry:
+        try:
+            with open(path) as f:
+                return CacheEntry.from_dict(json.load(f))
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+def entry_from_state(instance_hash: str, algorithm: str, state: State) -> CacheEntry:
+    return CacheEntry(instance_hash, algorithm, state.get_hard_conflicts(), state.get_soft_conflicts(),
+                        [(course, classroom, teacher, time_slot)
+                            for course, assignments in state.get_schedule().get_assignments().items()
+                            for classroom, teacher, time_slot in assignments])
+
+def state_from_entry(instance: Instance, entry: CacheEntry) -> State:
+    schedule = Schedule(instance)
+    for course, classroom, teacher, time_slot in entry.get_assignments():
+        schedule.add_course(course, classroom, teacher, time_slot)
+
+    state = State(schedule)
+    state.compute_hard_conflicts()
+    state.compute_soft_conflicts()
+    return state
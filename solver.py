@@ -0,0 +1,929 @@
+import copy
+import random
+from typing import Dict, List, Set, Tuple
+import feasibility
+import propagators
+from state import State
+from flow import max_flow
+
+# Search algorithms used by the command line (orar.py) and by the other solvers: the
+# hill climbing, the CSP and their helpers.
+
+# callback is called with the number of iterations and the current state before every
+# iteration; returning True stops the search. The search also stops once the state reaches
+# the lower bounds (hard, soft) on the conflicts, since it can not get any better.
+# moves are the neighbourhoods to explore (state.MOVES by default). With a checkpointer, the
+# search saves a checkpoint before the iterations where one is due; resume_from is such a
+# checkpoint, the search then goes on from it and initial is ignored.
+def stochastic_hill_climbing(initial: State, max_iters: int = 10000,
+                              max_no_improvement: int = 100,
+                              callback=None,
+                              lower_bounds: Tuple[int, int] = (0, 0),
+                              moves: List[str] = None,
+                              checkpointer=None,
+                              resume_from: dict = None) -> Tuple[bool, int, int, State]:
+    if resume_from is not None:
+        iters, states, no_improvement = resume_from['iters'], resume_from['states'], resume_from['no_improvement']
+        state = resume_from['state']
+        random.setstate(resume_from['random_state'])
+    else:
+        iters, states, no_improvement = 0, 0, 0
+        state = copy.deepcopy(initial)
+
+    while iters < max_iters and no_improvement < max_no_improvement:
+        if checkpointer is not None and checkpointer.is_due():
+            checkpointer.save({'iters': iters, 'states': states, 'no_improvement': no_improvement,
+                                'state': state})
+
+        if callback is not None and callback(iters, state):
+            break
+
+        if reaches_lower_bounds(state, lower_bounds):
+            break
+
+        iters += 1
+
+        # Get all possible neighbors
+        neighbors = state.get_next_states(moves)
+
+        # None of the moves changed the schedule this time
+        if not neighbors:
+            no_improvement += 1
+            continue
+
+        # Choose from the neighbors that are better than the current state
+        better_neighbors = [neighbor for neighbor in neighbors 
+                            if neighbor.get_hard_conflicts() <= state.get_hard_conflicts() and
+                            neighbor.get_soft_conflicts() <= state.get_soft_conflicts()]
+
+        if not better_neighbors:
+            break  # Local minimum reached, no better neighbors
+
+        # Alegem aleator între vecinii mai buni
+        new_state = random.choice(better_neighbors)
+        states += len(neighbors)
+
+        if (new_state.get_hard_conflicts() >= state.get_hard_conflicts() and
+            new_state.get_soft_conflicts() >= state.get_soft_conflicts()):
+            no_improvement += 1
+        else:
+            no_improvement = 0
+
+        state = new_state
+
+    return state.is_final(), iters, states, state
+
+def reaches_lower_bounds(state: State, lower_bounds: Tuple[int, int]) -> bool:
+    return (state.get_hard_conflicts() <= lower_bounds[0] and
+            state.get_soft_conflicts() <= lower_bounds[1])
+
+# Fills in the initial schedule of the local search, with the greedy constructor
+# or with random assignments
+def generate_initial_schedule(state: State, method: str = 'greedy'):
+    if method == 'greedy':
+        state.generate_greedy_schedule()
+    else:
+        state.generate_initial_schedule()
+
+# Constraints on the value of a course, in the order they are checked
+CONSTRAINTS = ['classroom_occupied', 'classroom_unsuitable', 'teacher_unsuitable', 'time_slot_not_preferred',
+                'teacher_busy', 'teacher_out_of_preferred_slots', 'teacher_teaching_too_much',
+                'classroom_overlapping_courses', 'teacher_overlapping_courses', 'soft_conflicts_bound',
+                'classroom_slot_all_different', 'teacher_slot_cardinality']
+
+# Search state of an open level of the CSP: the course it covers, the values still to be tried
+# and the culprits gathered so far. It lives outside the recursion, so that the stack of open
+# levels can be saved in a checkpoint and the search resumed from it.
+class ChoicePoint:
+    def __init__(self, level: int, course: str, state_hash: int, conflict_set: Set[int],
+                    first_index: int, skipped_culprits: Set[int], open_range: List[int],
+                    pruned_supports: Tuple[Set, Set, Set[int]]):
+        self.level = level
+        self.course = course
+        self.state_hash = state_hash  # Of the partial schedule the level started from
+        self.conflict_set = conflict_set
+        self.first_index = first_index
+        self.skipped_culprits = skipped_culprits
+        self.culprits_by_value = {}
+        self.open_range = open_range  # [next value index, end index]
+        # (classroom, time_slot) and (teacher, time_slot) pairs the global constraints ruled
+        # out for the course, and the levels responsible (see propagate_global_constraints)
+        self.pruned_supports = pruned_supports
+        self.value = None  # Being tried
+
+# Wrapper function so that we can init variables and call the recursive function
+class CSP:
+    def __init__(self, initial_state: State, max_nogood_size: int = 3,
+                    symmetry_breaking: bool = True, coverage_bounding: bool = True,
+                    max_failed_states: int = 100000, branch_and_bound: bool = False,
+                    min_soft_conflicts: int = 0, global_constraints: bool = False):
+        self.current_state = initial_state
+        self.instance = initial_state.get_schedule().get_instance()
+        self.max_nogood_size = max_nogood_size
+        self.symmetry_breaking = symmetry_breaking
+        self.coverage_bounding = coverage_bounding
+        self.global_constraints = global_constraints
+        self.nr_nodes = 0
+
+        # Branch and bound: time slots the teacher does not prefer are allowed, each one costs
+        # a soft conflict, and the best timetable found bounds the search for a cheaper one
+        # (see solve). min_soft_conflicts is a known lower bound on the soft conflicts.
+        self.branch_and_bound = branch_and_bound
+        self.min_soft_conflicts = min_soft_conflicts
+        self.best_state = None
+        self.best_soft_conflicts = None  # Caused by the decisions of the best timetable
+        self.max_soft_conflicts = None  # That the decisions may cause, None while there is no bound
+        self.nr_solutions = 0
+        self.restarting = False
+        self.levels_out_of_preference = []  # Levels of the decisions outside the preffered time slots
+
+        # Decisions taken on the current path, one per level: (course, classroom, teacher, time_slot).
+        # The indexes below tell which level is responsible for each piece of occupancy,
+        # so that a failure can be blamed on the decisions that actually caused it.
+        self.decisions = []
+        self.level_by_decision = {}
+        self.level_by_classroom_slot = {}  # Dict [(classroom, time_slot): level]
+        self.level_by_teacher_slot = {}  # Dict [(teacher, time_slot): level]
+        self.levels_by_teacher = {}  # Dict [teacher: List[level]]
+        self.levels_by_course = {}  # Dict [course: List[level]]
+        self.value_index_by_level = []  # Position of each decision in its course's domain
+        self.conflict_set_by_level = []  # Conflict set of each level when its decision was taken
+
+        # How many assignments use each classroom, teacher and time slot
+        self.classroom_uses = {}
+        self.teacher_uses = {}
+        self.time_slot_uses = {}
+
+        # Learned nogoods: sets of decisions that can not all be part of a solution,
+        # indexed by each of their decisions. Only short ones are kept, since checking
+        # long nogoods costs more than the search they save.
+        self.learned_nogoods = set()
+        self.nogoods = {}  # Dict [decision: List[frozenset]]
+
+        # Transposition table: hashes of the partial schedules whose search failed,
+        # with the decisions responsible for the failure
+        self.max_failed_states = max_failed_states
+        self.failed_states = {}  # Dict [hash: frozenset]
+
+        # Values of each open level that are still to be tried: [next value index, end index].
+        # Untried values can be handed over to another worker, see split_work.
+        self.open_ranges = {}  # Dict [level: List[int]]
+
+        # Called with the CSP on every node; returning True stops the search
+        self.node_callback = None
+        self.stopped = False
+
+        # Open levels of the search, outermost first, and the ones a checkpoint resumes
+        self.choice_points = []  # List[ChoicePoint]
+        self.resumed_choice_points = []
+        # Saves a checkpoint on the nodes where one is due, see checkpoint.py
+        self.checkpointer = None
+
+    # domains: [course: [(classroom, teacher, time_slot)]
+    def generate_domains(self):
+        domains = {}
+        schedule = self.current_state.get_schedule()
+
+        for course in schedule.courses.keys():
+            domains[course] = []
+            for classroom_name in schedule.classrooms.keys():
+                for teacher_name in schedule.teachers.keys():
+                    for time_slot in schedule.available_time_slots:
+                        # Check if the assignment satisfies constraints
+                        if self.check_domain_constraints(course, classroom_name,
+                                                        teacher_name, time_slot):
+                            domains[course].append((classroom_name, teacher_name, time_slot))
+
+            # Preffered time slots first, so that branch and bound finds cheap timetables early,
+            # then larger classrooms, so that courses are covered with fewer assignments
+            domains[course].sort(key=lambda value: (not schedule.teachers[value[1]].prefers_time_slot(value[2]),
+                                                    -schedule.classrooms[value[0]].get_capacity()))
+        return domains
+
+    # Precomputes, for each course and time slot, the teachers of the course who prefer it
+    # (the classrooms and teachers of each course are indexed by the instance)
+    def generate_coverage_indexes(self):
+        self.teachers_by_course_slot = {}
+        self.any_teachers_by_course_slot = {}
+
+        for course in self.instance.courses:
+            teachers = self.instance.get_teachers_by_course(course)
+            self.teachers_by_course_slot[course] = {}
+            self.any_teachers_by_course_slot[course] = {time_slot: teachers
+                                                        for time_slot in self.instance.available_time_slots
+                                                        if teachers}
+            for time_slot in self.instance.available_time_slots:
+                slot_teachers = [name for name in teachers
+                                    if time_slot in self.instance.teachers[name].preffered_time_slots_set]
+                if slot_teachers:
+                    self.teachers_by_course_slot[course][time_slot] = slot_teachers
+
+    # Teachers of a course in each time slot: only those who prefer it, or all of them
+    def slot_teachers(self, course, preffered_only):
+        if preffered_only:
+            return self.teachers_by_course_slot[course]
+        return self.any_teachers_by_course_slot[course]
+
+    # Number of assignments a teacher can still get (see feasibility.teacher_hours)
+    def teacher_hours_left(self, teacher_name, preffered_only=True):
+        return feasibility.teacher_hours(self.instance, teacher_name, preffered_only,
+                                            self.current_state.get_schedule())
+
+    # Upper bound on the seats a course can still get (see feasibility.reachable_seats)
+    def reachable_seats(self, course, preffered_only=True):
+        return feasibility.reachable_seats(self.instance, course, preffered_only,
+                                            self.current_state.get_schedule())
+
+    # Capacity of the largest classroom that can host a course
+    def largest_capacity(self, course):
+        return self.instance.classrooms[self.instance.get_classrooms_by_course(course)[0]].capacity
+
+    # Levels whose decisions lower the seats a course can reach: they use one of its classrooms
+    # or teachers. Its own decisions count too, as they decide how many seats are still missing.
+    def coverage_culprits(self, course):
+        classrooms = set(self.instance.get_classrooms_by_course(course))
+        teachers = set(self.instance.get_teachers_by_course(course))
+
+        return {level for level, (decision_course, classroom_name, teacher_name, _)
+                    in enumerate(self.decisions)
+                    if decision_course == course or classroom_name in classrooms or teacher_name in teachers}
+
+    # Seats each uncovered course still misses
+    def missing_seats(self) -> Dict[str, int]:
+        nr_seats_per_course = self.current_state.get_nr_seats_per_course()
+        return {course: num_students - nr_seats_per_course.get(course, 0)
+                for course, num_students in self.current_state.get_schedule().courses.items()
+                if num_students > nr_seats_per_course.get(course, 0)}
+
+    # How many more seats than it misses each uncovered course can still reach, negative
+    # once it can not be covered anymore
+    def coverage_slacks(self, missing_seats: Dict[str, int]) -> Dict[str, int]:
+        # Branch and bound may use any time slot
+        preffered_only = not self.branch_and_bound
+        return {course: self.reachable_seats(course, preffered_only) - seats
+                for course, seats in missing_seats.items()}
+
+    # Checks whether the uncovered courses can still get the seats they miss. Returns None
+    # if they might, otherwise the levels of the decisions that made it impossible.
+    def check_coverage_bounds(self, missing_seats: Dict[str, int], slacks: Dict[str, int]):
+        preffered_only = not self.branch_and_bound
+
+        # Each course on its own
+        for course, slack in slacks.items():
+            if slack < 0:
+                return self.coverage_culprits(course)
+
+        # All of them together, as they compete for the same classrooms and teachers
+        if missing_seats and (self.max_seats_flow(missing_seats, preffered_only) < sum(missing_seats.values()) or
+                                self.max_teaching_flow(missing_seats, preffered_only) < 0):
+            culprits = set()
+            for course in missing_seats:
+                culprits |= self.coverage_culprits(course)
+            return culprits
+
+        return None
+
+    # Branch and bound: returns None if the search below the current node might still beat the
+    # best timetable, otherwise the levels of the decisions that rule it out. Every decision out
+    # of the preffered time slots costs one soft conflict, and the uncovered courses need at
+    # least enough more of them for the seats and the assignments the preffered time slots
+    # can not give them: course by course, or all together with the flows of the coverage bounds.
+    def check_soft_conflicts_bound(self):
+        if self.max_soft_conflicts is None:
+            return None
+
+        schedule = self.current_state.get_schedule()
+        nr_seats_per_course = self.current_state.get_nr_seats_per_course()
+        missing_seats = {course: num_students - nr_seats_per_course.get(course, 0)
+                            for course, num_students in schedule.courses.items()
+                            if num_students > nr_seats_per_course.get(course, 0) and
+                                self.instance.get_classrooms_by_course(course)}
+        budget = self.max_soft_conflicts - len(self.levels_out_of_preference)
+
+        per_course = 0
+        for course, seats in missing_seats.items():
+            seats -= self.reachable_seats(course, preffered_only=True)
+            if seats > 0:
+                per_course += -(-seats // self.largest_capacity(course))
+
+        soft_conflicts = per_course
+        if missing_seats and soft_conflicts <= budget:
+            largest_capacity = max(self.largest_capacity(course) for course in missing_seats)
+            uncovered_seats = sum(missing_seats.values()) - self.max_seats_flow(missing_seats)
+            soft_conflicts = max(soft_conflicts, -(-uncovered_seats // largest_capacity),
+                                    -self.max_teaching_flow(missing_seats))
+
+        if soft_conflicts <= budget:
+            return None
+
+        culprits = set(self.levels_out_of_preference)
+        for course in missing_seats:
+            culprits |= self.coverage_culprits(course)
+        return culprits
+
+    # Global constraints over the assignments the uncovered courses still need, at least as many
+    # as it takes their largest classroom to cover the missing seats (see propagators.py): all
+    # different (classroom, time slot) pairs, and all different (teacher, time slot) pairs with
+    # no more than the hours each teacher has left. Returns the levels responsible if they can
+    # not be met, otherwise None and the (classroom, time_slot) and (teacher, time_slot) pairs
+    # that would leave the other needs short if the course took them, with the levels
+    # responsible. Filtering them all with one flow per constraint saves checking each value.
+    def propagate_global_constraints(self, course):
+        schedule = self.current_state.get_schedule()
+        nr_seats_per_course = self.current_state.get_nr_seats_per_course()
+        preffered_only = not self.branch_and_bound
+        hours_left = {name: self.teacher_hours_left(name, preffered_only) for name in schedule.teachers}
+
+        needs = {}  # Dict [course: nr_assignments]
+        classroom_slots, teacher_slots = {}, {}  # Dict [course: List[(name, time_slot)]]
+        for need_course, num_students in schedule.courses.items():
+            missing_seats = num_students - nr_seats_per_course.get(need_course, 0)
+            if missing_seats <= 0 or not self.instance.get_classrooms_by_course(need_course):
+                continue
+
+            needs[need_course] = -(-missing_seats // self.largest_capacity(need_course))
+            teacher_slots[need_course] = [(name, time_slot)
+                                            for time_slot, slot_teachers
+                                                in self.slot_teachers(need_course, preffered_only).items()
+                                            for name in slot_teachers
+                                            if hours_left[name] and schedule.teachers[name].is_free_at_time(time_slot)]
+            time_slots = {time_slot for _, time_slot in teacher_slots[need_course]}
+            classroom_slots[need_course] = [(name, time_slot)
+                                            for name in self.instance.get_classrooms_by_course(need_course)
+                                            for time_slot in schedule.available_time_slots
+                                            if time_slot in time_slots and
+                                                not schedule.classrooms[name].is_occupied_at_time(time_slot)]
+
+        culprits = set()
+        for need_course in needs:
+            culprits |= self.coverage_culprits(need_course)
+
+        pruned_classroom_slots = propagators.filter_supports(needs, classroom_slots, {}, {}, course)
+        if pruned_classroom_slots is None:
+            return culprits, None
+        pruned_teacher_slots = propagators.filter_supports(
+            needs, teacher_slots, {teacher_slot: teacher_slot[0] for slots in teacher_slots.values()
+                                    for teacher_slot in slots},
+            hours_left, course)
+        if pruned_teacher_slots is None:
+            return culprits, None
+
+        return None, (pruned_classroom_slots, pruned_teacher_slots, culprits)
+
+    # Number of soft conflicts of the initial state, which no decision of the search can change
+    def count_initial_soft_conflicts(self) -> int:
+        return sum(len(teacher.get_courses_that_cause_soft_conflicts())
+                    for teacher in self.current_state.get_schedule().teachers.values())
+
+    # Branch and bound starts from a timetable without hard conflicts found by other means
+    # (see algorithm_selection.find_incumbent), so that it only looks for cheaper ones
+    def set_incumbent(self, state: State):
+        self.best_state = state
+        self.best_soft_conflicts = state.get_soft_conflicts() - self.count_initial_soft_conflicts()
+
+    # Keeps a copy of a complete timetable, which is cheaper than the best one so far
+    def remember_solution(self):
+        self.nr_solutions += 1
+        self.best_soft_conflicts = len(self.levels_out_of_preference)
+        self.best_state = self.current_state.__copy__()
+        self.best_state.compute_hard_conflicts()
+        self.best_state.compute_soft_conflicts()
+
+    # Maximum number of missing seats that the free classrooms can provide, as if the seats of
+    # a classroom in a time slot could be shared between courses. A course can only use the
+    # time slots in which one of its teachers is free, has hours left and, with preffered_only,
+    # prefers to teach.
+    def max_seats_flow(self, missing_seats, preffered_only=True):
+        schedule = self.current_state.get_schedule()
+        capacities = {'source': {}}
+
+        for course, seats in missing_seats.items():
+            capacities['source'][('course', course)] = seats
+            course_edges = capacities[('course', course)] = {}
+
+            for time_slot, slot_teachers in self.slot_teachers(course, preffered_only).items():
+                if not any(schedule.teachers[name].is_free_at_time(time_slot) and
+                            self.teacher_hours_left(name, preffered_only)
+                            for name in slot_teachers):
+                    continue
+
+                for name in self.instance.get_classrooms_by_course(course):
+                    classroom = schedule.classrooms[name]
+                    if not classroom.is_occupied_at_time(time_slot):
+                        course_edges[(name, time_slot)] = seats
+                        capacities[(name, time_slot)] = {'sink': classroom.get_capacity()}
+
+        return max_flow(capacities, 'source', 'sink')
+
+    # Each course needs at least as many more assignments as it takes its largest classroom to
+    # cover the missing seats, and each assignment takes one hour of one of its teachers.
+    # Returns the hours that can be given minus the hours that are needed.
+    def max_teaching_flow(self, missing_seats, preffered_only=True):
+        capacities = {'source': {}}
+        needed_hours = 0
+
+        for course, seats in missing_seats.items():
+            if not self.instance.get_classrooms_by_course(course):
+                return -1
+
+            hours = -(-seats // self.largest_capacity(course))
+            needed_hours += hours
+            capacities['source'][('course', course)] = hours
+            capacities[('course', course)] = {('teacher', name): hours
+                                                for name in self.instance.get_teachers_by_course(course)}
+
+            for name in self.instance.get_teachers_by_course(course):
+                capacities[('teacher', name)] = {'sink': self.teacher_hours_left(name, preffered_only)}
+
+        return max_flow(capacities, 'source', 'sink') - needed_hours
+    
+    # Used to filter the domains of the variables, so that we choose only from valid assignments
+    def check_domain_constraints(self, course, classroom, teacher, time_slot):
+        schedule = self.current_state.get_schedule()
+
+        if ((not self.branch_and_bound and not schedule.teachers[teacher].prefers_time_slot(time_slot)) or
+            schedule.classrooms[classroom].is_occupied_at_time(time_slot) or
+            not schedule.classrooms[classroom].can_host_course(course) or
+            not schedule.teachers[teacher].can_teach_course(course)):
+            return False
+        
+        return True
+    
+    # Compiles the constraints on a value into lookup tables and counters, so that checking a
+    # value costs a constant number of lookups. The compatibility tables are fixed for the whole
+    # search, the counters are kept up to date by assign and unassign.
+    def compile_constraints(self):
+        schedule = self.current_state.get_schedule()
+
+        self.hostable = {(course, name) for name, classroom in schedule.classrooms.items()
+                            for course in classroom.get_subjects()}
+        self.teachable = {(course, name) for name, teacher in schedule.teachers.items()
+                            for course in teacher.get_courses()}
+        self.preferred = {(name, time_slot) for name, teacher in schedule.teachers.items()
+                            for time_slot in teacher.get_preffered_time_slots()}
+        self.nr_preferred = {name: len(teacher.get_preffered_time_slots())
+                                for name, teacher in schedule.teachers.items()}
+
+        # Assignments of each teacher, and overlaps counted the same way as count_overlaps
+        self.teacher_load = {name: sum(len(courses) for courses in teacher.get_courses_by_time_slot().values())
+                                for name, teacher in schedule.teachers.items()}
+        self.classroom_overlaps = {name: classroom.count_overlaps()
+                                    for name, classroom in schedule.classrooms.items()}
+        self.teacher_overlaps = {name: teacher.count_overlaps() for name, teacher in schedule.teachers.items()}
+
+        # How many values each constraint rejected, for debugging
+        self.rejections = dict.fromkeys(CONSTRAINTS, 0)
+
+    # Returns None if the value satisfies every constraint, otherwise the levels of the
+    # decisions that caused the first violated constraint to fail. The ones that fail only
+    # because of the input or of the initial assignments have no culprits.
+    def check_value(self, params):
+        course, classroom_name, teacher_name, time_slot = params
+        schedule = self.current_state.get_schedule()
+
+        if schedule.classrooms[classroom_name].is_occupied_at_time(time_slot):
+            return self.reject('classroom_occupied', self.level_by_classroom_slot.get((classroom_name, time_slot)))
+        if (course, classroom_name) not in self.hostable:
+            return self.reject('classroom_unsuitable')
+        if (course, teacher_name) not in self.teachable:
+            return self.reject('teacher_unsuitable')
+        preferred = (teacher_name, time_slot) in self.preferred
+        if not preferred and not self.branch_and_bound:
+            return self.reject('time_slot_not_preferred')
+
+        teacher = schedule.teachers[teacher_name]
+        if not teacher.is_free_at_time(time_slot):
+            return self.reject('teacher_busy', self.level_by_teacher_slot.get((teacher_name, time_slot)))
+        if (not self.branch_and_bound and
+            self.teacher_load[teacher_name] >= self.nr_preferred[teacher_name]):
+            return self.reject('teacher_out_of_preferred_slots', *self.levels_by_teacher.get(teacher_name, []))
+        if len(teacher.get_courses_by_time_slot()) >= 7:
+            return self.reject('teacher_teaching_too_much', *self.levels_by_teacher.get(teacher_name, []))
+        if self.classroom_overlaps[classroom_name]:
+            return self.reject('classroom_overlapping_courses')
+        if self.teacher_overlaps[teacher_name]:
+            return self.reject('teacher_overlapping_courses')
+
+        return None
+
+    # Rejects the values the global constraints ruled out at the node
+    def check_pruned_supports(self, pruned_supports, params):
+        _, classroom_name, teacher_name, time_slot = params
+        pruned_classroom_slots, pruned_teacher_slots, culprits = pruned_supports
+
+        if (classroom_name, time_slot) in pruned_classroom_slots:
+            return self.reject('classroom_slot_all_different', *culprits)
+        if (teacher_name, time_slot) in pruned_teacher_slots:
+            return self.reject('teacher_slot_cardinality', *culprits)
+        return None
+
+    def reject(self, constraint, *levels):
+        self.rejections[constraint] += 1
+        return {level for level in levels if level is not None}
+
+    def get_rejections(self) -> Dict[str, int]:
+        return self.rejections
+
+    # Keeps the load and overlap counters in sync with the occupancy, before it changes
+    def update_counters(self, classroom_name, teacher_name, time_slot, delta):
+        schedule = self.current_state.get_schedule()
+        nr_classroom_courses = len(schedule.classrooms[classroom_name].get_courses_by_time_slot().get(time_slot, []))
+        nr_teacher_courses = len(schedule.teachers[teacher_name].get_courses_by_time_slot().get(time_slot, []))
+
+        # A classroom overlap is one time slot with several courses, a teacher overlap is one extra course
+        if (delta > 0 and nr_classroom_courses == 1) or (delta < 0 and nr_classroom_courses == 2):
+            self.classroom_overlaps[classroom_name] += delta
+        if (delta > 0 and nr_teacher_courses >= 1) or (delta < 0 and nr_teacher_courses >= 2):
+            self.teacher_overlaps[teacher_name] += delta
+        self.teacher_load[teacher_name] += delta
+
+    # Returns the levels of a learned nogood that the decision would complete, or None
+    def find_violated_nogood(self, decision):
+        for nogood in self.nogoods.get(decision, []):
+            levels = set()
+            for other_decision in nogood:
+                if other_decision == decision:
+                    continue
+                if other_decision not in self.level_by_decision:
+                    break
+                levels.add(self.level_by_decision[other_decision])
+            else:
+                return levels
+
+        return None
+
+    # Records that the decisions taken at the given levels can not be part of the same solution
+    def learn_nogood(self, levels):
+        if not levels or len(levels) > self.max_nogood_size:
+            return
+
+        nogood = frozenset(self.decisions[level] for level in levels)
+        if nogood in self.learned_nogoods:
+            return
+
+        self.learned_nogoods.add(nogood)
+        for decision in nogood:
+            self.nogoods.setdefault(decision, []).append(nogood)
+
+    # Counts the assignments that are already in the schedule before the search starts
+    def count_initial_uses(self):
+        schedule = self.current_state.get_schedule()
+
+        for course, assignments in schedule.get_assignments().items():
+            for classroom_name, teacher_name, time_slot in assignments:
+                self.count_use(classroom_name, teacher_name, time_slot, 1)
+
+    def count_use(self, classroom_name, teacher_name, time_slot, delta):
+        self.classroom_uses[classroom_name] = self.classroom_uses.get(classroom_name, 0) + delta
+        self.teacher_uses[teacher_name] = self.teacher_uses.get(teacher_name, 0) + delta
+        self.time_slot_uses[time_slot] = self.time_slot_uses.get(time_slot, 0) + delta
+
+    # Maps a value to its representative: every classroom, teacher and time slot that is not
+    # used yet is replaced by the first unused one of its class. Swapping unused interchangeable
+    # entities maps solutions to solutions, so only the representative needs to be tried.
+    def find_representative(self, value):
+        classroom_name, teacher_name, time_slot = value
+        instance = self.current_state.get_schedule().get_instance()
+
+        return (first_unused(instance.classroom_classes[classroom_name], self.classroom_uses, classroom_name),
+                first_unused(instance.teacher_classes[teacher_name], self.teacher_uses, teacher_name),
+                first_unused(instance.time_slot_classes[time_slot], self.time_slot_uses, time_slot))
+
+    # Returns the levels responsible for the failure of an earlier search from the
+    # same partial schedule, or None if it was not searched yet
+    def find_failed_state(self):
+        decisions = self.failed_states.get(self.current_state.get_schedule().get_hash())
+        if decisions is None or not all(decision in self.level_by_decision for decision in decisions):
+            return None
+
+        return {self.level_by_decision[decision] for decision in decisions}
+
+    def remember_failed_state(self, state_hash, levels):
+        if len(self.failed_states) < self.max_failed_states:
+            self.failed_states[state_hash] = frozenset(self.decisions[level] for level in levels)
+
+    # Takes the untried values of the shallowest open level away from this search, so that
+    # they can be explored elsewhere. Returns them as a (prefix, first index, end index) unit,
+    # the prefix being the (decision, value index) pairs above that level, or None.
+    def split_work(self):
+        for level in range(len(self.decisions)):
+            open_range = self.open_ranges.get(level)
+            if open_range is None or open_range[0] >= open_range[1]:
+                continue
+
+            # Keep the first half, give away the second one
+            middle = (open_range[0] + open_range[1]) // 2
+            unit = (tuple(zip(self.decisions[:level], self.value_index_by_level[:level])),
+                    middle, open_range[1])
+            open_range[1] = middle
+            return unit
+
+        return None
+
+    def assign(self, decision, value_index, conflict_set):
+        course, classroom_name, teacher_name, time_slot = decision
+        schedule = self.current_state.get_schedule()
+        classroom = schedule.get_classrooms()[classroom_name]
+        level = len(self.decisions)
+
+        self.update_counters(classroom_name, teacher_name, time_slot, 1)
+        schedule.add_course(course, classroom_name, teacher_name, time_slot)
+        self.current_state.increase_nr_seats_per_course(course, classroom.get_capacity())
+
+        self.decisions.append(decision)
+        self.level_by_decision[decision] = level
+        self.level_by_classroom_slot[(classroom_name, time_slot)] = level
+        self.level_by_teacher_slot[(teacher_name, time_slot)] = level
+        self.levels_by_teacher.setdefault(teacher_name, []).append(level)
+        self.levels_by_course.setdefault(course, []).append(level)
+        self.value_index_by_level.append(value_index)
+        self.conflict_set_by_level.append(set(conflict_set))
+        self.count_use(classroom_name, teacher_name, time_slot, 1)
+        if not schedule.teachers[teacher_name].prefers_time_slot(time_slot):
+            self.levels_out_of_preference.append(level)
+
+    def unassign(self, decision):
+        course, classroom_name, teacher_name, time_slot = decision
+        schedule = self.current_state.get_schedule()
+        classroom = schedule.get_classrooms()[classroom_name]
+
+        self.update_counters(classroom_name, teacher_name, time_slot, -1)
+        schedule.remove_course(course, classroom_name, teacher_name, time_slot)
+        self.current_state.increase_nr_seats_per_course(course, -classroom.get_capacity())
+
+        self.decisions.pop()
+        del self.level_by_decision[decision]
+        del self.level_by_classroom_slot[(classroom_name, time_slot)]
+        del self.level_by_teacher_slot[(teacher_name, time_slot)]
+        self.levels_by_teacher[teacher_name].pop()
+        self.levels_by_course[course].pop()
+        self.value_index_by_level.pop()
+        self.conflict_set_by_level.pop()
+        self.count_use(classroom_name, teacher_name, time_slot, -1)
+        if not schedule.teachers[teacher_name].prefers_time_slot(time_slot):
+            self.levels_out_of_preference.pop()
+    
+    # Everything the search needs to go on from the current node: the CSP itself, with its
+    # state, learned nogoods and counters, and the stack of open choice points
+    def get_checkpoint(self) -> dict:
+        return {'csp': {name: value for name, value in self.__dict__.items()
+                        if name not in ('node_callback', 'checkpointer')}}
+
+    # Searches for a full schedule. A unit of work can be given to explore only part of the
+    # tree: the decisions of the prefix are taken as they are, and the level right below it
+    # only tries the values with an index between first_index and end_index. A search can
+    # also go on from a checkpoint (see get_checkpoint) of the same instance and options.
+    def solve(self, prefix: Tuple = (), first_index: int = 0, end_index: int = None,
+                resume_from: dict = None):
+        if resume_from is not None:
+            random.setstate(resume_from['random_state'])
+            self.__dict__.update(resume_from['csp'])
+            self.resumed_choice_points, self.choice_points = self.choice_points, []
+        else:
+            self.domains = self.generate_domains()
+            self.compile_constraints()
+
+            # Between courses equally close to running out of seats (see backtrack), the one with
+            # the least teachers goes first, as it is the most constrained
+            self.current_state.get_schedule().reorder_by_nr_teachers()
+            self.count_initial_uses()
+            self.generate_coverage_indexes()
+
+        domains = self.domains
+        domain_indexes = {course: {value: index for index, value in enumerate(domain)}
+                            for course, domain in domains.items()}
+
+        # The choices above the unit are blamed on all the levels before them
+        for decision, value_index in prefix:
+            self.assign(decision, value_index, set(range(len(self.decisions))))
+        root_level = len(self.decisions)
+        unit_range = (first_index, end_index)
+
+        # Conflict-directed backjumping: besides the solution, each call returns the levels of
+        # the decisions responsible for its failure. When the current level is not among them,
+        # changing its value can not help, so the search jumps straight back to the culprit.
+        def backtrack():
+            schedule = self.current_state.get_schedule()
+
+            # Checking if all students are covered
+            if self.current_state.conflicts_caused_by_not_enough_seats() == 0:
+                if not self.branch_and_bound:
+                    return self.current_state, set()
+
+                # Under a bound, the timetable is the cheapest one (see solve). Otherwise look
+                # for a cheaper one from the root, unless none can exist.
+                self.remember_solution()
+                if (self.max_soft_conflicts is not None or
+                    self.best_state.get_soft_conflicts() <= self.min_soft_conflicts):
+                    return self.best_state, set()
+                self.restarting = True
+                return None, set()
+
+            # Branch on the uncovered course closest to running out of seats. A fixed order lets
+            # the first courses use up the teachers and classrooms a later one needs, and the
+            # search only finds out deep below, with too many culprits to learn from.
+            missing_seats = self.missing_seats()
+            slacks = self.coverage_slacks(missing_seats)
+            if not slacks:
+                return self.current_state, set()
+            course = min(slacks, key=slacks.get)
+
+            if self.node_callback is not None and self.node_callback(self):
+                self.stopped = True
+                return None, set()
+
+            if self.checkpointer is not None and self.checkpointer.is_due():
+                self.checkpointer.save(self.get_checkpoint())
+
+            state_hash = schedule.get_hash()
+            conflict_set = self.find_failed_state()
+            if conflict_set is not None:
+                return None, conflict_set
+
+            # Stop as soon as some course can not be covered anymore, instead of
+            # finding out only when the search gets to it
+            if self.coverage_bounding:
+                conflict_set = self.check_coverage_bounds(missing_seats, slacks)
+                if conflict_set is not None:
+                    self.learn_nogood(conflict_set)
+                    return None, conflict_set
+
+            if self.branch_and_bound:
+                conflict_set = self.check_soft_conflicts_bound()
+                if conflict_set is not None:
+                    self.learn_nogood(conflict_set)
+                    return None, conflict_set
+
+            pruned_supports = (set(), set(), set())
+            if self.global_constraints:
+                conflict_set, pruned_supports = self.propagate_global_constraints(course)
+                if conflict_set is not None:
+                    self.learn_nogood(conflict_set)
+                    return None, conflict_set
+
+            level = len(self.decisions)
+            # Another value is needed only because the ones already chosen for this course
+            # do not cover all its students, so they take part in any failure of this level.
+            conflict_set = set(self.levels_by_course.get(course, []))
+
+            # The values of a course form a set, so they are chosen in domain order. The values
+            # before the last one chosen were already tried at its level, and failed for the
+            # reasons gathered there.
+            first_index = 0
+            skipped_culprits = set()
+            if self.symmetry_breaking and self.levels_by_course.get(course):
+                last_level = self.levels_by_course[course][-1]
+                first_index = self.value_index_by_level[last_level] + 1
+                skipped_culprits = self.conflict_set_by_level[last_level]
+                conflict_set |= skipped_culprits
+
+            open_range = [first_index, len(domains[course])]
+            if level == root_level:
+                unit_first_index, unit_end_index = unit_range
+                open_range[0] = max(open_range[0], unit_first_index)
+                if unit_end_index is not None:
+                    open_range[1] = min(open_range[1], unit_end_index)
+            self.open_ranges[level] = open_range
+
+            choice_point = ChoicePoint(level, course, state_hash, conflict_set, first_index,
+                                        skipped_culprits, open_range, pruned_supports)
+            self.choice_points.append(choice_point)
+            result = try_values(choice_point)
+            self.choice_points.pop()
+            return result
+
+        # Tries the values of an open level that are still in its range
+        def try_values(choice_point):
+            course, conflict_set = choice_point.course, choice_point.conflict_set
+            culprits_by_value, open_range = choice_point.culprits_by_value, choice_point.open_range
+
+            while open_range[0] < open_range[1]:
+                value_index = open_range[0]
+                open_range[0] += 1
+                value = domains[course][value_index]
+                classroom_name, teacher_name, time_slot = value
+                params = (course, classroom_name, teacher_name, time_slot)
+
+                # The values out of the preffered time slots come last in the domain, so once
+                # one more soft conflict can not beat the best timetable, none of them can
+                if (self.branch_and_bound and (teacher_name, time_slot) not in self.preferred and
+                    self.max_soft_conflicts is not None and
+                    len(self.levels_out_of_preference) >= self.max_soft_conflicts):
+                    conflict_set |= self.reject('soft_conflicts_bound', *self.levels_out_of_preference)
+                    break
+
+                culprits = None
+                if self.symmetry_breaking:
+                    representative = self.find_representative(value)
+                    if representative != value:
+                        # The representative comes first in the domain, so it was already
+                        # handled and this value fails for the same reasons.
+                        if representative in culprits_by_value:
+                            culprits = culprits_by_value[representative]
+                        elif domain_indexes[course].get(representative, choice_point.first_index) < \
+                                choice_point.first_index:
+                            culprits = choice_point.skipped_culprits
+
+                if culprits is None:
+                    culprits = self.find_violated_nogood(params)
+                if culprits is None:
+                    culprits = self.check_value(params)
+                if culprits is None:
+                    culprits = self.check_pruned_supports(choice_point.pruned_supports, params)
+
+                if culprits is not None:
+                    culprits_by_value[value] = culprits
+                    conflict_set |= culprits
+                    continue
+
+                # Assign the course to a teacher and classroom
+                self.assign(params, value_index, conflict_set)
+                self.nr_nodes += 1
+                choice_point.value = value
+
+                outcome = after_child(choice_point, *backtrack())
+                if outcome is not None:
+                    return outcome
+
+            self.learn_nogood(conflict_set)
+            self.remember_failed_state(choice_point.state_hash, conflict_set)
+            return None, conflict_set
+
+        # Handles the result of the search below the value being tried at an open level.
+        # Returns the result of the level, or None if its next values have to be tried.
+        def after_child(choice_point, result, child_conflict_set):
+            if result:
+                return result, set()
+
+            # Remove the course from the assignment in case the result is None
+            self.unassign((choice_point.course,) + choice_point.value)
+
+            if self.stopped or self.restarting:
+                return None, set()
+
+            if choice_point.level not in child_conflict_set:
+                self.remember_failed_state(choice_point.state_hash, child_conflict_set)
+                return None, child_conflict_set
+
+            culprits = child_conflict_set - {choice_point.level}
+            choice_point.culprits_by_value[choice_point.value] = culprits
+            choice_point.conflict_set |= culprits
+            return None
+
+        # Goes back down the open levels of a checkpoint, without taking their decisions again
+        # (they are part of the restored state), and goes on as if the search never stopped
+        def resume(choice_points):
+            choice_point = choice_points[0]
+            self.choice_points.append(choice_point)
+            if len(choice_points) > 1:
+                outcome = after_child(choice_point, *resume(choice_points[1:]))
+            else:
+                outcome = after_child(choice_point, *backtrack())
+            if outcome is None:
+                outcome = try_values(choice_point)
+            self.choice_points.pop()
+            return outcome
+
+        def descend():
+            choice_points, self.resumed_choice_points = self.resumed_choice_points, []
+            if choice_points:
+                return resume(choice_points)
+            return backtrack()
+
+        # Start backtracking with an empty assignment
+        if not self.branch_and_bound:
+            return descend()[0]
+
+        # The first timetable, the incumbent if there is one, bounds the soft conflicts from
+        # above. The next searches prune every branch that can not get under a bound, starting
+        # from the lower bound and raising it by one each time the search fails, so the first
+        # timetable they find is optimal. The nogoods learned under a bound do not hold under a
+        # higher one.
+        if self.max_soft_conflicts is None:
+            if self.best_state is None:
+                descend()
+                if not self.restarting:
+                    return self.best_state
+                self.restarting = False
+
+            self.max_soft_conflicts = max(0, self.min_soft_conflicts - self.count_initial_soft_conflicts())
+
+        while not self.stopped and self.max_soft_conflicts < self.best_soft_conflicts:
+            if descend()[0] is not None:
+                break
+            self.max_soft_conflicts += 1
+            self.learned_nogoods, self.nogoods, self.failed_states = set(), {}, {}
+
+        # The best timetable found, even if the search was stopped before proving it optimal
+        return self.best_state
+
+# Returns the item itself if it is used, otherwise the first unused item of its class
+def first_unused(members, uses, item):
+    if uses.get(item, 0):
+        return item
+
+    for member in members:
+        if not uses.get(member, 0):
+            return member
+
+    return item
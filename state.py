@@ -1,9 +1,20 @@
 import random
 import copy
-from typing import Dict
+from typing import Dict, List, Set, Tuple
+import feasibility
+import neighbourhoods
 from schedule import Schedule
 
+# Moves of the local search. The chain moves change many assignments at once and are
+# evaluated by delta, the other ones by counting all the conflicts again.
+MOVES = ["switch_teachers_soft_conflict", "move_course_to_free_slot",
+            "switch_courses_same_classroom", "move_course_to_free_slot_no_conflicts"]
+CHAIN_MOVES = {"kempe_chain": neighbourhoods.kempe_chain,
+                "ejection_chain": neighbourhoods.ejection_chain}
+
 class State:
+    __slots__ = ('schedule', 'hard_conflicts', 'soft_conflicts', 'nr_seats_per_course')
+
     def __init__(self, schedule: Schedule,
                 hard_conflicts: int = 0, 
                 soft_conflicts: int = 0):
@@ -13,6 +24,17 @@ class State:
         self.soft_conflicts = soft_conflicts
         self.nr_seats_per_course = {}  # Dict [course_name: nr_seats]
 
+    def __copy__(self):
+        state = State.__new__(State)
+        state.schedule = self.schedule.__copy__()
+        state.hard_conflicts = self.hard_conflicts
+        state.soft_conflicts = self.soft_conflicts
+        state.nr_seats_per_course = dict(self.nr_seats_per_course)
+        return state
+
+    def __deepcopy__(self, memo):
+        return self.__copy__()
+
     def is_final(self) -> bool:
         return self.hard_conflicts == 0 and self.soft_conflicts == 0
     
@@ -53,6 +75,7 @@ class State:
     def compute_hard_conflicts(self) -> int:
         hard_conflicts = 0
         assignments = self.schedule.get_assignments()
+        self.nr_seats_per_course = {}
 
         for course_name, assignment_list in assignments.items():
             for assignment in assignment_list:
@@ -99,16 +122,16 @@ class State:
         for teacher in self.schedule.teachers:
             teacher = self.schedule.teachers[teacher]
             for time_slot in teacher.get_courses_by_time_slot():
-                if time_slot not in teacher.get_preffered_time_slots():
+                if not teacher.prefers_time_slot(time_slot):
                     soft_conflicts += 1
 
         self.soft_conflicts = soft_conflicts
 
+    # Assigns the courses that are not yet covered. Assignments that are already
+    # in the schedule (e.g. kept from a previous timetable) are left untouched.
     def generate_initial_schedule(self):
-        assignments = {}
-
         for course, num_students in self.schedule.courses.items():
-            remaining_students = num_students
+            remaining_students = num_students - self.nr_seats_per_course.get(course, 0)
 
             # Randomly choose a classroom and a teacher for each course
             available_classrooms = list(self.schedule.classrooms.keys())
@@ -140,10 +163,7 @@ class State:
 
                                 # Assign the course to the classroom and teacher
                                 if course and classroom and teacher and time_slot:
-                                    assignments.setdefault(course, []).append((classroom,
-                                                                                teacher, time_slot))
-                                    classroom_as_class.add_course(course, time_slot)
-                                    teacher_as_class.add_course(course, time_slot)
+                                    self.schedule.add_course(course, classroom, teacher, time_slot)
                                     remaining_students -= self.schedule.classrooms[classroom].get_capacity()
                                     assigned = True
                                     break
@@ -155,11 +175,78 @@ class State:
                 if not assigned:
                     break
 
-        self.schedule.set_assignments(assignments)
         self.compute_hard_conflicts()
         self.compute_soft_conflicts()
 
-    def apply_move(self, move: str):
+    # Deterministic alternative to generate_initial_schedule. The courses with the fewest
+    # reachable seats compared to their students come first; each one gets, one at a time,
+    # the assignment that covers the most of its remaining students in a time slot its teacher
+    # prefers. Assignments that are already in the schedule are kept.
+    def generate_greedy_schedule(self):
+        instance = self.schedule.get_instance()
+        courses = sorted(self.schedule.courses, key=lambda course: -instance.courses[course] /
+                            max(1, feasibility.reachable_seats(instance, course, preffered_only=True)))
+
+        for course in courses:
+            remaining_students = self.schedule.courses[course] - self.nr_seats_per_course.get(course, 0)
+
+            while remaining_students > 0:
+                # Time slots the teachers do not prefer are only used when nothing else is left
+                assignment = (self.find_greedy_assignment(course, remaining_students, preffered_only=True) or
+                                self.find_greedy_assignment(course, remaining_students, preffered_only=False))
+                if assignment is None:
+                    break
+
+                classroom, teacher, time_slot = assignment
+                self.schedule.add_course(course, classroom, teacher, time_slot)
+                remaining_students -= self.schedule.classrooms[classroom].get_capacity()
+
+        self.compute_hard_conflicts()
+        self.compute_soft_conflicts()
+
+    # Best free (classroom, teacher, time slot) for a course: the most students covered, then the
+    # least wasted seats, then the teacher with the most hours left. Teachers never go over
+    # 7 time slots. Returns None if there is no such assignment.
+    def find_greedy_assignment(self, course: str, remaining_students: int,
+                                preffered_only: bool) -> Tuple[str, str, Tuple[str, str]]:
+        instance = self.schedule.get_instance()
+        best_key, best_assignment = None, None
+
+        for teacher_name in instance.get_teachers_by_course(course):
+            teacher = self.schedule.teachers[teacher_name]
+            if teacher.is_teaching_too_much():
+                continue
+
+            hours_left = (min(7, len(teacher.get_preffered_time_slots())) -
+                            len(teacher.get_courses_by_time_slot()))
+            time_slots = (teacher.get_preffered_time_slots() if preffered_only
+                            else self.schedule.available_time_slots)
+
+            for time_slot in time_slots:
+                if not teacher.is_free_at_time(time_slot):
+                    continue
+
+                for classroom_name in instance.get_classrooms_by_course(course):
+                    classroom = self.schedule.classrooms[classroom_name]
+                    if classroom.is_occupied_at_time(time_slot):
+                        continue
+
+                    capacity = classroom.get_capacity()
+                    key = (-min(capacity, remaining_students), capacity, -hours_left)
+                    if best_key is None or key < best_key:
+                        best_key, best_assignment = key, (classroom_name, teacher_name, time_slot)
+
+        return best_assignment
+
+    # Returns None if the move is invalid or leads to one of the already seen schedules
+    def apply_move(self, move: str, seen_hashes: Set[int] = None):
+        if move in CHAIN_MOVES:
+            neighbor_state = CHAIN_MOVES[move](self)
+            if neighbor_state is None or (seen_hashes is not None and
+                                            neighbor_state.get_schedule().get_hash() in seen_hashes):
+                return None
+            return neighbor_state
+
         neighbor_state = copy.deepcopy(self)
 
         if move == "switch_teachers_soft_conflict":
@@ -182,6 +269,10 @@ class State:
             print("Invalid move.")
             return
 
+        # Moves often change nothing, no need to evaluate the same schedule again
+        if seen_hashes is not None and neighbor_state.get_schedule().get_hash() in seen_hashes:
+            return None
+
         neighbor_state.compute_hard_conflicts()
         neighbor_state.compute_soft_conflicts()
 
@@ -225,27 +316,35 @@ class State:
                     attempts += 1
                     continue
 
-                # Switch the teachers for the courses by updating the assignments and teachers courses_by_time_slot
-                teacher1.remove_course(course_t2_can_teach_from_t1[1], time_slot_1)
-                teacher2.remove_course(course_t1_can_teach_from_t2[1], time_slot_2)
-                teacher1.add_course(course_t2_can_teach_from_t1[1], time_slot_1)
-                teacher2.add_course(course_t1_can_teach_from_t2[1], time_slot_2)
-
-                # Update the assignments
+                # Switch the teachers for the courses, in the assignments and in the teachers' occupancy
                 self.schedule.switch_teachers_in_assignments(teacher1, teacher2, course_t2_can_teach_from_t1,
                                                                 course_t1_can_teach_from_t2)
                 return
 
             attempts += 1
 
-    def get_next_states(self):
+    # Returns the distinct neighbours that differ from the current state,
+    # one for each of the moves (all the moves of MOVES by default)
+    def get_next_states(self, moves: List[str] = None):
         next_states = []
-        
-        # Generate all possible moves
-        moves = ["switch_teachers_soft_conflict", "move_course_to_free_slot",
-                    "switch_courses_same_classroom", "move_course_to_free_slot_no_conflicts"]
-
-        for move in moves:
-            next_states.append(self.apply_move(move))
-
-        return next_states
\ No newline at end of file
+        seen_hashes = {self.schedule.get_hash()}
+
+        for move in moves or MOVES:
+            neighbor_state = self.apply_move(move, seen_hashes)
+            if neighbor_state is not None:
+                seen_hashes.add(neighbor_state.get_schedule().get_hash())
+                next_states.append(neighbor_state)
+
+        return next_states
+
+# Builds a state with the same assignments, whose occupancy and conflicts match them
+def rebuild_state(state: State) -> State:
+    schedule = Schedule(state.get_schedule().get_instance())
+    for course, assignments in state.get_schedule().get_assignments().items():
+        for classroom, teacher, time_slot in assignments:
+            schedule.add_course(course, classroom, teacher, time_slot)
+
+    new_state = State(schedule)
+    new_state.compute_hard_conflicts()
+    new_state.compute_soft_conflicts()
+    return new_state
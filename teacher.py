@@ -1,37 +1,73 @@
 from typing import List, Dict, Tuple
 
-class Teacher:
+class TeacherInfo:
+    # Static data about a teacher. It is shared by every schedule built from the same instance,
+    # so it must never be modified after it is created.
     def __init__(self, name: str, constraints: List[str], courses: List[str],
-                    preffered_time_slots: Dict[str, List[str]]):
+                    preffered_time_slots: List[Tuple[str, str]]):
         self.name = name
-        self.courses = courses  # List of courses they can teach
-        self.constraints = constraints  # List of constraints
-        self.preffered_time_slots = preffered_time_slots # List of preffered time slots
+        self.constraints = tuple(constraints)  # List of constraints
+        self.courses = tuple(courses)  # List of courses they can teach
+        self.preffered_time_slots = tuple(preffered_time_slots) # List of preffered time slots
+        self.preffered_time_slots_set = frozenset(preffered_time_slots)
+
+    # Being read-only, the data can be shared instead of copied
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+class Teacher:
+    __slots__ = ('info', 'courses_by_time_slot')
+
+    def __init__(self, info: TeacherInfo):
+        self.info = info
         self.courses_by_time_slot = {}  # Dict [time_slot: List[course]]
 
+    # Only the occupancy is copied, the static info is shared
+    def __copy__(self):
+        teacher = Teacher.__new__(Teacher)
+        teacher.info = self.info
+        teacher.courses_by_time_slot = {time_slot: list(courses) for time_slot, courses
+                                            in self.courses_by_time_slot.items()}
+        return teacher
+
+    def __deepcopy__(self, memo):
+        return self.__copy__()
+
     def get_name(self) -> str:
-        return self.name
+        return self.info.name
+
+    def get_info(self) -> TeacherInfo:
+        return self.info
     
+    def get_courses(self) -> Tuple[str]:
+        return self.info.courses
+
     def get_courses_by_time_slot(self) -> Dict[Tuple[str, Tuple[int, int]], List[str]]:
         return self.courses_by_time_slot
     
-    def get_constraints(self) -> List[str]:
-        return self.constraints
+    def get_constraints(self) -> Tuple[str]:
+        return self.info.constraints
     
-    def get_preffered_time_slots(self) -> Dict[str, List[str]]:
-        return self.preffered_time_slots
+    def get_preffered_time_slots(self) -> Tuple[Tuple[str, str]]:
+        return self.info.preffered_time_slots
+
+    def prefers_time_slot(self, time_slot: Tuple[str, str]) -> bool:
+        return time_slot in self.info.preffered_time_slots_set
     
     # Returns the courses that cuase soft conflicts for a teacher
     def get_courses_that_cause_soft_conflicts(self) -> Dict[Tuple[str, Tuple[int, int]], List[str]]:
         conflicting_courses = {}
         for slot in self.courses_by_time_slot:
-            if slot not in self.preffered_time_slots:
+            if not self.prefers_time_slot(slot):
                 conflicting_courses[slot] = self.courses_by_time_slot[slot]
 
         return conflicting_courses
 
     def can_teach_course(self, course: str) -> bool:
-        return course in self.courses
+        return course in self.info.courses
     
     # A teacher can be assigned to max number of preffered time slots.
     def has_available_time_slot(self) -> bool:
@@ -39,7 +75,7 @@ class Teacher:
         for slot in self.courses_by_time_slot:
             nr_courses_by_time_slot += len(self.courses_by_time_slot[slot])
 
-        return nr_courses_by_time_slot < len(self.preffered_time_slots)
+        return nr_courses_by_time_slot < len(self.info.preffered_time_slots)
 
     def is_teaching_too_much(self) -> bool:
         # check if the teacher has more than 7 assignments per week
@@ -68,7 +104,7 @@ class Teacher:
         for time_slot, courses in other_teacher_soft_conflicts.items():
             for course in courses:
                 # Check if teacher2 can teach course1
-                if self.can_teach_course(course) and time_slot not in self.preffered_time_slots:
+                if self.can_teach_course(course) and not self.prefers_time_slot(time_slot):
                     result = (time_slot, course)
 
         return result
@@ -0,0 +1,113 @@
+import random
+from typing import Dict, List, Tuple
+from instance import Instance
+
+# Tiny random instances and exhaustive references for the tests. The references work on the
+# instance alone, without Schedule or State, so they do not share bugs with the solvers.
+
+DAYS = ['Luni', 'Marti', 'Miercuri']
+INTERVALS = ['(8, 10)', '(10, 12)', '(12, 14)']
+
+# At most 3 days, 3 intervals, 3 courses, 3 classrooms and 4 teachers. Teacher names have two
+# words, like in the inputs.
+def random_instance(rng: random.Random) -> Instance:
+    days = DAYS[:rng.randint(1, 3)]
+    intervals = INTERVALS[:rng.randint(1, 3)]
+    courses = {'C' + str(i): rng.choice([10, 20, 30, 40, 60]) for i in range(rng.randint(1, 3))}
+
+    classrooms = {}
+    for i in range(rng.randint(1, 3)):
+        classrooms['R' + str(i)] = {'Capacitate': rng.choice([10, 20, 30]),
+                                    'Materii': rng.sample(list(courses), rng.randint(1, len(courses)))}
+
+    teachers = {}
+    for i in range(rng.randint(1, 4)):
+        constraints = []
+        if rng.random() < 0.4:
+            constraints.append('!' + rng.choice(days))
+        if rng.random() < 0.3:
+            constraints.append('!8-10')
+        teachers['T' + str(i) + ' Pop'] = {'Constrangeri': constraints,
+                                            'Materii': rng.sample(list(courses), rng.randint(1, len(courses)))}
+
+    return Instance({'Intervale': intervals, 'Zile': days, 'Materii': courses,
+                        'Sali': classrooms, 'Profesori': teachers})
+
+def random_instances(seed: int, nr_instances: int) -> List[Instance]:
+    rng = random.Random(seed)
+    return [random_instance(rng) for _ in range(nr_instances)]
+
+# Minimum number of soft conflicts of a timetable without hard conflicts, None if every
+# timetable has a hard conflict. Tries every set of (classroom, teacher, time slot) values
+# for each course in turn, stopping a course as soon as it has enough seats: removing values
+# never adds a conflict, so some optimal timetable is made of such sets.
+def min_soft_conflicts(instance: Instance) -> int:
+    courses = list(instance.courses.items())
+    values = {course: [(classroom, teacher, time_slot)
+                        for classroom in instance.get_classrooms_by_course(course)
+                        for teacher in instance.get_teachers_by_course(course)
+                        for time_slot in instance.available_time_slots]
+                for course, _ in courses}
+    best = [None]
+
+    def search(index, nr_seats, used, load, first, cost):
+        if best[0] is not None and cost >= best[0]:
+            return
+        if index == len(courses):
+            best[0] = cost
+            return
+
+        course, nr_students = courses[index]
+        if nr_seats >= nr_students:
+            search(index + 1, 0, used, load, 0, cost)
+            return
+
+        for position in range(first, len(values[course])):
+            classroom, teacher, time_slot = values[course][position]
+            if ((classroom, time_slot) in used or (teacher, time_slot) in used or
+                    load.get(teacher, 0) == 7):
+                continue
+
+            used.add((classroom, time_slot))
+            used.add((teacher, time_slot))
+            load[teacher] = load.get(teacher, 0) + 1
+            search(index, nr_seats + instance.classrooms[classroom].capacity, used, load, position + 1,
+                    cost + (time_slot not in instance.teachers[teacher].preffered_time_slots_set))
+            used.discard((classroom, time_slot))
+            used.discard((teacher, time_slot))
+            load[teacher] -= 1
+
+    search(0, 0, set(), {}, 0, 0)
+    return best[0]
+
+# Hard and soft conflicts of a list of (course, classroom, teacher, time slot) assignments,
+# counted the way State does
+def count_conflicts(instance: Instance, assignments: List[Tuple]) -> Tuple[int, int]:
+    hard = 0
+    nr_seats = {}  # Dict [course: int]
+    classroom_slots = {}  # Dict [(classroom, time_slot): int]
+    teacher_slots = {}  # Dict [teacher: Dict [time_slot: int]]
+
+    for course, classroom, teacher, time_slot in assignments:
+        hard += course not in instance.teachers[teacher].courses
+        hard += course not in instance.classrooms[classroom].subjects
+        nr_seats[course] = nr_seats.get(course, 0) + instance.classrooms[classroom].capacity
+        classroom_slots[(classroom, time_slot)] = classroom_slots.get((classroom, time_slot), 0) + 1
+        slots = teacher_slots.setdefault(teacher, {})
+        slots[time_slot] = slots.get(time_slot, 0) + 1
+
+    hard += sum(nr_seats.get(course, 0) < nr_students for course, nr_students in instance.courses.items())
+    hard += sum(count > 1 for count in classroom_slots.values())
+
+    soft = 0
+    for teacher, slots in teacher_slots.items():
+        hard += len(slots) > 7
+        hard += sum(count - 1 for count in slots.values())
+        soft += sum(time_slot not in instance.teachers[teacher].preffered_time_slots_set
+                    for time_slot in slots)
+
+    return hard, soft
+
+def list_assignments(assignments: Dict[str, List[Tuple]]) -> List[Tuple]:
+    return [(course,) + assignment for course, course_assignments in assignments.items()
+            for assignment in course_assignments]
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The modules of the timetable live at the root of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# The CSP recurses once per decision
+sys.setrecursionlimit(10000)
@@ -0,0 +1,80 @@
+import os
+import random
+import pytest
+import checkpoint
+import feasibility
+import utils
+from instance import Instance
+from schedule import Schedule
+from solver import CSP, stochastic_hill_climbing, generate_initial_schedule
+from state import State
+
+INPUTS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'inputs')
+HEADER = {'instance': 'test'}
+
+# Saves a single checkpoint, the nth time the search asks whether one is due
+class CheckpointAt(checkpoint.Checkpointer):
+    def __init__(self, path, n):
+        super().__init__(path, HEADER)
+        self.n = n
+        self.nr_calls = 0
+
+    def is_due(self) -> bool:
+        self.nr_calls += 1
+        return self.nr_calls == self.n
+
+def read_instance(name):
+    return Instance(utils.read_yaml_file(os.path.join(INPUTS, name + '.yaml')))
+
+def run_csp(instance, branch_and_bound, checkpointer=None, resume_from=None):
+    report = feasibility.analyze(instance)
+    csp = CSP(State(Schedule(instance)), branch_and_bound=branch_and_bound,
+                min_soft_conflicts=report.min_soft_conflicts)
+    csp.checkpointer = checkpointer
+    return csp, csp.solve(resume_from=resume_from)
+
+# A search resumed from a checkpoint ends exactly like the one that saved it
+@pytest.mark.parametrize('name, branch_and_bound, node', [('orar_bonus_exact', False, 40),
+                                                            ('orar_mic_exact', False, 20),
+                                                            ('orar_mic_exact', True, 20)])
+def test_csp_resume(tmp_path, name, branch_and_bound, node):
+    instance = read_instance(name)
+    path = str(tmp_path / 'csp.ckpt')
+    csp, final_state = run_csp(instance, branch_and_bound, CheckpointAt(path, node))
+    # Saved midway
+    assert final_state is not None and csp.nr_nodes > node
+
+    resumed_csp, resumed_state = run_csp(instance, branch_and_bound,
+                                            resume_from=checkpoint.load_checkpoint(path, HEADER))
+    assert resumed_state.get_schedule().get_hash() == final_state.get_schedule().get_hash()
+    assert resumed_csp.nr_nodes == csp.nr_nodes
+    assert resumed_csp.get_rejections() == csp.get_rejections()
+
+def test_hill_climbing_resume(tmp_path):
+    instance = read_instance('orar_mic_exact')
+    path = str(tmp_path / 'hc.ckpt')
+
+    def run(checkpointer):
+        random.seed(7)
+        state = State(Schedule(instance))
+        generate_initial_schedule(state, 'random')
+        return stochastic_hill_climbing(state, checkpointer=checkpointer)
+
+    _, iters, nr_states, final_state = run(CheckpointAt(path, 5))
+    assert iters > 5
+    # The checkpoint brings back the random number generator too
+    random.seed(123)
+    _, resumed_iters, resumed_nr_states, resumed_state = stochastic_hill_climbing(
+        None, resume_from=checkpoint.load_checkpoint(path, HEADER))
+
+    assert (resumed_iters, resumed_nr_states) == (iters, nr_states)
+    assert resumed_state.get_schedule().get_hash() == final_state.get_schedule().get_hash()
+
+def test_load_checkpoint(tmp_path):
+    path = str(tmp_path / 'missing.ckpt')
+    assert checkpoint.load_checkpoint(path, HEADER) is None
+
+    checkpoint.Checkpointer(path, HEADER).save({'iters': 3})
+    assert checkpoint.load_checkpoint(path, HEADER)['iters'] == 3
+    with pytest.raises(ValueError):
+        checkpoint.load_checkpoint(path, {'instance': 'other'})
@@ -0,0 +1,108 @@
+import os
+import random
+import time
+import pytest
+import algorithm_selection
+import decomposition
+import feasibility
+import parallel
+import utils
+from brute_force import random_instances, min_soft_conflicts, count_conflicts, list_assignments
+from instance import Instance
+from schedule import Schedule
+from solver import CSP
+from state import State
+from two_phase import TwoPhaseSolver
+
+# The exact solvers against the exhaustive reference: they find a timetable exactly when one
+# exists, and the timetable has the conflicts they report.
+
+INPUTS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'inputs')
+
+def check_timetable(instance, state, soft_conflicts):
+    assignments = list_assignments(state.get_schedule().get_assignments())
+    assert count_conflicts(instance, assignments) == (0, soft_conflicts)
+    assert (state.get_hard_conflicts(), state.get_soft_conflicts()) == (0, soft_conflicts)
+
+@pytest.mark.parametrize('options', [{}, {'symmetry_breaking': False}, {'coverage_bounding': False},
+                                        {'max_nogood_size': 0}, {'global_constraints': True}])
+def test_csp(options):
+    random.seed(0)
+    for instance in random_instances(1, 100):
+        final_state = CSP(State(Schedule(instance)), **options).solve()
+
+        # The CSP only uses the preffered time slots
+        assert (final_state is not None) == (min_soft_conflicts(instance) == 0)
+        if final_state is not None:
+            check_timetable(instance, final_state, 0)
+
+def test_two_phase():
+    for instance in random_instances(2, 60):
+        final_state = TwoPhaseSolver(State(Schedule(instance))).solve()
+
+        assert (final_state is not None) == (min_soft_conflicts(instance) == 0)
+        if final_state is not None:
+            check_timetable(instance, final_state, 0)
+
+@pytest.mark.parametrize('with_incumbent', [False, True])
+def test_branch_and_bound(with_incumbent):
+    random.seed(0)
+    for instance in random_instances(3, 200):
+        optimum = min_soft_conflicts(instance)
+        report = feasibility.analyze(instance)
+        # Like the command line, which does not search when the hard bound is positive
+        if report.min_hard_conflicts > 0:
+            assert optimum is None
+            continue
+
+        initial_state = State(Schedule(instance))
+        csp = CSP(initial_state, branch_and_bound=True, min_soft_conflicts=report.min_soft_conflicts)
+        if with_incumbent:
+            incumbent = algorithm_selection.find_incumbent(initial_state, report.get_lower_bounds())
+            if incumbent is not None:
+                csp.set_incumbent(incumbent)
+        final_state = csp.solve()
+
+        assert (final_state is not None) == (optimum is not None)
+        if final_state is not None:
+            check_timetable(instance, final_state, optimum)
+
+def test_branch_and_bound_node_limit():
+    instance = random_instances(3, 1)[0]
+    csp = CSP(State(Schedule(instance)), branch_and_bound=True)
+    csp.node_callback = lambda csp: csp.nr_nodes >= 1
+    csp.solve()
+
+    assert csp.stopped
+    assert csp.nr_nodes == 1
+
+def test_parallel_csp():
+    for instance in random_instances(4, 8):
+        final_state, _ = parallel.parallel_csp(State(Schedule(instance)), 2)
+
+        assert (final_state is not None) == (min_soft_conflicts(instance) == 0)
+        if final_state is not None:
+            check_timetable(instance, final_state, 0)
+
+def test_decomposition():
+    for instance in random_instances(5, 30):
+        final_state, unsolved_components = decomposition.solve_components(instance, 'csp', 1)
+
+        assert (not unsolved_components) == (min_soft_conflicts(instance) == 0)
+        if not unsolved_components:
+            check_timetable(instance, final_state, 0)
+
+# With the courses in a fixed order, the first ones used up the teachers of a later one and
+# the search thrashed deep below without ever finishing
+@pytest.mark.parametrize('symmetry_breaking', [True, False])
+def test_csp_constrans_incalcat(symmetry_breaking):
+    instance = Instance(utils.read_yaml_file(os.path.join(INPUTS, 'orar_constrans_incalcat.yaml')))
+    csp = CSP(State(Schedule(instance)), symmetry_breaking=symmetry_breaking)
+    csp.node_callback = lambda csp: csp.nr_nodes >= 10000
+
+    start_time = time.time()
+    final_state = csp.solve()
+    assert time.time() - start_time < 10
+    assert not csp.stopped
+    assert final_state is not None
+    check_timetable(instance, final_state, 0)
@@ -0,0 +1,60 @@
+import feasibility
+from brute_force import random_instances, min_soft_conflicts, count_conflicts, list_assignments
+from instance import Instance
+from schedule import Schedule
+from state import State
+
+# The lower bounds of feasibility.analyze must never exceed the true optimum
+
+def test_bounds_never_exceed_optimum():
+    for instance in random_instances(8, 300):
+        report = feasibility.analyze(instance)
+        optimum = min_soft_conflicts(instance)
+
+        assert report.min_hard_conflicts <= 1
+        if optimum is not None:
+            assert report.min_hard_conflicts == 0
+            assert report.min_soft_conflicts <= optimum
+
+        # Any timetable, here the greedy one, bounds the optimum from above
+        state = State(Schedule(instance))
+        state.generate_greedy_schedule()
+        assert report.min_hard_conflicts <= state.get_hard_conflicts()
+
+# A single teacher and a single classroom of 10 seats for two courses of 80 students: 16 time
+# slots are needed, the teacher can only take 7. Every check fails for both courses, yet one
+# teacher over the limit costs a single hard conflict, so the optimum is 1.
+def test_teacher_over_the_limit():
+    instance = Instance({'Intervale': ['(8, 10)', '(10, 12)', '(12, 14)', '(14, 16)'],
+                            'Zile': ['Luni', 'Marti', 'Miercuri', 'Joi', 'Vineri'],
+                            'Materii': {'A': 80, 'B': 80},
+                            'Sali': {'R': {'Capacitate': 10, 'Materii': ['A', 'B']}},
+                            'Profesori': {'Ana Pop': {'Constrangeri': [], 'Materii': ['A', 'B']}}})
+
+    schedule = Schedule(instance)
+    for index, time_slot in enumerate(instance.available_time_slots[:16]):
+        schedule.add_course('A' if index < 8 else 'B', 'R', 'Ana Pop', time_slot)
+    state = State(schedule)
+    state.compute_hard_conflicts()
+    assignments = list_assignments(schedule.get_assignments())
+    assert state.get_hard_conflicts() == count_conflicts(instance, assignments)[0] == 1
+
+    report = feasibility.analyze(instance)
+    assert report.get_lower_bounds() == (1, 0)
+    assert report.has_unavoidable_conflicts()
+
+# The seats a course can still reach in a schedule without assignments are the ones it can
+# reach in the instance, and they only go down as the greedy constructor fills the schedule in
+def test_reachable_seats_in_a_schedule():
+    for instance in random_instances(9, 100):
+        state = State(Schedule(instance))
+        for course in instance.courses:
+            for preffered_only in (True, False):
+                assert (feasibility.reachable_seats(instance, course, preffered_only, state.get_schedule()) ==
+                        feasibility.reachable_seats(instance, course, preffered_only))
+
+        state.generate_greedy_schedule()
+        for course in instance.courses:
+            for preffered_only in (True, False):
+                assert (feasibility.reachable_seats(instance, course, preffered_only, state.get_schedule()) <=
+                        feasibility.reachable_seats(instance, course, preffered_only))
@@ -0,0 +1,57 @@
+import random
+import pytest
+import feasibility
+import islands
+import lns
+import min_conflicts
+import solver
+from brute_force import random_instances, min_soft_conflicts, count_conflicts, list_assignments
+from schedule import Schedule
+from state import State
+
+# The local searches give no guarantee of optimality, but they must report the conflicts of the
+# timetable they return, and can never do better than the exhaustive optimum.
+
+def check_timetable(instance, state):
+    assignments = list_assignments(state.get_schedule().get_assignments())
+    conflicts = (state.get_hard_conflicts(), state.get_soft_conflicts())
+    assert count_conflicts(instance, assignments) == conflicts
+
+    optimum = min_soft_conflicts(instance)
+    if optimum is None:
+        assert conflicts[0] > 0
+    elif conflicts[0] == 0:
+        assert conflicts[1] >= optimum
+
+def greedy_state(instance):
+    state = State(Schedule(instance))
+    solver.generate_initial_schedule(state)
+    return state
+
+def run_hc(instance, lower_bounds):
+    return solver.stochastic_hill_climbing(greedy_state(instance), 100, 20, lower_bounds=lower_bounds)[3]
+
+def run_mc(instance, lower_bounds):
+    return min_conflicts.min_conflicts(greedy_state(instance), 2000, 200, lower_bounds=lower_bounds)[3]
+
+def run_lns(instance, lower_bounds):
+    return lns.large_neighbourhood_search(greedy_state(instance), 20, lower_bounds=lower_bounds)[3]
+
+def run_ga(instance, lower_bounds):
+    genetic = pytest.importorskip('genetic')
+    return genetic.memetic_algorithm(instance, 10, 10, lower_bounds=lower_bounds)[3]
+
+@pytest.mark.parametrize('search', [run_hc, run_mc, run_lns, run_ga])
+def test_local_search(search):
+    random.seed(0)
+    for instance in random_instances(6, 40):
+        lower_bounds = feasibility.analyze(instance).get_lower_bounds()
+        check_timetable(instance, search(instance, lower_bounds))
+
+def test_island_search():
+    random.seed(0)
+    for instance in random_instances(7, 4):
+        lower_bounds = feasibility.analyze(instance).get_lower_bounds()
+        final_state = islands.island_search(State(Schedule(instance)), 2, max_epochs=3, epoch_iters=100,
+                                            lower_bounds=lower_bounds)[3]
+        check_timetable(instance, final_state)
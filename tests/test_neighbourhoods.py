@@ -0,0 +1,43 @@
+import copy
+import os
+import random
+import pytest
+import neighbourhoods
+import utils
+from brute_force import random_instances, count_conflicts, list_assignments
+from instance import Instance
+from schedule import Schedule
+from state import State
+
+INPUT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'inputs', 'orar_mic_exact.yaml')
+
+def random_states():
+    random.seed(0)
+    instances = random_instances(10, 30) + [Instance(utils.read_yaml_file(INPUT))] * 10
+    for instance in instances:
+        state = State(Schedule(instance))
+        state.generate_initial_schedule()
+        yield instance, state
+
+# The conflicts of a neighbour, updated by delta, are the ones a full recount gives
+@pytest.mark.parametrize('move', [neighbourhoods.kempe_chain, neighbourhoods.ejection_chain])
+def test_delta_evaluation(move):
+    nr_moves = 0
+    for instance, state in random_states():
+        conflicts = (state.get_hard_conflicts(), state.get_soft_conflicts())
+        for _ in range(10):
+            neighbour = move(state)
+            assert (state.get_hard_conflicts(), state.get_soft_conflicts()) == conflicts
+            if neighbour is None:
+                continue
+
+            nr_moves += 1
+            recounted = copy.copy(neighbour)
+            recounted.compute_hard_conflicts()
+            recounted.compute_soft_conflicts()
+            delta_conflicts = (neighbour.get_hard_conflicts(), neighbour.get_soft_conflicts())
+            assert delta_conflicts == (recounted.get_hard_conflicts(), recounted.get_soft_conflicts())
+            assignments = list_assignments(neighbour.get_schedule().get_assignments())
+            assert delta_conflicts == count_conflicts(instance, assignments)
+
+    assert nr_moves > 0
@@ -0,0 +1,74 @@
+import os
+import pytest
+import repair
+import utils
+from instance import Instance
+from schedule import Schedule
+from state import State
+
+INPUT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'inputs', 'orar_mic_exact.yaml')
+
+def greedy_state(in_data):
+    state = State(Schedule(Instance(in_data)))
+    state.generate_greedy_schedule()
+    return state
+
+# The assignments of a schedule, in the format of load_previous_assignments
+def previous_assignments(schedule):
+    return sorted((course, classroom, teacher, (day, eval(interval)))
+                    for course, assignments in schedule.get_assignments().items()
+                    for classroom, teacher, (day, interval) in assignments)
+
+# A timetable written by orar.py is read back with the same assignments
+def test_load_previous_assignments(tmp_path):
+    in_data = utils.read_yaml_file(INPUT)
+    state = greedy_state(in_data)
+    output_path = tmp_path / 'orar_mic_exact.txt'
+    output_path.write_text(utils.pretty_print_timetable(state.get_schedule().convert_schedule_to_dict(), INPUT))
+
+    loaded = repair.load_previous_assignments(str(output_path), in_data)
+    assert sorted(loaded) == previous_assignments(state.get_schedule())
+
+# On the same instance, a timetable without conflicts is kept whole
+def test_warm_start_keeps_valid_assignments():
+    in_data = utils.read_yaml_file(INPUT)
+    state = greedy_state(in_data)
+    assert state.get_hard_conflicts() == state.get_soft_conflicts() == 0
+    previous = previous_assignments(state.get_schedule())
+
+    warm_state, invalid = repair.warm_start_state(Schedule(Instance(in_data)), previous)
+    assert invalid == []
+    assert previous_assignments(warm_state.get_schedule()) == previous
+    assert warm_state.get_schedule().get_hash() == state.get_schedule().get_hash()
+    assert warm_state.get_nr_seats_per_course() == state.get_nr_seats_per_course()
+
+# The assignments of a teacher who left are dropped, and the rest of the timetable is
+# completed around the ones kept
+def test_warm_start_drops_invalid_assignments():
+    in_data = utils.read_yaml_file(INPUT)
+    previous = previous_assignments(greedy_state(in_data).get_schedule())
+    teacher = previous[0][2]
+    del in_data['Profesori'][teacher]
+
+    warm_state, invalid = repair.warm_start_state(Schedule(Instance(in_data)), previous)
+    assert invalid == [assignment for assignment in previous if assignment[2] == teacher]
+    kept = previous_assignments(warm_state.get_schedule())
+    assert kept == [assignment for assignment in previous if assignment[2] != teacher]
+
+    warm_state.generate_greedy_schedule()
+    assert set(kept) <= set(previous_assignments(warm_state.get_schedule()))
+
+# The memetic algorithm starts from the repaired timetable and completes it: with a single
+# individual and no generation, it returns the greedy completion of the assignments kept
+def test_memetic_algorithm_from_initial_state():
+    genetic = pytest.importorskip('genetic')
+    in_data = utils.read_yaml_file(INPUT)
+    kept = ('PL', 'ED020', 'Madalina Dinu', ('Marti', (18, 20)))
+    state, invalid = repair.warm_start_state(Schedule(Instance(in_data)), [kept])
+    assert invalid == []
+
+    final_state = genetic.memetic_algorithm(state.get_schedule().get_instance(), 1, 0, initial_state=state)[3]
+    assert kept in previous_assignments(final_state.get_schedule())
+    assert final_state.get_hard_conflicts() == 0
+    # The initial state is left as it was
+    assert previous_assignments(state.get_schedule()) == [kept]
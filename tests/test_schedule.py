@@ -0,0 +1,69 @@
+import copy
+import os
+import random
+import utils
+from instance import Instance
+from schedule import Schedule
+from state import State, MOVES, CHAIN_MOVES
+
+INPUT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'inputs', 'orar_mic_exact.yaml')
+
+# The hash the assignments of a schedule should have, computed from scratch
+def full_hash(schedule):
+    other = Schedule(schedule.get_instance())
+    other.set_assignments({course: list(assignments) for course, assignments in schedule.get_assignments().items()})
+    return other.get_hash()
+
+def random_state(seed):
+    random.seed(seed)
+    state = State(Schedule(Instance(utils.read_yaml_file(INPUT))))
+    state.generate_initial_schedule()
+    return state
+
+# The hash does not depend on the order of the assignments, and removing them all brings
+# it back to the hash of the empty schedule
+def test_add_and_remove():
+    state = random_state(0)
+    schedule = state.get_schedule()
+    assignments = [(course, classroom, teacher, time_slot)
+                    for course, course_assignments in schedule.get_assignments().items()
+                    for classroom, teacher, time_slot in course_assignments]
+    assert schedule.get_hash() == full_hash(schedule) != 0
+
+    shuffled = Schedule(schedule.get_instance())
+    for assignment in random.sample(assignments, len(assignments)):
+        shuffled.add_course(*assignment)
+    assert shuffled.get_hash() == schedule.get_hash()
+
+    for assignment in random.sample(assignments, len(assignments)):
+        shuffled.remove_course(*assignment)
+    assert shuffled.get_hash() == Schedule(schedule.get_instance()).get_hash() == 0
+
+# A copy starts with the hash of the original and then goes its own way
+def test_copy():
+    schedule = random_state(1).get_schedule()
+    other = copy.deepcopy(schedule)
+    assert other.get_hash() == schedule.get_hash()
+
+    course, assignments = next(iter(other.get_assignments().items()))
+    other.remove_course(course, *assignments[0])
+    assert other.get_hash() == full_hash(other) != schedule.get_hash()
+    assert schedule.get_hash() == full_hash(schedule)
+
+# Every move keeps the hash of the neighbour up to date and leaves the original untouched
+def test_moves():
+    changed = set()
+    for seed in range(10):
+        state = random_state(seed)
+        state_hash = state.get_schedule().get_hash()
+
+        for move in MOVES + list(CHAIN_MOVES):
+            neighbour = state.apply_move(move)
+            if neighbour is not None:
+                assert neighbour.get_schedule().get_hash() == full_hash(neighbour.get_schedule())
+                if neighbour.get_schedule().get_hash() != state_hash:
+                    changed.add(move)
+            assert state.get_schedule().get_hash() == state_hash == full_hash(state.get_schedule())
+
+    # Every move found something to change at least once
+    assert changed == set(MOVES) | set(CHAIN_MOVES)
@@ -0,0 +1,85 @@
+import copy
+import os
+import repair
+import solution_cache
+import utils
+from instance import Instance
+from schedule import Schedule
+from state import State
+
+INPUT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'inputs', 'orar_mic_exact.yaml')
+
+def greedy_state(in_data):
+    state = State(Schedule(Instance(in_data)))
+    state.generate_greedy_schedule()
+    return state
+
+# Reordering the lists and the keys of the input keeps the hash, changing its content does not
+def test_hash_instance():
+    in_data = utils.read_yaml_file(INPUT)
+    reordered = {key: in_data[key] for key in reversed(list(in_data))}
+    reordered['Zile'] = list(reversed(in_data['Zile']))
+    reordered['Intervale'] = list(reversed(in_data['Intervale']))
+    reordered['Profesori'] = {name: {'Constrangeri': list(reversed(info['Constrangeri'])),
+                                        'Materii': list(reversed(info['Materii']))}
+                                for name, info in reversed(list(in_data['Profesori'].items()))}
+    assert solution_cache.hash_instance(reordered) == solution_cache.hash_instance(in_data)
+
+    changed = copy.deepcopy(in_data)
+    changed['Sali']['ED010']['Capacitate'] += 1
+    assert solution_cache.hash_instance(changed) != solution_cache.hash_instance(in_data)
+
+# A stored timetable comes back with its assignments and conflicts, only under its own key
+def test_put_and_get(tmp_path):
+    in_data = utils.read_yaml_file(INPUT)
+    instance_hash = solution_cache.hash_instance(in_data)
+    state = greedy_state(in_data)
+    cache = solution_cache.SolutionCache(str(tmp_path))
+    key = cache.make_key(instance_hash, 'hc', {'moves': None}, 1)
+
+    assert cache.get(key) is None
+    cache.put(key, solution_cache.entry_from_state(instance_hash, 'hc', state))
+    assert cache.get(cache.make_key(instance_hash, 'hc', {'moves': None}, 2)) is None
+
+    cached_state = solution_cache.state_from_entry(Instance(in_data), cache.get(key))
+    assert cached_state.get_schedule().get_hash() == state.get_schedule().get_hash()
+    assert ((cached_state.get_hard_conflicts(), cached_state.get_soft_conflicts()) ==
+            (state.get_hard_conflicts(), state.get_soft_conflicts()))
+
+    # A corrupted entry is a miss
+    with open(cache.entry_path(key), 'w') as f:
+        f.write('{')
+    assert cache.get(key) is None
+
+# A warm start takes the timetable of the same instance from any algorithm and seed, and
+# keeps all of its assignments
+def test_warm_start(tmp_path):
+    in_data = utils.read_yaml_file(INPUT)
+    instance_hash = solution_cache.hash_instance(in_data)
+    state = greedy_state(in_data)
+    cache = solution_cache.SolutionCache(str(tmp_path))
+    cache.put(cache.make_key(instance_hash, 'csp', {}, None),
+                solution_cache.entry_from_state(instance_hash, 'csp', state))
+
+    assert cache.find_by_instance(solution_cache.hash_instance({})) is None
+    entry = cache.find_by_instance(instance_hash)
+    previous_assignments = repair.to_previous_assignments(entry.get_assignments())
+    warm_state, invalid = repair.warm_start_state(Schedule(Instance(in_data)), previous_assignments)
+    assert invalid == []
+    assert warm_state.get_schedule().get_hash() == state.get_schedule().get_hash()
+
+# Once over max_bytes, the least recently used entries go first, and a hit counts as a use
+def test_eviction(tmp_path):
+    in_data = utils.read_yaml_file(INPUT)
+    instance_hash = solution_cache.hash_instance(in_data)
+    entry = solution_cache.entry_from_state(instance_hash, 'hc', greedy_state(in_data))
+    cache = solution_cache.SolutionCache(str(tmp_path))
+    keys = [cache.make_key(instance_hash, 'hc', {}, seed) for seed in range(3)]
+    for mtime, key in zip([100, 200, 300], keys):
+        cache.put(key, entry)
+        os.utime(cache.entry_path(key), (mtime, mtime))
+
+    cache.get(keys[0])
+    cache.max_bytes = 2 * os.path.getsize(cache.entry_path(keys[0]))
+    cache.evict()
+    assert [cache.get(key) is not None for key in keys] == [True, False, True]
@@ -0,0 +1,67 @@
+import os
+import pytest
+import neighbourhoods
+import utils
+import whatif
+from instance import Instance
+from schedule import Schedule
+from state import State
+
+INPUT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'inputs', 'orar_mic_exact.yaml')
+
+def test_apply_changes():
+    in_data = utils.read_yaml_file(INPUT)
+    changes = [{'op': 'add_course', 'course': 'SO', 'students': 40},
+                {'op': 'add_classroom', 'name': 'EC105', 'capacity': 40, 'courses': ['SO', 'PA']},
+                {'op': 'add_teacher', 'name': 'Ana Pop', 'courses': ['SO'], 'constraints': ['Luni', '8-12']},
+                {'op': 'remove_classroom', 'name': 'ED010'},
+                {'op': 'remove_teacher', 'name': 'Andrei Ilie'},
+                {'op': 'add_constraint', 'teacher': 'Maria Ilie', 'constraint': '!Luni'},
+                {'op': 'remove_constraint', 'teacher': 'Maria Ilie', 'constraint': 'Joi'},
+                {'op': 'set_course_size', 'course': 'PA', 'students': 300},
+                {'op': 'remove_course', 'course': 'PL'}]
+    changed = whatif.apply_changes(in_data, changes)
+
+    assert changed['Materii'] == {'PA': 300, 'PCom': 330, 'SO': 40}
+    assert changed['Sali'] == {'ED020': {'Capacitate': 30, 'Materii': ['PA', 'PCom']},
+                                'EC105': {'Capacitate': 40, 'Materii': ['SO', 'PA']}}
+    assert changed['Profesori']['Ana Pop'] == {'Constrangeri': ['Luni', '8-12'], 'Materii': ['SO']}
+    assert 'Andrei Ilie' not in changed['Profesori']
+    assert changed['Profesori']['Maria Ilie']['Constrangeri'] == ['Luni', '!Marti', 'Miercuri', '!Vineri', '!8-10',
+                                                                    '!12-14', '10-12', '14-20', '!Luni']
+    assert all('PL' not in teacher['Materii'] for teacher in changed['Profesori'].values())
+    # The result is still an instance, and the base data is left as it was
+    Instance(changed)
+    assert in_data == utils.read_yaml_file(INPUT)
+
+@pytest.mark.parametrize('change', [{'op': 'rename_course', 'course': 'PA'},
+                                    {'op': 'remove_classroom', 'name': 'EC105'},
+                                    {'op': 'add_classroom', 'name': 'ED010', 'capacity': 10, 'courses': ['PA']},
+                                    {'op': 'add_classroom', 'name': 'EC105', 'capacity': 10, 'courses': ['SO']},
+                                    {'op': 'add_teacher', 'name': 'Maria Ilie', 'courses': ['PA']},
+                                    {'op': 'remove_teacher', 'name': 'Ana Pop'},
+                                    {'op': 'add_constraint', 'teacher': 'Ana Pop', 'constraint': 'Luni'},
+                                    {'op': 'remove_constraint', 'teacher': 'Maria Ilie', 'constraint': 'Marti'},
+                                    {'op': 'set_course_size', 'course': 'SO', 'students': 10},
+                                    {'op': 'add_course', 'course': 'PA', 'students': 10},
+                                    {'op': 'remove_course', 'course': 'SO'}])
+def test_invalid_change(change):
+    with pytest.raises(ValueError):
+        whatif.apply_changes(utils.read_yaml_file(INPUT), [change])
+
+# A scenario starts from the base timetable, and an invalid one reports why
+def test_run_scenario():
+    in_data = utils.read_yaml_file(INPUT)
+    state = State(Schedule(Instance(in_data)))
+    state.generate_greedy_schedule()
+    whatif.init_worker(in_data, neighbourhoods.list_assignments(state.get_schedule()))
+
+    result, final_state = whatif.run_scenario('smaller PA', [{'op': 'set_course_size', 'course': 'PA',
+                                                                'students': 200}], 'csp', 1)
+    assert result.error is None
+    assert result.feasible and final_state.is_final()
+    assert result.nr_kept == len(neighbourhoods.list_assignments(state.get_schedule()))
+
+    result, final_state = whatif.run_scenario('no such course', [{'op': 'remove_course', 'course': 'SO'}], 'csp', 1)
+    assert result.error == "there is no course SO"
+    assert final_state is None
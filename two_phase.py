@@ -0,0 +1,245 @@
+from collections import Counter
+from typing import Dict, List, Tuple
+import solver
+from flow import max_flow, solve_max_flow, reachable_nodes
+from schedule import Schedule
+from state import State
+
+class TwoPhaseSolver:
+    # Splits each CSP value (classroom, teacher, time slot) in two. Phase 1 searches for the
+    # (classroom, time slot) pairs that cover the courses; phase 2 finds the teachers of a
+    # complete phase 1 timetable with a maximum flow. When no flow gives every assignment
+    # a teacher, the assignments on the source side of the minimum cut can not get teachers
+    # together, whatever the rest of the timetable. Their (course, time slot) pairs become
+    # a cut that phase 1 never completes again, and the search jumps back to it.
+    # node_callback works as in the CSP: returning True at a node stops the search.
+    def __init__(self, initial_state: State):
+        self.current_state = initial_state
+        self.node_callback = None
+        self.stopped = False
+        self.nr_nodes = 0
+        self.nr_matchings = 0
+        self.nr_cuts = 0
+
+        schedule = initial_state.get_schedule()
+        teachers = schedule.get_teachers()
+        # Assignments each teacher can still get: at most 7 time slots and no more
+        # courses than preffered time slots, like in the CSP
+        self.teacher_capacity = {name: min(7 - len(teacher.get_courses_by_time_slot()),
+                                            len(teacher.get_preffered_time_slots()) -
+                                            sum(len(courses) for courses in teacher.get_courses_by_time_slot().values()))
+                                    for name, teacher in teachers.items()}
+
+        # Teachers that could take a course in a time slot
+        self.teachers_by_course_slot = {}  # Dict [(course, time_slot): List[teacher]]
+        for course in schedule.courses:
+            for time_slot in schedule.available_time_slots:
+                self.teachers_by_course_slot[(course, time_slot)] = [
+                    name for name, teacher in teachers.items()
+                    if teacher.can_teach_course(course) and teacher.prefers_time_slot(time_slot) and
+                        teacher.is_free_at_time(time_slot) and self.teacher_capacity[name] > 0]
+
+        # Phase 1 values of each course: free (classroom, time slot) pairs with a possible
+        # teacher, the largest classrooms first
+        self.domains = {}  # Dict [course: List[(classroom, time_slot)]]
+        for course in schedule.courses:
+            self.domains[course] = [(name, time_slot) for name, classroom in schedule.get_classrooms().items()
+                                    for time_slot in schedule.available_time_slots
+                                    if classroom.can_host_course(course) and
+                                        not classroom.is_occupied_at_time(time_slot) and
+                                        self.teachers_by_course_slot[(course, time_slot)]]
+            self.domains[course].sort(key=lambda value: -schedule.get_classrooms()[value[0]].get_capacity())
+
+        # The courses with the fewest values first
+        self.courses = sorted(schedule.courses, key=lambda course: len(self.domains[course]))
+
+        self.decisions = []  # (course, classroom, time_slot, value index), one per level
+        self.used_pairs = set()  # (classroom, time_slot)
+        self.pair_counts = Counter()  # (course, time_slot): number of assignments
+        self.courses_by_slot = {}  # Dict [time_slot: List[course]]
+        self.seats = {course: seats for course, seats in initial_state.get_nr_seats_per_course().items()}
+
+        # How many assignments use each classroom and time slot, for symmetry breaking
+        self.classroom_uses = Counter()
+        self.time_slot_uses = Counter()
+        for assignments in schedule.get_assignments().values():
+            for classroom_name, _, time_slot in assignments:
+                self.classroom_uses[classroom_name] += 1
+                self.time_slot_uses[time_slot] += 1
+        self.domain_indexes = {course: {value: index for index, value in enumerate(domain)}
+                                for course, domain in self.domains.items()}
+
+        # Learned cuts, as multisets of (course, time slot) pairs, indexed by each of their pairs
+        self.cuts = {}  # Dict [(course, time_slot): List[Counter]]
+
+    def solve(self) -> State:
+        teachers = self.search()[0]
+        if teachers is None:
+            return None
+
+        state = self.current_state
+        schedule = state.get_schedule()
+        for (course, classroom_name, time_slot, _), teacher_name in zip(self.decisions, teachers):
+            schedule.add_course(course, classroom_name, teacher_name, time_slot)
+            state.increase_nr_seats_per_course(course, schedule.get_classrooms()[classroom_name].get_capacity())
+
+        state.compute_hard_conflicts()
+        state.compute_soft_conflicts()
+        return state
+
+    # Returns the teachers of the decisions once all the courses are covered, or None and the
+    # deepest level the failure depends on: the levels below it are skipped
+    def search(self) -> Tuple[List[str], int]:
+        level = len(self.decisions)
+        if self.node_callback is not None and self.node_callback(self):
+            self.stopped = True
+            return None, -1
+
+        course = self.next_course()
+        if course is None:
+            return self.assign_teachers()
+
+        # The values of a course form a set, so they are chosen in domain order
+        first_index = 0
+        for decision in reversed(self.decisions):
+            if decision[0] == course:
+                first_index = decision[3] + 1
+                break
+
+        if not self.can_cover_courses():
+            return None, level - 1
+
+        for value_index in range(first_index, len(self.domains[course])):
+            classroom_name, time_slot = self.domains[course][value_index]
+            if ((classroom_name, time_slot) in self.used_pairs or
+                self.has_tried_symmetric_value(course, value_index) or
+                self.completes_cut(course, time_slot) or
+                not self.can_match_slot(time_slot, course)):
+                continue
+
+            self.assign(course, classroom_name, time_slot, value_index)
+            self.nr_nodes += 1
+            teachers, jump_level = self.search()
+            if teachers is not None:
+                return teachers, jump_level
+            self.unassign()
+
+            if jump_level < level:
+                return None, jump_level
+
+        return None, level - 1
+
+    def next_course(self) -> str:
+        courses = self.current_state.get_schedule().courses
+        for course in self.courses:
+            if self.seats.get(course, 0) < courses[course]:
+                return course
+        return None
+
+    def assign(self, course: str, classroom_name: str, time_slot: Tuple[str, str], value_index: int):
+        self.decisions.append((course, classroom_name, time_slot, value_index))
+        self.used_pairs.add((classroom_name, time_slot))
+        self.pair_counts[(course, time_slot)] += 1
+        self.courses_by_slot.setdefault(time_slot, []).append(course)
+        self.seats[course] = (self.seats.get(course, 0) +
+                                self.current_state.get_schedule().get_classrooms()[classroom_name].get_capacity())
+        self.classroom_uses[classroom_name] += 1
+        self.time_slot_uses[time_slot] += 1
+
+    def unassign(self):
+        course, classroom_name, time_slot, _ = self.decisions.pop()
+        self.used_pairs.discard((classroom_name, time_slot))
+        self.pair_counts[(course, time_slot)] -= 1
+        self.courses_by_slot[time_slot].pop()
+        self.seats[course] -= self.current_state.get_schedule().get_classrooms()[classroom_name].get_capacity()
+        self.classroom_uses[classroom_name] -= 1
+        self.time_slot_uses[time_slot] -= 1
+
+    # Unused interchangeable classrooms and time slots can be swapped in any timetable, so a
+    # value whose representative (see CSP.find_representative) comes earlier in the domain
+    # leads to the same timetables as the representative, which were already searched
+    def has_tried_symmetric_value(self, course: str, value_index: int) -> bool:
+        classroom_name, time_slot = self.domains[course][value_index]
+        instance = self.current_state.get_schedule().get_instance()
+        representative = (solver.first_unused(instance.classroom_classes[classroom_name],
+                                            self.classroom_uses, classroom_name),
+                            solver.first_unused(instance.time_slot_classes[time_slot], self.time_slot_uses, time_slot))
+
+        return self.domain_indexes[course].get(representative, value_index) < value_index
+
+    # Upper bound on the seats each course can still get, ignoring the other courses: in each
+    # time slot, as many of its free classrooms as it has teachers there
+    def can_cover_courses(self) -> bool:
+        classrooms = self.current_state.get_schedule().get_classrooms()
+        courses = self.current_state.get_schedule().courses
+
+        for course in self.courses:
+            missing_seats = courses[course] - self.seats.get(course, 0)
+            if missing_seats <= 0:
+                continue
+
+            capacities_by_slot = {}
+            for classroom_name, time_slot in self.domains[course]:
+                if (classroom_name, time_slot) not in self.used_pairs:
+                    capacities_by_slot.setdefault(time_slot, []).append(classrooms[classroom_name].get_capacity())
+
+            seats = sum(sum(capacities[:len(self.teachers_by_course_slot[(course, time_slot)])])
+                        for time_slot, capacities in capacities_by_slot.items())
+            if seats < missing_seats:
+                return False
+
+        return True
+
+    def completes_cut(self, course: str, time_slot: Tuple[str, str]) -> bool:
+        for cut in self.cuts.get((course, time_slot), []):
+            if all(self.pair_counts[pair] + (pair == (course, time_slot)) >= count for pair, count in cut.items()):
+                return True
+        return False
+
+    # Whether the courses of a time slot, with a new one, can all get different teachers
+    def can_match_slot(self, time_slot: Tuple[str, str], course: str) -> bool:
+        courses = self.courses_by_slot.get(time_slot, []) + [course]
+        capacities = {'source': {}}
+        for index, slot_course in enumerate(courses):
+            capacities['source'][('course', index)] = 1
+            capacities[('course', index)] = {('teacher', name): 1
+                                                for name in self.teachers_by_course_slot[(slot_course, time_slot)]}
+            for name in self.teachers_by_course_slot[(slot_course, time_slot)]:
+                capacities[('teacher', name)] = {'sink': 1}
+
+        return max_flow(capacities, 'source', 'sink') == len(courses)
+
+    # Phase 2: each assignment gets a teacher who can teach the course and prefers the time
+    # slot, at most one assignment per teacher and time slot and at most the teacher's capacity
+    def assign_teachers(self) -> Tuple[List[str], int]:
+        self.nr_matchings += 1
+        capacities = {'source': {}}
+        for index, (course, _, time_slot, _) in enumerate(self.decisions):
+            capacities['source'][('assignment', index)] = 1
+            capacities[('assignment', index)] = {('slot', name, time_slot): 1
+                                                    for name in self.teachers_by_course_slot[(course, time_slot)]}
+            for name in self.teachers_by_course_slot[(course, time_slot)]:
+                capacities[('slot', name, time_slot)] = {('teacher', name): 1}
+                capacities[('teacher', name)] = {'sink': self.teacher_capacity[name]}
+
+        flow, residual = solve_max_flow(capacities, 'source', 'sink')
+        if flow == len(self.decisions):
+            teachers = []
+            for index in range(len(self.decisions)):
+                for (_, name, _), capacity in capacities[('assignment', index)].items():
+                    if residual[('assignment', index)][('slot', name, self.decisions[index][2])] < capacity:
+                        teachers.append(name)
+                        break
+            return teachers, len(self.decisions)
+
+        # The assignments still reachable from the source can not all get a teacher
+        reached = reachable_nodes(residual, 'source')
+        levels = [index for index in range(len(self.decisions)) if ('assignment', index) in reached]
+        self.learn_cut(levels)
+        return None, max(levels)
+
+    def learn_cut(self, levels: List[int]):
+        self.nr_cuts += 1
+        cut = Counter((self.decisions[level][0], self.decisions[level][2]) for level in levels)
+        for pair in cut:
+            self.cuts.setdefault(pair, []).append(cut)
@@ -0,0 +1,217 @@
+import copy
+import time
+import random
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple
+import utils
+import solver
+import lns
+import neighbourhoods
+import repair
+import feasibility
+from instance import Instance
+from schedule import Schedule
+from state import State
+
+# What-if analysis: solves variations (scenarios) of a base instance and tabulates whether each
+# one still has a timetable without conflicts. The scenarios file holds a list of scenarios:
+#   - name: EG346 closes
+#     changes:
+#       - {op: remove_classroom, name: EG346}
+#   - name: second PA teacher
+#     changes:
+#       - {op: add_teacher, name: Ana Pop, courses: [PA], constraints: [Luni, Marti, '!18-20']}
+# The changes are add_classroom (name, capacity, courses), remove_classroom (name),
+# add_teacher (name, courses, constraints), remove_teacher (name), add_constraint and
+# remove_constraint (teacher, constraint), set_course_size (course, students), add_course
+# (course, students) and remove_course (course). A change whose target does not exist, or
+# already exists for the add changes, makes the scenario invalid.
+
+# Base instance and timetable, sent once to each worker process
+worker_context = {}
+
+class ScenarioResult:
+    def __init__(self, name: str):
+        self.name = name
+        self.error = None  # Why the changes could not be applied
+        # True if a timetable without conflicts was found, False if there is none,
+        # None if the search gave up or only found timetables with conflicts
+        self.feasible = None
+        self.lower_bounds = (0, 0)  # Conflicts the scenario can not avoid
+        self.hard_conflicts = None  # Of the best timetable found
+        self.soft_conflicts = None
+        self.nr_kept = 0  # Assignments of the base timetable that are still valid
+        self.elapsed = 0.0
+
+def apply_changes(in_data: dict, changes: List[dict]) -> dict:
+    in_data = copy.deepcopy(in_data)
+    classrooms, teachers, courses = in_data['Sali'], in_data['Profesori'], in_data['Materii']
+
+    for change in changes:
+        op = change.get('op')
+        if op == 'add_classroom':
+            check_new(classrooms, change['name'], 'classroom')
+            check_courses(courses, change['courses'])
+            classrooms[change['name']] = {'Capacitate': change['capacity'], 'Materii': list(change['courses'])}
+        elif op == 'remove_classroom':
+            check_exists(classrooms, change['name'], 'classroom')
+            del classrooms[change['name']]
+        elif op == 'add_teacher':
+            check_new(teachers, change['name'], 'teacher')
+            check_courses(courses, change['courses'])
+            teachers[change['name']] = {'Constrangeri': list(change.get('constraints', [])),
+                                        'Materii': list(change['courses'])}
+        elif op == 'remove_teacher':
+            check_exists(teachers, change['name'], 'teacher')
+            del teachers[change['name']]
+        elif op == 'add_constraint':
+            check_exists(teachers, change['teacher'], 'teacher')
+            teachers[change['teacher']]['Constrangeri'].append(change['constraint'])
+        elif op == 'remove_constraint':
+            check_exists(teachers, change['teacher'], 'teacher')
+            if change['constraint'] not in teachers[change['teacher']]['Constrangeri']:
+                raise ValueError("teacher " + change['teacher'] + " has no constraint " + change['constraint'])
+            teachers[change['teacher']]['Constrangeri'].remove(change['constraint'])
+        elif op in ('set_course_size', 'add_course'):
+            if op == 'set_course_size':
+                check_exists(courses, change['course'], 'course')
+            else:
+                check_new(courses, change['course'], 'course')
+            courses[change['course']] = change['students']
+        elif op == 'remove_course':
+            check_exists(courses, change['course'], 'course')
+            del courses[change['course']]
+            for entity in list(classrooms.values()) + list(teachers.values()):
+                entity['Materii'] = [course for course in entity['Materii'] if course != change['course']]
+        else:
+            raise ValueError("unknown change: " + str(op))
+
+    return in_data
+
+def check_exists(entities: dict, name: str, kind: str):
+    if name not in entities:
+        raise ValueError("there is no " + kind + " " + str(name))
+
+def check_new(entities: dict, name: str, kind: str):
+    if name in entities:
+        raise ValueError("there already is a " + kind + " " + str(name))
+
+def check_courses(courses: dict, names: List[str]):
+    for name in names:
+        check_exists(courses, name, 'course')
+
+def init_worker(base_data: dict, base_assignments: List[Tuple]):
+    worker_context['base_data'] = base_data
+    worker_context['base_assignments'] = base_assignments
+
+# Solves one scenario, starting from the assignments of the base timetable that are still
+# valid. The CSP gets at most node_limit nodes; if it finds nothing from the warm start,
+# it tries again from an empty schedule. Returns the result and the timetable found, if any.
+def run_scenario(name: str, changes: List[dict], algorithm: str, seed: int,
+                    node_limit: int = 20000) -> Tuple[ScenarioResult, State]:
+    start_time = time.time()
+    random.seed(seed)
+    result = ScenarioResult(name)
+
+    try:
+        instance = Instance(apply_changes(worker_context['base_data'], changes))
+    except (ValueError, KeyError, TypeError) as error:
+        result.error = str(error)
+        return result, None
+
+    report = feasibility.analyze(instance)
+    result.lower_bounds = report.get_lower_bounds()
+    previous_assignments = repair.to_previous_assignments(worker_context['base_assignments'])
+    initial_state, invalid_assignments = repair.warm_start_state(Schedule(instance), previous_assignments)
+    result.nr_kept = len(previous_assignments) - len(invalid_assignments)
+
+    final_state = None
+    if algorithm == 'csp':
+        if report.has_unavoidable_conflicts():
+            result.feasible = False
+        else:
+            states = [initial_state] + ([State(Schedule(instance))] if result.nr_kept else [])
+            for state in states:
+                csp = solver.CSP(state)
+                csp.node_callback = lambda csp: csp.nr_nodes >= node_limit
+                final_state = csp.solve()
+                if final_state is not None:
+                    break
+            # Only a search from the empty schedule that ran to the end rules the scenario out
+            if final_state is None and not csp.stopped:
+                result.feasible = False
+    else:
+        solver.generate_initial_schedule(initial_state)
+        final_state = solver.stochastic_hill_climbing(initial_state, lower_bounds=result.lower_bounds)[3]
+        if algorithm == 'lns':
+            final_state = lns.large_neighbourhood_search(final_state, lower_bounds=result.lower_bounds)[3]
+        if report.has_unavoidable_conflicts():
+            result.feasible = False
+
+    if final_state is not None:
+        result.hard_conflicts = final_state.get_hard_conflicts()
+        result.soft_conflicts = final_state.get_soft_conflicts()
+        if final_state.is_final():
+            result.feasible = True
+    result.elapsed = time.time() - start_time
+    return result, final_state
+
+def solve_scenario(name: str, changes: List[dict], algorithm: str, seed: int) -> ScenarioResult:
+    return run_scenario(name, changes, algorithm, seed)[0]
+
+# Solves the base instance, then every scenario in parallel on nr_workers processes
+# (all the CPUs by default). Returns the results in the order of the scenarios.
+def evaluate_scenarios(base_data: dict, scenarios: List[dict], algorithm: str = 'csp',
+                        nr_workers: int = None) -> Tuple[ScenarioResult, List[ScenarioResult]]:
+    init_worker(base_data, [])
+    base_result, base_state = run_scenario('base', [], algorithm, random.getrandbits(32))
+    base_assignments = neighbourhoods.list_assignments(base_state.get_schedule()) if base_state is not None else []
+
+    names = [scenario.get('name', 'scenario ' + str(index + 1)) for index, scenario in enumerate(scenarios)]
+    changes = [scenario.get('changes', []) for scenario in scenarios]
+    seeds = [random.getrandbits(32) for _ in scenarios]
+
+    with ProcessPoolExecutor(nr_workers, initializer=init_worker,
+                                initargs=(base_data, base_assignments)) as executor:
+        results = list(executor.map(solve_scenario, names, changes, [algorithm] * len(scenarios), seeds))
+
+    return base_result, results
+
+def format_results(base_result: ScenarioResult, results: List[ScenarioResult]) -> str:
+    header = ['Scenario', 'Feasible', 'Hard', 'Soft', 'Unavoidable', 'Kept', 'Seconds']
+    rows = [header]
+    errors = []
+
+    for result in [base_result] + results:
+        if result.error is not None:
+            rows.append([result.name, 'invalid', '', '', '', '', ''])
+            errors.append(result.name + ': ' + result.error)
+            continue
+
+        feasible = {True: 'yes', False: 'no', None: 'unknown'}[result.feasible]
+        conflicts = ([str(result.hard_conflicts), str(result.soft_conflicts)]
+                        if result.hard_conflicts is not None else ['-', '-'])
+        rows.append([result.name, feasible] + conflicts +
+                    ['%d/%d' % result.lower_bounds, str(result.nr_kept), '%.2f' % result.elapsed])
+
+    widths = [max(len(row[column]) for row in rows) for column in range(len(header))]
+    lines = ['  '.join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip() for row in rows]
+    return '\n'.join(lines + errors)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='What-if analysis of changes to an instance')
+    parser.add_argument('filename', help='base instance')
+    parser.add_argument('scenarios', help='YAML file with the list of scenarios')
+    parser.add_argument('--algorithm', choices=['csp', 'hc', 'lns'], default='csp')
+    parser.add_argument('--workers', type=int, help='number of processes (all the CPUs by default)')
+    parser.add_argument('--seed', type=int, help='seed of the random number generator')
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    base_result, results = evaluate_scenarios(utils.read_yaml_file(args.filename),
+                                                utils.read_yaml_file(args.scenarios) or [],
+                                                args.algorithm, args.workers)
+    print(format_results(base_result, results))